@@ -0,0 +1,4 @@
+"""Benchmarks for emojipack on synthetic snippet packs.
+
+Run with `python -m benchmarks`, see `python -m benchmarks --help`.
+"""
@@ -0,0 +1,5 @@
+"""Run the benchmark suite from the command line."""
+
+from benchmarks.suite import app
+
+app(prog_name="benchmarks")
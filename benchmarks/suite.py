@@ -0,0 +1,348 @@
+"""Benchmark suite timing pack operations on synthetic packs."""
+
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import math
+import platform
+import plistlib
+import re
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from urllib.parse import quote
+
+import typer
+
+from emojipack.cli import app as emojipack_app
+from emojipack.comparison import EMOJI_VS, compare_emojis, compare_keywords
+from emojipack.download import GemojiEntry
+from emojipack.exporters import macos_keyword
+from emojipack.pack import SnippetPack
+from emojipack.server import SnippetIndex, start_server
+from emojipack.snippets import AlfredSnippet
+from emojipack.table import SnippetTable
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+RESULTS_FORMAT = 1  # Version of the JSON results layout
+EMOJI_BASE = 0x1F300  # First code point of synthetic emojis
+EMOJI_RANGE = 0x300  # Code points used on each side of the ZWJ sequences
+ZWJ = "\u200d"  # Zero width joiner
+CHANGE_PERIOD = 20  # One snippet in this many differs between packs
+LOAD_CONNECTIONS = 8  # Concurrent clients of the serve benchmark
+LOAD_REQUESTS = 10_000  # Most requests sent by the serve benchmark
+CONTENT_LENGTH = re.compile(rb"\r\nContent-Length: (\d+)\r\n")
+
+app = typer.Typer()
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """Best time and peak traced memory of a benchmark at one size."""
+
+    name: str
+    size: int  # Number of snippets
+    seconds: float
+    peak_bytes: int
+
+
+@dataclass(frozen=True)
+class Regression:
+    """Benchmark metric that got worse than in the baseline."""
+
+    name: str
+    size: int
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        """Describe the regression on one line."""
+        ratio = self.current / self.baseline if self.baseline else math.inf
+        return (
+            f"{self.name}[{self.size}] {self.metric}: "
+            f"{self.baseline:.6g} -> {self.current:.6g} ({ratio:.2f}x)"
+        )
+
+
+def synthetic_gemoji(size: int) -> Iterator[GemojiEntry]:
+    """Generate gemoji entries with two aliases each, size in total.
+
+    Emojis are distinct ZWJ sequences, so that there are as many emojis as in a
+    real pack of the same size.
+    """
+    for i in range(0, size, 2):
+        high, low = divmod(i // 2, EMOJI_RANGE)
+        emoji = chr(EMOJI_BASE + high) + ZWJ + chr(EMOJI_BASE + low)
+        yield {
+            "emoji": emoji,
+            "description": f"synthetic emoji {i // 2}",
+            "aliases": [f"emoji_{i}", f"emoji_{i + 1}"][: size - i],
+            "tags": ["benchmark"],
+        }
+
+
+def synthetic_snippets(size: int) -> Iterator[AlfredSnippet]:
+    """Generate size snippets from synthetic gemoji entries."""
+    for entry in synthetic_gemoji(size):
+        for alias in entry["aliases"]:
+            yield AlfredSnippet.from_gemoji(entry, alias)
+
+
+def their_snippets(
+    snippets: Iterable[AlfredSnippet],
+) -> Iterator[AlfredSnippet]:
+    """Derive the snippets of another pack to compare with.
+
+    Keywords are wrapped in colons like in Joel's pack. Some snippets are
+    missing, and some others have a different emoji.
+    """
+    for i, snippet in enumerate(snippets):
+        if i % CHANGE_PERIOD == 0:
+            continue
+        emoji = snippet.snippet
+        if i % CHANGE_PERIOD == 1:
+            emoji += EMOJI_VS + EMOJI_VS
+        keyword = f":{snippet.keyword}:"
+        yield AlfredSnippet(keyword, snippet.name, emoji, snippet.uid)
+
+
+def _dump_macos_plist(pack: SnippetPack, output_path: Path) -> None:
+    """Write an XML plist from a list of all expansions, with plistlib.
+
+    This is the reference for SnippetPack.write_macos_plist, which streams the
+    same bytes.
+    """
+    expansions = [
+        {
+            "phrase": snippet.snippet,
+            "shortcut": (
+                f"{pack.prefix}{macos_keyword(snippet.keyword)}{pack.suffix}"
+            ),
+        }
+        for snippet in pack.snippets
+    ]
+    with output_path.open("wb") as f:
+        plistlib.dump(expansions, f)
+
+
+def lookup_requests(snippets: Iterable[AlfredSnippet]) -> list[bytes]:
+    """Make HTTP requests for the lookup server, one per snippet.
+
+    Keyword lookups, emoji lookups and completions of the first half of the
+    keyword alternate, with at most LOAD_REQUESTS in total.
+    """
+    requests = []
+    for i, snippet in enumerate(snippets):
+        if i == LOAD_REQUESTS:
+            break
+        kind = i % 3
+        if kind == 0:
+            target = f"/keyword/{quote(snippet.keyword)}"
+        elif kind == 1:
+            target = f"/emoji/{quote(snippet.snippet)}"
+        else:
+            prefix = snippet.keyword[: len(snippet.keyword) // 2]
+            target = f"/complete/{quote(prefix)}?limit=10"
+        requests.append(f"GET {target} HTTP/1.1\r\nHost: bench\r\n\r\n")
+    return [request.encode() for request in requests]
+
+
+async def _load_test(index: SnippetIndex, requests: list[bytes]) -> None:
+    """Send requests to a lookup server over concurrent connections.
+
+    Each connection sends its share of the requests one after the other,
+    waiting for each response, like clients of a local service would.
+    """
+    async with await start_server(index) as server:
+        host, port = server.sockets[0].getsockname()[:2]
+
+        async def client(own_requests: list[bytes]) -> None:
+            reader, writer = await asyncio.open_connection(host, port)
+            for request in own_requests:
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+                match = CONTENT_LENGTH.search(head)
+                if match is None:
+                    msg = f"Response without Content-Length: {head!r}"
+                    raise ValueError(msg)
+                await reader.readexactly(int(match[1]))
+            writer.close()
+            await writer.wait_closed()
+
+        await asyncio.gather(
+            *(
+                client(requests[i::LOAD_CONNECTIONS])
+                for i in range(LOAD_CONNECTIONS)
+            )
+        )
+
+
+def _generate(source: Path, output_dir: Path) -> None:
+    """Run the generate command end to end, discarding its output."""
+    args = ["generate", "--source", str(source)]
+    with (
+        contextlib.chdir(output_dir),
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        emojipack_app(args, standalone_mode=False)
+
+
+def benchmarks(size: int, workdir: Path) -> dict[str, Callable[[], object]]:
+    """Prepare the benchmarks of one size, in the order they must run.
+
+    Input files are written to workdir, the read benchmark reads the pack
+    written by the write benchmark.
+    """
+    mine = SnippetPack(":", ":", SnippetTable(synthetic_snippets(size)))
+    theirs = SnippetPack(snippets=SnippetTable(their_snippets(mine.snippets)))
+    pack_path = workdir / "Benchmark.alfredsnippets"
+    plist_path = workdir / "Benchmark.plist"
+    source_path = workdir / "gemoji.json"
+    with source_path.open("w") as f:
+        json.dump(list(synthetic_gemoji(size)), f)
+    index = SnippetIndex.from_snippets(mine.snippets)
+    requests = lookup_requests(mine.snippets)
+    return {
+        "write": lambda: mine.write(pack_path),
+        "read": lambda: SnippetPack.read(pack_path),
+        "iter_snippets": lambda: collections.deque(
+            SnippetPack.iter_snippets(pack_path), maxlen=0
+        ),
+        "write_macos_plist": lambda: mine.write_macos_plist(plist_path),
+        "write_macos_plist_binary": lambda: mine.write_macos_plist(
+            plist_path, binary=True
+        ),
+        "dump_macos_plist": lambda: _dump_macos_plist(mine, plist_path),
+        "compare_emojis": lambda: compare_emojis(theirs, mine),
+        "compare_keywords": lambda: compare_keywords(theirs, mine),
+        "generate": lambda: _generate(source_path, workdir),
+        "serve_lookups": lambda: asyncio.run(_load_test(index, requests)),
+    }
+
+
+def measure(
+    name: str, size: int, func: Callable[[], object], repeat: int = 1
+) -> BenchmarkResult:
+    """Time func, keeping the best of repeat runs, then trace its memory.
+
+    Memory is traced in a separate run, since tracemalloc slows down
+    allocations. The peak only counts memory allocated during the call.
+    """
+    seconds = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(name, size, seconds, peak_bytes)
+
+
+def run_suite(
+    sizes: Iterable[int],
+    workdir: Path,
+    repeat: int = 1,
+    names: Iterable[str] | None = None,
+) -> Iterator[BenchmarkResult]:
+    """Run the benchmarks for each size, all of them unless names are given.
+
+    Each size uses its own subdirectory of workdir.
+    """
+    selected = None if names is None else set(names)
+    for size in sizes:
+        size_dir = workdir / str(size)
+        size_dir.mkdir(parents=True, exist_ok=True)
+        for name, func in benchmarks(size, size_dir).items():
+            # Read needs the pack written by write, which is always run.
+            if selected is None or name in selected or name == "write":
+                yield measure(name, size, func, repeat)
+
+
+def save_results(path: Path, results: Iterable[BenchmarkResult]) -> None:
+    """Save benchmark results to a JSON file, with the platform details."""
+    data = {
+        "format": RESULTS_FORMAT,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [asdict(result) for result in results],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def load_results(path: Path) -> list[BenchmarkResult]:
+    """Load benchmark results saved by save_results."""
+    data = json.loads(path.read_text())
+    if data.get("format") != RESULTS_FORMAT:
+        msg = f"Unsupported benchmark results format in {path}"
+        raise ValueError(msg)
+    return [BenchmarkResult(**result) for result in data["results"]]
+
+
+def find_regressions(
+    baseline: Iterable[BenchmarkResult],
+    current: Iterable[BenchmarkResult],
+    tolerance: float,
+) -> list[Regression]:
+    """Find metrics that grew by more than tolerance, as a ratio.
+
+    Benchmarks missing from the baseline are ignored.
+    """
+    previous = {(result.name, result.size): result for result in baseline}
+    regressions = []
+    for result in current:
+        old = previous.get((result.name, result.size))
+        if old is None:
+            continue
+        metrics = (
+            ("seconds", old.seconds, result.seconds),
+            ("peak_bytes", old.peak_bytes, result.peak_bytes),
+        )
+        for metric, before, after in metrics:
+            if after > before * (1 + tolerance):
+                regressions.append(
+                    Regression(result.name, result.size, metric, before, after)
+                )
+    return regressions
+
+
+# Typer commands take one argument per option
+@app.command()
+def main(  # noqa: PLR0913
+    size: list[int] | None = None,
+    only: list[str] | None = None,
+    repeat: int = 3,
+    workdir: Path = Path("build/benchmarks"),
+    output: Path = Path("build/benchmarks.json"),
+    baseline: Path | None = None,
+    tolerance: float = 0.25,
+) -> None:
+    """Benchmark emojipack on synthetic packs of 10k, 100k and 1M snippets.
+
+    Results are saved as JSON to output. When a baseline results file is given,
+    exit with an error if any time or peak memory grew by more than tolerance.
+    """
+    results = []
+    for result in run_suite(size or DEFAULT_SIZES, workdir, repeat, only):
+        typer.echo(
+            f"{result.name:>24} {result.size:>9} "
+            f"{result.seconds:10.4f}s {result.peak_bytes / 2**20:10.1f}MiB"
+        )
+        results.append(result)
+    save_results(output, results)
+    if baseline is None:
+        return
+    regressions = find_regressions(load_results(baseline), results, tolerance)
+    for regression in regressions:
+        typer.echo(f"Regression: {regression}", err=True)
+    if regressions:
+        raise typer.Exit(1)
@@ -0,0 +1,544 @@
+"""Zip archive assembly from members compressed ahead of time."""
+
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Self
+
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+END_RECORD64 = struct.Struct("<4sQ2H2L4Q")
+END_LOCATOR64 = struct.Struct("<4sLQL")
+ZIP64_EXTRA = struct.Struct("<2HQ")
+EXTRA_HEADER = struct.Struct("<2H")
+ZIP64_SIZES = struct.Struct("<2Q")
+ZIP64_FIELD = struct.Struct("<Q")
+DATA_DESCRIPTOR = struct.Struct("<3L")
+DATA_DESCRIPTOR64 = struct.Struct("<L2Q")
+
+VERSION = 20  # Version needed to extract: deflate
+VERSION64 = 45  # Version needed to extract: zip64 extensions
+UNIX_SYSTEM = 3
+UTF8_FLAG = 0x800
+DATA_DESCRIPTOR_FLAG = 0x8  # Sizes and CRC-32 follow the member data
+ZIP64_EXTRA_ID = 1
+FILE_ATTRIBUTES = 0o600 << 16  # Same as zipfile.ZipFile.writestr
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+MAX_COMMENT_SIZE = 0xFFFF
+CENTRAL_SPOOL_SIZE = 1 << 20  # Central directory bytes kept in memory
+COPY_CHUNK_SIZE = 1 << 16
+# Timestamp of all members, so that archives of the same content are identical
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# Archive comment recording the zlib level of all deflated members
+LEVEL_COMMENT = b"zlib level "
+
+
+@dataclass(frozen=True)
+class CompressedMember:
+    """Archive member with its payload already compressed."""
+
+    name: str
+    data: bytes  # Compressed payload, raw deflate or stored
+    crc: int  # CRC-32 of the uncompressed content
+    file_size: int  # Size of the uncompressed content
+    compress_type: int  # zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED
+    level: int | None = None  # Zlib level of deflated data, None if unknown
+
+
+def compress(name: str, content: bytes, level: int | None) -> CompressedMember:
+    """Compress member content, store it uncompressed if level is None."""
+    if level is None:
+        data = content
+        compress_type = zipfile.ZIP_STORED
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(content) + compressor.flush()
+        compress_type = zipfile.ZIP_DEFLATED
+    return CompressedMember(
+        name=name,
+        data=data,
+        crc=zlib.crc32(content),
+        file_size=len(content),
+        compress_type=compress_type,
+        level=level,
+    )
+
+
+def is_encoded(
+    member: CompressedMember, content: bytes, level: int | None
+) -> bool:
+    """Tell if member holds content, compressed as level would.
+
+    Deflated members must have been compressed at the same level, so that they
+    are identical to compressed content. The content is compared in full.
+    """
+    if level is None:
+        return member.compress_type == zipfile.ZIP_STORED and (
+            member.data == content
+        )
+    if member.compress_type != zipfile.ZIP_DEFLATED or member.level != level:
+        return False
+    if member.file_size != len(content) or member.crc != zlib.crc32(content):
+        return False
+    return zlib.decompress(member.data, -zlib.MAX_WBITS) == content
+
+
+def _level_comment(levels: set[int | None]) -> bytes:
+    """Return the archive comment for the levels of deflated members."""
+    if len(levels) != 1:
+        return b""
+    (level,) = levels
+    return b"" if level is None else LEVEL_COMMENT + str(level).encode()
+
+
+def _comment_level(comment: bytes) -> int | None:
+    """Return the level recorded in an archive comment, None if missing."""
+    digits = comment.removeprefix(LEVEL_COMMENT)
+    if digits == comment or not digits.isdigit():
+        return None
+    return int(digits)
+
+
+class ArchiveReader:
+    """Read members of a zip archive as stored, without decompressing them.
+
+    The level of deflated members is the one recorded by ArchiveWriter in the
+    archive comment, None for other archives.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Open archive at path and read its central directory."""
+        with zipfile.ZipFile(path) as zf:
+            self._infos = {info.filename: info for info in zf.infolist()}
+            self.compresslevel = _comment_level(zf.comment)
+        self._file = path.open("rb")
+
+    def __enter__(self) -> Self:
+        """Return self, the archive file is closed on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the archive file."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the archive file."""
+        self._file.close()
+
+    def get(self, name: str) -> CompressedMember | None:
+        """Return the member with name as stored, or None if missing."""
+        info = self._infos.get(name)
+        if info is None:
+            return None
+        self._file.seek(info.header_offset)
+        header = LOCAL_HEADER.unpack(self._file.read(LOCAL_HEADER.size))
+        name_length, extra_length = header[-2:]
+        self._file.seek(name_length + extra_length, 1)
+        deflated = info.compress_type == zipfile.ZIP_DEFLATED
+        return CompressedMember(
+            name=name,
+            data=self._file.read(info.compress_size),
+            crc=info.CRC,
+            file_size=info.file_size,
+            compress_type=info.compress_type,
+            level=self.compresslevel if deflated else None,
+        )
+
+
+def _zip64_sizes(extra: bytes) -> tuple[int, int] | None:
+    """Return file and compressed sizes of a zip64 extra field, if any."""
+    offset = 0
+    while offset + EXTRA_HEADER.size <= len(extra):
+        header_id, size = EXTRA_HEADER.unpack_from(extra, offset)
+        offset += EXTRA_HEADER.size
+        if header_id == ZIP64_EXTRA_ID and size >= ZIP64_SIZES.size:
+            file_size, compress_size = ZIP64_SIZES.unpack_from(extra, offset)
+            return file_size, compress_size
+        offset += size
+    return None
+
+
+def _zip64_field(extra: bytes, index: int) -> int:
+    """Return a field of the zip64 extra field of a central header.
+
+    The field holds the value of the index-th central header field set to
+    ZIP64_LIMIT, in the order file size, compressed size, header offset.
+    """
+    offset = 0
+    while offset + EXTRA_HEADER.size <= len(extra):
+        header_id, size = EXTRA_HEADER.unpack_from(extra, offset)
+        offset += EXTRA_HEADER.size
+        if header_id == ZIP64_EXTRA_ID and size >= (index + 1) * 8:
+            value: int = ZIP64_FIELD.unpack_from(extra, offset + index * 8)[0]
+            return value
+        offset += size
+    msg = "Missing zip64 extra field"
+    raise zipfile.BadZipFile(msg)
+
+
+def _find_central_directory(fileobj: BinaryIO) -> tuple[int, int, int]:
+    """Return the member count, offset and size of the central directory.
+
+    The end record is searched in the last bytes of the file, which may end
+    with a comment, and the zip64 end record is read if it is located.
+    """
+    file_size = fileobj.seek(0, os.SEEK_END)
+    tail_start = max(0, file_size - END_RECORD.size - MAX_COMMENT_SIZE)
+    fileobj.seek(tail_start)
+    tail = fileobj.read()
+    position = len(tail)
+    while (position := tail.rfind(b"PK\x05\x06", 0, position)) >= 0:
+        if position + END_RECORD.size > len(tail):
+            continue
+        fields = END_RECORD.unpack_from(tail, position)
+        count, size, start, comment_size = fields[4:]
+        if position + END_RECORD.size + comment_size == len(tail):
+            break
+    else:
+        msg = "End of central directory record not found"
+        raise zipfile.BadZipFile(msg)
+    locator_position = position - END_LOCATOR64.size
+    if locator_position >= 0 and tail.startswith(
+        b"PK\x06\x07", locator_position
+    ):
+        end64_offset = END_LOCATOR64.unpack_from(tail, locator_position)[2]
+        fileobj.seek(end64_offset)
+        fields = END_RECORD64.unpack(fileobj.read(END_RECORD64.size))
+        if fields[0] != b"PK\x06\x06":
+            msg = "Bad zip64 end of central directory record"
+            raise zipfile.BadZipFile(msg)
+        count, size, start = fields[7:]
+    return count, start, size
+
+
+def read_directory(fileobj: BinaryIO) -> tuple[list[str], array[int]]:
+    """Return member names and local header offsets, in directory order.
+
+    Only the end records and the central directory are read, and nothing else
+    is kept of the members, so that opening a large archive stays cheap. Read
+    members with read_member. Raise zipfile.BadZipFile on corrupt data.
+    """
+    count, start, size = _find_central_directory(fileobj)
+    fileobj.seek(start)
+    directory = fileobj.read(size)
+    names = []
+    offsets = array("Q")
+    position = 0
+    for _ in range(count):
+        if not directory.startswith(b"PK\x01\x02", position):
+            msg = "Bad central directory file header"
+            raise zipfile.BadZipFile(msg)
+        fields = CENTRAL_HEADER.unpack_from(directory, position)
+        flags = fields[5]
+        compress_size, file_size, name_length, extra_length = fields[10:14]
+        comment_length, offset = fields[14], fields[18]
+        position += CENTRAL_HEADER.size
+        raw_name = directory[position : position + name_length]
+        names.append(
+            raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437")
+        )
+        position += name_length
+        if offset == ZIP64_LIMIT:
+            extra = directory[position : position + extra_length]
+            index = (file_size == ZIP64_LIMIT) + (compress_size == ZIP64_LIMIT)
+            offset = _zip64_field(extra, index)
+        offsets.append(offset)
+        position += extra_length + comment_length
+    return names, offsets
+
+
+def _inflate(fileobj: BinaryIO) -> bytes:
+    """Decompress raw deflate data of unknown size, stopping at its end."""
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    parts = []
+    while not decompressor.eof:
+        chunk = fileobj.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            msg = "Truncated deflate data"
+            raise zipfile.BadZipFile(msg)
+        parts.append(decompressor.decompress(chunk))
+    fileobj.seek(-len(decompressor.unused_data), os.SEEK_CUR)
+    return b"".join(parts)
+
+
+def _read_descriptor(fileobj: BinaryIO, *, zip64: bool) -> int:
+    """Read the data descriptor after member data, return its CRC-32."""
+    signature = fileobj.read(4)
+    if signature != b"PK\x07\x08":  # The signature is optional
+        fileobj.seek(-len(signature), os.SEEK_CUR)
+    descriptor = DATA_DESCRIPTOR64 if zip64 else DATA_DESCRIPTOR
+    crc: int = descriptor.unpack(fileobj.read(descriptor.size))[0]
+    return crc
+
+
+def _described_sizes(fileobj: BinaryIO) -> dict[int, int]:
+    """Map offsets of members with a data descriptor to their data size.
+
+    The sizes are read from the central directory, which is only needed for
+    stored members with a data descriptor, since the end of their data is not
+    marked. The position in fileobj is kept.
+    """
+    position = fileobj.tell()
+    with zipfile.ZipFile(fileobj) as zf:
+        sizes = {
+            info.header_offset: info.compress_size
+            for info in zf.infolist()
+            if info.flag_bits & DATA_DESCRIPTOR_FLAG
+        }
+    fileobj.seek(position)
+    return sizes
+
+
+def _read_described(
+    fileobj: BinaryIO,
+    compress_type: int,
+    offset: int,
+    described_sizes: dict[int, int],
+) -> bytes:
+    """Read the data of the member at offset, followed by a data descriptor.
+
+    Deflated data ends by itself. The size of stored data is looked up in
+    described_sizes, filled from the central directory on first use.
+    """
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return _inflate(fileobj)
+    if not described_sizes:
+        described_sizes.update(_described_sizes(fileobj))
+    size = described_sizes.get(offset)
+    if size is None:
+        msg = f"Member at {offset} missing from the central directory"
+        raise zipfile.BadZipFile(msg)
+    return _decompress(fileobj.read(size), compress_type)
+
+
+def _decompress(data: bytes, compress_type: int) -> bytes:
+    """Decompress member data, stored or deflated."""
+    if compress_type == zipfile.ZIP_STORED:
+        return data
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(data, -zlib.MAX_WBITS)
+    msg = f"Unsupported compression method: {compress_type}"
+    raise NotImplementedError(msg)
+
+
+def read_member(
+    fileobj: BinaryIO,
+    offset: int,
+    described_sizes: dict[int, int] | None = None,
+) -> tuple[str, bytes]:
+    """Read the member whose local header is at offset, decompressed.
+
+    Return its name and content, and leave fileobj at the end of its data. Pass
+    the same described_sizes for all members of an archive, see iter_members.
+    Raise zipfile.BadZipFile on corrupt data.
+    """
+    if described_sizes is None:
+        described_sizes = {}
+    fileobj.seek(offset)
+    header = fileobj.read(LOCAL_HEADER.size)
+    if len(header) < LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+        msg = "Bad local file header"
+        raise zipfile.BadZipFile(msg)
+    fields = LOCAL_HEADER.unpack(header)
+    flags, compress_type = fields[3:5]
+    crc, compress_size, file_size, name_length, extra_length = fields[7:]
+    raw_name = fileobj.read(name_length)
+    name = raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437")
+    zip64_sizes = _zip64_sizes(fileobj.read(extra_length))
+    if zip64_sizes is not None:
+        file_size, compress_size = zip64_sizes
+    if not flags & DATA_DESCRIPTOR_FLAG:
+        data = fileobj.read(compress_size)
+        content = _decompress(data, compress_type)
+        if len(content) != file_size:
+            msg = f"Bad size for member {name}"
+            raise zipfile.BadZipFile(msg)
+    else:
+        content = _read_described(
+            fileobj, compress_type, offset, described_sizes
+        )
+        crc = _read_descriptor(fileobj, zip64=zip64_sizes is not None)
+    if zlib.crc32(content) != crc:
+        msg = f"Bad CRC-32 for member {name}"
+        raise zipfile.BadZipFile(msg)
+    return name, content
+
+
+def iter_members(fileobj: BinaryIO) -> Iterator[tuple[str, bytes]]:
+    """Read the members of a zip archive in file order, decompressed.
+
+    Only local headers are read, so that memory use does not grow with the
+    number of members. The central directory is only read, once, for archives
+    with stored members followed by a data descriptor, whose size is not in
+    their local header. Raise zipfile.BadZipFile on corrupt data.
+    """
+    described_sizes: dict[int, int] = {}  # Read on first use
+    while True:
+        offset = fileobj.tell()
+        if fileobj.read(4) in {b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06"}:
+            return  # Central directory or end records, after the members
+        yield read_member(fileobj, offset, described_sizes)
+
+
+def _dos_date_time(date_time: tuple[int, ...]) -> tuple[int, int]:
+    """Convert (year, month, day, hour, minute, second) to MS-DOS format."""
+    year, month, day, hour, minute, second = date_time[:6]
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_date, dos_time
+
+
+class ArchiveWriter:
+    """Write a zip archive, one precompressed member at a time.
+
+    Members are appended in the order they are added. Their central directory
+    records are spooled to a temporary file, so memory use does not grow with
+    the number of members, and copied at the end of the archive on close,
+    switching to zip64 records when the member count or offsets exceed the
+    classic zip limits. When all deflated members have the same known level, it
+    is recorded in the archive comment, for ArchiveReader.
+    """
+
+    def __init__(
+        self, fileobj: BinaryIO, date_time: tuple[int, ...] = FIXED_DATE_TIME
+    ) -> None:
+        """Initialize with a writable binary file and member timestamp."""
+        self._fileobj = fileobj
+        self._dos_date, self._dos_time = _dos_date_time(date_time)
+        # Closed once copied into the archive, in close().
+        self._central = tempfile.SpooledTemporaryFile(  # noqa: SIM115
+            CENTRAL_SPOOL_SIZE
+        )
+        self._count = 0
+        self._offset = 0
+        self._levels: set[int | None] = set()  # Of deflated members
+
+    def __enter__(self) -> Self:
+        """Return self, the central directory is written on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Write the central directory if no exception occurred."""
+        if exc_type is None:
+            self.close()
+
+    def _write(self, data: bytes) -> None:
+        self._fileobj.write(data)
+        self._offset += len(data)
+
+    def add(self, member: CompressedMember) -> None:
+        """Append a local file header and the member payload."""
+        try:
+            encoded_name = member.name.encode("ascii")
+            flags = 0
+        except UnicodeEncodeError:
+            encoded_name = member.name.encode()
+            flags = UTF8_FLAG
+        header_offset = self._offset
+        header = LOCAL_HEADER.pack(
+            b"PK\x03\x04",
+            VERSION,
+            0,
+            flags,
+            member.compress_type,
+            self._dos_time,
+            self._dos_date,
+            member.crc,
+            len(member.data),
+            member.file_size,
+            len(encoded_name),
+            0,
+        )
+        self._write(header + encoded_name)
+        self._write(member.data)
+        extra = b""
+        version = VERSION
+        if header_offset > ZIP64_LIMIT:
+            extra = ZIP64_EXTRA.pack(1, 8, header_offset)
+            header_offset = ZIP64_LIMIT
+            version = VERSION64
+        central_header = CENTRAL_HEADER.pack(
+            b"PK\x01\x02",
+            version,
+            UNIX_SYSTEM,
+            version,
+            0,
+            flags,
+            member.compress_type,
+            self._dos_time,
+            self._dos_date,
+            member.crc,
+            len(member.data),
+            member.file_size,
+            len(encoded_name),
+            len(extra),
+            0,
+            0,
+            0,
+            FILE_ATTRIBUTES,
+            header_offset,
+        )
+        self._central.write(central_header + encoded_name + extra)
+        self._count += 1
+        if member.compress_type == zipfile.ZIP_DEFLATED:
+            self._levels.add(member.level)
+
+    def close(self) -> None:
+        """Write the central directory and end of archive records."""
+        start = self._offset
+        self._central.seek(0)
+        while chunk := self._central.read(COPY_CHUNK_SIZE):
+            self._write(chunk)
+        self._central.close()
+        size = self._offset - start
+        count = self._count
+        if (
+            count >= ZIP64_COUNT_LIMIT
+            or start > ZIP64_LIMIT
+            or size > ZIP64_LIMIT
+        ):
+            end64_offset = self._offset
+            self._write(
+                END_RECORD64.pack(
+                    b"PK\x06\x06",
+                    END_RECORD64.size - 12,
+                    VERSION64,
+                    VERSION64,
+                    0,
+                    0,
+                    count,
+                    count,
+                    size,
+                    start,
+                )
+            )
+            self._write(END_LOCATOR64.pack(b"PK\x06\x07", 0, end64_offset, 1))
+            count = min(count, ZIP64_COUNT_LIMIT)
+            size = min(size, ZIP64_LIMIT)
+            start = min(start, ZIP64_LIMIT)
+        comment = _level_comment(self._levels)
+        self._write(
+            END_RECORD.pack(
+                b"PK\x05\x06", 0, 0, count, count, size, start, len(comment)
+            )
+            + comment
+        )
@@ -1,28 +1,87 @@
 """Command line interface for emojipack."""
-# ruff: noqa: FBT001, FBT002
+# ruff: noqa: FBT001, FBT002, PLR0913, PLC0415
 # Boolean arguments are required for typer CLI flags
+# Typer commands take one argument per option
+# Commands import the modules they use, so that the CLI starts fast
 
-import importlib.resources
+import contextlib
+import json
 import shlex
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TypedDict
+from typing import TYPE_CHECKING, TypedDict
 
 import typer
-import yaml
-
-from emojipack.comparison import (
-    EmojiMatch,
-    KeywordMatch,
-    SnippetPackComparison,
-    compare_packs,
-)
-from emojipack.download import fetch_gemoji_data
-from emojipack.pack import SnippetPack
-from emojipack.snippets import AlfredSnippet
+
+from emojipack import profiling
+from emojipack.profiling import annotate, stage, timed
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from emojipack.comparison import (
+        EmojiMatch,
+        EmojiRecord,
+        KeywordMatch,
+        KeywordRecord,
+        PackDelta,
+        PresenceIndex,
+        SnippetPackComparison,
+    )
+    from emojipack.download import GemojiEntry
+    from emojipack.pack import SnippetPack, SnippetPackWriter
+    from emojipack.server import SnippetIndex
+    from emojipack.snippets import AlfredSnippet
+
+OUTPUT_EXTENSIONS = {
+    "alfred": ".alfredsnippets",
+    "trie": ".trie",
+}  # Outputs other than the streaming exporters of EXPORT_FORMATS
+PLIST_FORMATS = ("xml", "binary")
+COMPARE_FORMATS = ("yaml", "json", "jsonl")
+UNCHANGED_STATUSES = {"found", "matching"}  # Skipped by compare --format jsonl
 
 app = typer.Typer()
 
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    timings: bool = False,
+    trace_memory: bool = False,
+    profile: Path | None = None,
+) -> None:
+    """Generate and compare emoji snippet packs.
+
+    With --timings, report the wall time of each stage of the command and the
+    peak resident memory of the process after it on stderr. With
+    --trace-memory, report the peak memory allocated in each stage instead,
+    which slows the command down severalfold. With --profile, save cProfile
+    statistics of the command to the given file, for pstats or snakeviz.
+    """
+    if timings or trace_memory:
+        profiler = profiling.enable(trace_memory=trace_memory)
+
+        def report() -> None:
+            profiling.disable()
+            for line in profiler.report():
+                typer.echo(line, err=True)
+
+        ctx.call_on_close(report)
+    if profile is not None:
+        import cProfile
+
+        python_profiler = cProfile.Profile()
+        python_profiler.enable()
+
+        def dump() -> None:
+            python_profiler.disable()
+            python_profiler.dump_stats(profile)
+
+        ctx.call_on_close(dump)
+
+
 class EmojisNormal(TypedDict):
     """Emoji comparison output in normal mode."""
 
@@ -75,48 +134,500 @@ class CompareOutputVerbose(TypedDict):
     keywords: KeywordsVerbose
 
 
+@dataclass(frozen=True)
+class OutputSpec:
+    """Output file of the generate command, with its keyword settings."""
+
+    kind: str  # A key of OUTPUT_EXTENSIONS or EXPORT_FORMATS
+    path: Path
+    prefix: str
+    suffix: str
+    binary: bool = False  # Binary rather than XML plist, for macos
+
+
+def _parse_output(spec: str, prefix: str, suffix: str) -> OutputSpec:
+    """Parse a KIND[,prefix=P][,suffix=S][,path=FILE][,format=F] spec."""
+    from emojipack.exporters import EXPORT_FORMATS
+
+    kind, *options = spec.split(",")
+    if kind in EXPORT_FORMATS:
+        extension = EXPORT_FORMATS[kind].extension
+    elif kind in OUTPUT_EXTENSIONS:
+        extension = OUTPUT_EXTENSIONS[kind]
+    else:
+        msg = f"Unknown output kind: {kind}"
+        raise typer.BadParameter(msg, param_hint="--output")
+    settings = {
+        "prefix": prefix,
+        "suffix": suffix,
+        "path": f"Emoji Pack{extension}",
+    }
+    if kind == "macos":
+        settings["format"] = "xml"
+    for option in options:
+        key, separator, value = option.partition("=")
+        if not separator or key not in settings:
+            msg = f"Invalid output option: {option}"
+            raise typer.BadParameter(msg, param_hint="--output")
+        settings[key] = value
+    if settings.get("format", "xml") not in PLIST_FORMATS:
+        msg = f"Unknown plist format: {settings['format']}"
+        raise typer.BadParameter(msg, param_hint="--output")
+    return OutputSpec(
+        kind,
+        Path(settings["path"]),
+        settings["prefix"],
+        settings["suffix"],
+        binary=settings.get("format") == "binary",
+    )
+
+
+def _alfred_packs(
+    outputs: list[OutputSpec],
+) -> "dict[Path, SnippetPack]":
+    """Create the empty packs of Alfred outputs, with their settings."""
+    import importlib.resources
+
+    from emojipack.pack import SnippetPack
+
+    alfred_packs: dict[Path, SnippetPack] = {}
+    with importlib.resources.path("emojipack", "icon.png") as icon_path:
+        for spec in outputs:
+            if spec.kind == "alfred":
+                pack = SnippetPack(spec.prefix, spec.suffix)
+                pack.set_icon(icon_path)
+                alfred_packs[spec.path] = pack
+    return alfred_packs
+
+
+def _report_reused(writer: "SnippetPackWriter", previous: Path) -> None:
+    """Tell how many snippets were copied from the previous pack."""
+    annotate(f"{writer.reused} reused")
+    output_quoted = shlex.quote(str(previous))
+    typer.echo(
+        f"Reused {writer.reused} unchanged snippets from {output_quoted}"
+    )
+
+
+def _write_outputs(
+    outputs: list[OutputSpec],
+    snippets: "Iterable[AlfredSnippet]",
+    compress_level: int | None,
+    workers: int,
+    previous: Path | None = None,
+) -> int:
+    """Write snippets to all outputs in one pass, return their count.
+
+    Alfred packs and exporter files, like XML plists, are written as snippets
+    arrive. Binary plists and keyword tries are written at the end, from
+    snippets collected in a table shared by all of them. Unchanged members of
+    the previous Alfred pack, if given, are copied from it.
+    """
+    from emojipack.exporters import EXPORT_FORMATS
+    from emojipack.pack import SnippetPack, open_writer
+    from emojipack.search import KeywordTrie
+    from emojipack.table import SnippetTable
+
+    alfred_packs = _alfred_packs(outputs)
+    binary_outputs = [spec for spec in outputs if spec.binary]
+    streamed_outputs = [
+        spec
+        for spec in outputs
+        if spec.kind in EXPORT_FORMATS and not spec.binary
+    ]
+    trie_outputs = [spec for spec in outputs if spec.kind == "trie"]
+    table = SnippetTable()
+    count = 0
+    with contextlib.ExitStack() as stack:
+        adders: list[Callable[[AlfredSnippet], None]] = []
+        if binary_outputs or trie_outputs:
+            adders.append(table.append)
+        for spec in streamed_outputs:
+            exporter = EXPORT_FORMATS[spec.kind].exporter
+            stream = exporter(spec.path, spec.prefix, spec.suffix)
+            adders.append(stack.enter_context(stream).add)
+        writer = None
+        if alfred_packs:
+            writer = open_writer(
+                alfred_packs, compress_level, workers, previous
+            )
+            adders.append(stack.enter_context(writer).add)
+        for snippet in snippets:
+            count += 1
+            for add in adders:
+                add(snippet)
+    if writer is not None and previous is not None:
+        _report_reused(writer, previous)
+    for spec in binary_outputs:
+        pack = SnippetPack(spec.prefix, spec.suffix, table)
+        pack.write_macos_plist(spec.path, binary=True)
+    if trie_outputs:
+        trie = KeywordTrie.from_snippets(table)
+        for spec in trie_outputs:
+            trie.save(spec.path)
+    return count
+
+
+def _delta(
+    previous_path: Path,
+    snippets: "Iterable[AlfredSnippet]",
+    prefix: str,
+    suffix: str,
+) -> "PackDelta":
+    """Compare snippets with a previous .alfredsnippets or macOS plist.
+
+    A plist only keeps macOS keywords and emojis, so snippets are compared in
+    that form, and changes are reported with their full snippets.
+    """
+    from emojipack.comparison import PackDelta, delta_packs
+    from emojipack.exporters import EXPORT_FORMATS
+    from emojipack.pack import SnippetPack, macos_snippet
+    from emojipack.table import SnippetTable
+
+    table = SnippetTable(snippets)
+    if previous_path.suffix != EXPORT_FORMATS["macos"].extension:
+        previous = SnippetPack.read(previous_path)
+        return delta_packs(previous, SnippetPack(snippets=table))
+    previous = SnippetPack.read_macos_plist(previous_path, prefix, suffix)
+    view = [macos_snippet(snippet) for snippet in table]
+    originals = {
+        seen.uid: snippet for seen, snippet in zip(view, table, strict=True)
+    }
+    delta = delta_packs(previous, SnippetPack(snippets=view))
+    return PackDelta(
+        [originals[snippet.uid] for snippet in delta.added],
+        [originals[snippet.uid] for snippet in delta.changed],
+        delta.removed,
+    )
+
+
+def _write_delta_manifest(
+    path: Path, previous_path: Path, delta: "PackDelta"
+) -> None:
+    """Write the uids added, changed and removed since the previous pack."""
+    manifest = {
+        "previous": previous_path.name,
+        "added": sorted(snippet.uid for snippet in delta.added),
+        "changed": sorted(snippet.uid for snippet in delta.changed),
+        "removed": sorted(snippet.uid for snippet in delta.removed),
+    }
+    text = json.dumps(manifest, ensure_ascii=False, indent=2)
+    path.write_text(text + "\n", encoding="utf-8")
+
+
 @app.command()
 def generate(
     macos: bool = False,
     prefix: str = ":",
     suffix: str = ":",
+    compress_level: int | None = None,
+    workers: int = 1,
+    source: Path | None = None,
+    output: list[str] | None = None,
+    incremental: bool = False,
+    delta_from: Path | None = None,
 ) -> None:
-    """Generate Emoji Snippet Pack for Alfred."""
-    emoji_data = fetch_gemoji_data()
-    snippets = [
-        AlfredSnippet.from_gemoji(entry, alias)
-        for entry in emoji_data
-        for alias in entry["aliases"]
-    ]
-    pack = SnippetPack(prefix, suffix, snippets=snippets)
-    if macos:
-        output_path = Path("Emoji Pack.plist")
-        pack.write_macos_plist(output_path)
+    """Generate Emoji Snippet Pack for Alfred.
+
+    Emoji data is downloaded from gemoji, unless a gemoji-format JSON file is
+    given as source. The file is then processed as a stream, entry by entry.
+
+    Several files can be generated from a single pass over the emoji data by
+    repeating --output KIND[,prefix=P][,suffix=S][,path=FILE], where KIND is
+    alfred, macos, espanso, raycast, textexpander, or trie for the keyword
+    index used by search. Prefix and suffix default to the --prefix and
+    --suffix options. Snippets are encoded only once for all the Alfred packs.
+    macOS plists are XML, or binary with format=binary, which is smaller and
+    faster to load.
+
+    Packs of the same emoji data are identical, byte for byte. With
+    --incremental, snippets unchanged since the existing Alfred pack are copied
+    from it rather than compressed again.
+
+    With --delta-from set to a previous .alfredsnippets pack or macOS plist,
+    outputs only hold the snippets added or changed since, and the uids to
+    remove are listed in a NAME.removed.json manifest named after the first
+    output.
+    """
+    if output is None:
+        output = ["macos" if macos else "alfred"]
+    elif macos:
+        msg = "--macos cannot be combined with --output, use --output macos"
+        raise typer.BadParameter(msg, param_hint="--macos")
+    outputs = [_parse_output(spec, prefix, suffix) for spec in output]
+    if len({spec.path for spec in outputs}) < len(outputs):
+        msg = "Output paths must be distinct, set them with path=FILE"
+        raise typer.BadParameter(msg, param_hint="--output")
+    from emojipack.download import fetch_gemoji_data, read_gemoji_file
+    from emojipack.snippets import AlfredSnippet
+
+    emoji_data: Iterable[GemojiEntry]
+    if source is None:
+        emoji_data = fetch_gemoji_data()
+    else:
+        emoji_data = timed("parse", read_gemoji_file(source))
+    snippets = timed(
+        "snippets",
+        (
+            AlfredSnippet.from_gemoji(entry, alias)
+            for entry in emoji_data
+            for alias in entry["aliases"]
+        ),
+    )
+    previous = None
+    if incremental:
+        alfred_paths = (spec.path for spec in outputs if spec.kind == "alfred")
+        previous = next((path for path in alfred_paths if path.exists()), None)
+    delta: PackDelta | None = None
+    if delta_from is not None:
+        with stage("delta"):
+            delta = _delta(delta_from, snippets, prefix, suffix)
+        snippets = iter(delta.snippets)
+    with stage("write"):
+        count = _write_outputs(
+            outputs, snippets, compress_level, workers, previous
+        )
+    if delta_from is not None and delta is not None:
+        first_path = outputs[0].path
+        manifest_path = first_path.with_name(f"{first_path.stem}.removed.json")
+        _write_delta_manifest(manifest_path, delta_from, delta)
+        typer.echo(
+            f"Delta from {shlex.quote(str(delta_from))}: "
+            f"{len(delta.added)} added, {len(delta.changed)} changed, "
+            f"{len(delta.removed)} removed, listed in "
+            f"{shlex.quote(str(manifest_path))}"
+        )
+    for spec in outputs:
+        output_quoted = shlex.quote(str(spec.path))
+        typer.echo(f"Generated {output_quoted} with {count} snippets")
+
+
+@app.command()
+def watch(
+    interval: float = 3600,
+    checks: int | None = None,
+    prefix: str = ":",
+    suffix: str = ":",
+    compress_level: int | None = None,
+    workers: int = 1,
+    output: list[str] | None = None,
+) -> None:
+    """Regenerate packs whenever gemoji data changes upstream.
+
+    Gemoji data is checked every interval seconds, with a conditional request
+    that only downloads it again if it was modified. Outputs are generated on
+    the first check, then only when the content changed, with --incremental so
+    that unchanged snippets are copied from the existing Alfred pack. Stop
+    after the given number of checks, or run until interrupted. Outputs are set
+    as for generate.
+    """
+    import requests
+
+    from emojipack.download import fetch_gemoji_key
+
+    last_key = None
+    done = 0
+    while checks is None or done < checks:
+        if done:
+            time.sleep(interval)
+        done += 1
+        try:
+            key = fetch_gemoji_key()
+        except requests.RequestException as error:
+            typer.echo(f"Could not check gemoji data: {error}", err=True)
+            continue
+        if key == last_key:
+            typer.echo("Gemoji data unchanged")
+            continue
+        generate(
+            prefix=prefix,
+            suffix=suffix,
+            compress_level=compress_level,
+            workers=workers,
+            output=output,
+            incremental=True,
+        )
+        last_key = key
+
+
+@app.command()
+def search(
+    prefix: str, index: Path = Path("Emoji Pack.trie"), limit: int = 20
+) -> None:
+    """Complete a keyword prefix, printing matching emojis and keywords.
+
+    The index is a keyword trie made by generate --output trie, or an
+    .alfredsnippets pack, which is then indexed on the fly.
+    """
+    if limit < 0:
+        msg = f"Negative limit: {limit}"
+        raise typer.BadParameter(msg, param_hint="--limit")
+    from emojipack.pack import SnippetPack
+    from emojipack.search import KeywordTrie
+
+    if index.suffix == OUTPUT_EXTENSIONS["alfred"]:
+        trie = KeywordTrie.from_snippets(SnippetPack.read(index).snippets)
+    else:
+        try:
+            trie = KeywordTrie.load(index)
+        except (FileNotFoundError, ValueError) as error:
+            raise typer.BadParameter(
+                str(error), param_hint="--index"
+            ) from None
+    for keyword, emoji in trie.complete(prefix, limit):
+        typer.echo(f"{emoji} {keyword}")
+
+
+@app.command()
+def find(query: str, limit: int = 10, source: Path | None = None) -> None:
+    """Find emojis by description, tags or keywords, tolerating typos.
+
+    The index is built from gemoji data and cached until the data changes. If a
+    gemoji-format JSON file is given as source, it is indexed instead.
+    """
+    from emojipack.download import read_gemoji_file
+    from emojipack.search import FuzzyIndex, load_fuzzy_index
+
+    if source is None:
+        index = load_fuzzy_index()
+    else:
+        index = FuzzyIndex.from_entries(read_gemoji_file(source))
+    for match in index.search(query, limit):
+        aliases = ", ".join(match.aliases)
+        typer.echo(f"{match.emoji} {match.description} ({aliases})")
+
+
+async def _serve_forever(
+    index: "SnippetIndex", host: str, port: int, socket: Path | None
+) -> None:
+    """Serve index until cancelled, announcing the address."""
+    from emojipack.server import start_server
+
+    server = await start_server(index, host, port, socket)
+    if socket is None:
+        host, port = server.sockets[0].getsockname()[:2]
+        address = f"http://{host}:{port}"
     else:
-        with importlib.resources.path("emojipack", "icon.png") as icon_path:
-            pack.set_icon(icon_path)
-        output_path = Path("Emoji Pack.alfredsnippets")
-        pack.write(output_path)
-    output_quoted = shlex.quote(str(output_path))
-    typer.echo(f"Generated {output_quoted} with {len(snippets)} snippets")
+        address = shlex.quote(str(socket))
+    typer.echo(f"Serving {len(index)} keywords on {address}")
+    async with server:
+        await server.serve_forever()
+
+
+@app.command()
+def serve(
+    pack: Path | None = None,
+    source: Path | None = None,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket: Path | None = None,
+) -> None:
+    """Answer snippet lookups over local HTTP, from indexes kept in memory.
+
+    Snippets are loaded once, from an .alfredsnippets pack, a gemoji-format
+    JSON file given as source, or else downloaded gemoji data. Requests are GET
+    /keyword/KEYWORD, /uid/UID, /emoji/EMOJI for its keywords, and
+    /complete/PREFIX?limit=N, answered in JSON. With --socket, listen on a Unix
+    socket rather than on host and port.
+    """
+    if pack is not None and source is not None:
+        msg = "--pack cannot be combined with --source"
+        raise typer.BadParameter(msg, param_hint="--source")
+    import asyncio
+
+    from emojipack.download import fetch_gemoji_data, read_gemoji_file
+    from emojipack.pack import SnippetPack
+    from emojipack.server import SnippetIndex
+    from emojipack.snippets import AlfredSnippet
+
+    with stage("index"):
+        if pack is not None:
+            snippets: Iterable[AlfredSnippet] = SnippetPack.read(pack).snippets
+        else:
+            emoji_data = (
+                fetch_gemoji_data()
+                if source is None
+                else read_gemoji_file(source)
+            )
+            snippets = (
+                AlfredSnippet.from_gemoji(entry, alias)
+                for entry in emoji_data
+                for alias in entry["aliases"]
+            )
+        index = SnippetIndex.from_snippets(snippets)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve_forever(index, host, port, socket))
+
+
+@app.command()
+def fetch(
+    sources: list[str], output_dir: Path = Path(), concurrency: int = 4
+) -> None:
+    """Download data sources concurrently: gemoji, emoji-test, joel."""
+    import asyncio
+
+    from emojipack.download import SOURCES, fetch_sources
+
+    unknown = sorted(set(sources) - SOURCES.keys())
+    if unknown:
+        msg = f"Unknown sources: {', '.join(unknown)}"
+        raise typer.BadParameter(msg, param_hint="SOURCES")
+    selected = {name: SOURCES[name] for name in sources}
+    contents = asyncio.run(fetch_sources(selected, concurrency))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, content in contents.items():
+        output_path = output_dir / selected[name].filename
+        output_path.write_bytes(content)
+        typer.echo(f"Downloaded {shlex.quote(str(output_path))}")
+
+
+class PresenceNormal(TypedDict):
+    """Presence of emojis or keywords across packs in normal mode."""
+
+    shared: dict[str, dict[str, int]]
+    missing: dict[str, dict[str, int]]
+
+
+class PresenceVerbose(TypedDict):
+    """Presence of emojis or keywords across packs in verbose mode."""
+
+    shared: dict[str, dict[str, int]]
+    missing: dict[str, dict[str, list[str]]]
+    partial: dict[str, list[str]]
+
+
+class CompareManyOutputNormal(TypedDict):
+    """Normal mode compare-many output structure."""
+
+    packs: list[str]
+    emojis: PresenceNormal
+    keywords: PresenceNormal
+
+
+class CompareManyOutputVerbose(TypedDict):
+    """Verbose mode compare-many output structure."""
+
+    packs: list[str]
+    emojis: PresenceVerbose
+    keywords: PresenceVerbose
 
 
 def _format_emoji_dict(
-    emoji_dict: dict[str, list[AlfredSnippet]],
+    emoji_dict: "dict[str, list[AlfredSnippet]]",
 ) -> list[str]:
     """Convert emoji->snippets dict to list of snippet names."""
     return [snippets[0].name for snippets in emoji_dict.values()]
 
 
 def _format_emoji_match_dict(
-    emoji_dict: dict[str, EmojiMatch],
+    emoji_dict: "dict[str, EmojiMatch]",
 ) -> list[str]:
     """Convert emoji->EmojiMatch dict to list of mine snippet names."""
     return [match.mine[0].name for match in emoji_dict.values()]
 
 
 def _format_emoji_dict_verbose(
-    emoji_dict: dict[str, list[AlfredSnippet]],
+    emoji_dict: "dict[str, list[AlfredSnippet]]",
 ) -> dict[str, list[str]]:
     """Convert emoji->snippets dict to name->keywords dict."""
     return {
@@ -126,7 +637,7 @@ def _format_emoji_dict_verbose(
 
 
 def _format_emoji_match_dict_verbose(
-    emoji_dict: dict[str, EmojiMatch],
+    emoji_dict: "dict[str, EmojiMatch]",
 ) -> dict[str, list[str]]:
     """Convert emoji->EmojiMatch dict to name->keywords dict."""
     return {
@@ -136,14 +647,14 @@ def _format_emoji_match_dict_verbose(
 
 
 def _format_keyword_dict_verbose(
-    keyword_dict: dict[str, AlfredSnippet],
+    keyword_dict: "dict[str, AlfredSnippet]",
 ) -> dict[str, str]:
     """Format keywords as keyword->snippet name."""
     return {keyword: snippet.name for keyword, snippet in keyword_dict.items()}
 
 
 def _format_keyword_modified(
-    keyword_dict: dict[str, KeywordMatch],
+    keyword_dict: "dict[str, KeywordMatch]",
 ) -> dict[str, dict[str, str]]:
     """Format modified keywords as keyword->{theirs: name, mine: name}."""
     return {
@@ -153,7 +664,7 @@ def _format_keyword_modified(
 
 
 def _format_compare_verbose(
-    result: SnippetPackComparison,
+    result: "SnippetPackComparison",
 ) -> CompareOutputVerbose:
     """Format comparison result in verbose mode."""
     emojis = EmojisVerbose(
@@ -177,7 +688,7 @@ def _format_compare_verbose(
 
 
 def _format_compare_normal(
-    result: SnippetPackComparison,
+    result: "SnippetPackComparison",
 ) -> CompareOutputNormal:
     """Format comparison result in normal mode."""
     emojis = EmojisNormal(
@@ -196,18 +707,281 @@ def _format_compare_normal(
     return CompareOutputNormal(emojis=emojis, keywords=keywords)
 
 
+def _emoji_record_data(record: "EmojiRecord") -> dict[str, object]:
+    """Convert an emoji record to a JSON Lines object."""
+    snippets = record.mine or record.theirs
+    return {
+        "type": "emoji",
+        "status": record.status,
+        "emoji": record.emoji,
+        "name": snippets[0].name,
+        "theirs": [snippet.keyword for snippet in record.theirs],
+        "mine": [snippet.keyword for snippet in record.mine],
+    }
+
+
+def _keyword_record_data(record: "KeywordRecord") -> dict[str, object]:
+    """Convert a keyword record to a JSON Lines object."""
+    return {
+        "type": "keyword",
+        "status": record.status,
+        "keyword": record.keyword,
+        "theirs": None if record.theirs is None else record.theirs.name,
+        "mine": None if record.mine is None else record.mine.name,
+    }
+
+
+def _write_records(
+    theirs: "SnippetPack", mine: "SnippetPack", *, verbose: bool
+) -> None:
+    """Write comparison records as JSON Lines, as they are produced.
+
+    Records of found emojis and matching keywords are skipped unless verbose.
+    """
+    from emojipack.comparison import (
+        iter_emoji_comparison,
+        iter_keyword_comparison,
+    )
+
+    stream = typer.get_text_stream("stdout")
+    # One encoder for all records, json.dumps makes one per call
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    skipped = set() if verbose else UNCHANGED_STATUSES
+    emoji_records = iter_emoji_comparison(theirs, mine)
+    for emoji_record in timed("compare_emojis", emoji_records):
+        if emoji_record.status not in skipped:
+            data = _emoji_record_data(emoji_record)
+            stream.write(encode(data) + "\n")
+    keyword_records = iter_keyword_comparison(theirs, mine)
+    for keyword_record in timed("compare_keywords", keyword_records):
+        if keyword_record.status not in skipped:
+            data = _keyword_record_data(keyword_record)
+            stream.write(encode(data) + "\n")
+    stream.flush()
+
+
+def _candidate_paths(theirs: Path) -> "list[Path] | None":
+    """List the packs of a directory or glob pattern, None for a single pack.
+
+    An existing file is a single pack, even if its name has glob characters,
+    like "Emoji Pack [v1].alfredsnippets". Raise BadParameter if no pack
+    matches.
+    """
+    if theirs.is_dir():
+        paths = sorted(theirs.glob("*.alfredsnippets"))
+    elif not theirs.exists() and any(char in str(theirs) for char in "*?["):
+        root = Path(theirs.anchor)  # Path.glob only takes relative patterns
+        paths = sorted(root.glob(str(theirs.relative_to(root))))
+    else:
+        return None
+    if not paths:
+        msg = f"No packs match: {theirs}"
+        raise typer.BadParameter(msg, param_hint="THEIRS")
+    return paths
+
+
+def _dump(
+    output: object,
+    format: str,  # noqa: A002
+) -> str:
+    """Format compare output as YAML or JSON text."""
+    if format == "json":
+        with stage("json dump"):
+            return json.dumps(output, ensure_ascii=False, indent=2) + "\n"
+    import yaml
+
+    with stage("yaml dump"):
+        return yaml.dump(output, allow_unicode=True, sort_keys=False)
+
+
+def _compare_batch(
+    paths: list[Path],
+    mine_pack: "SnippetPack",
+    *,
+    verbose: bool,
+    format: str,  # noqa: A002
+    workers: int,
+) -> None:
+    """Compare packs at paths with mine, writing one aggregated report."""
+    from emojipack.comparison import ReferenceIndex, compare_files
+
+    with stage("index mine"):
+        reference = ReferenceIndex.from_pack(mine_pack)
+    summarize = _format_compare_verbose if verbose else _format_compare_normal
+    names = _pack_names(paths)
+    outputs = compare_files(paths, reference, summarize, workers)
+    if format == "jsonl":
+        stream = typer.get_text_stream("stdout")
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        for name, output in zip(names, timed("compare", outputs), strict=True):
+            stream.write(encode({"pack": name, **output}) + "\n")
+            stream.flush()
+        return
+    with stage("compare"):
+        report = dict(zip(names, outputs, strict=True))
+    typer.echo(_dump(report, format), nl=False)
+
+
 @app.command()
-def compare(theirs: Path, mine: Path, verbose: bool = False) -> None:
-    """Compare two emoji snippet packs."""
-    theirs_pack = SnippetPack.read(theirs)
-    mine_pack = SnippetPack.read(mine)
-    result = compare_packs(theirs_pack, mine_pack)
+def compare(
+    theirs: Path,
+    mine: Path,
+    verbose: bool = False,
+    format: str = "yaml",  # noqa: A002
+    workers: int | None = None,
+    cache: bool = True,
+) -> None:
+    """Compare two emoji snippet packs.
+
+    The output is YAML by default, or JSON with --format json. With --format
+    jsonl, each emoji and keyword is written on its own line as soon as it is
+    compared, with its status, like removed or modified, and its keywords or
+    names in each pack. Found emojis and matching keywords are only written
+    with --verbose.
+
+    YAML and JSON results are cached by the content of both packs, so that
+    comparing unchanged packs again only loads the result. Use --no-cache to
+    compare them anyway.
+
+    THEIRS can also be a directory of .alfredsnippets packs, or a quoted glob
+    pattern, to compare each of them with MINE, indexed once. Packs are read
+    and compared by --workers processes, one per CPU by default, and the output
+    maps pack names to their comparison. With --format jsonl, each pack
+    comparison is written on its own line, with the pack name.
+    """
+    if format not in COMPARE_FORMATS:
+        msg = f"Unknown format: {format}"
+        raise typer.BadParameter(msg, param_hint="--format")
+    from emojipack.comparison import compare_pack_files
+    from emojipack.pack import SnippetPack
+
+    paths = _candidate_paths(theirs)
+    if paths is not None:
+        import os
+
+        with stage("read mine"):
+            mine_pack = SnippetPack.read(mine)
+        _compare_batch(
+            paths,
+            mine_pack,
+            verbose=verbose,
+            format=format,
+            workers=workers or os.cpu_count() or 1,
+        )
+        return
+    if format == "jsonl":
+        with stage("read theirs"):
+            theirs_pack = SnippetPack.read(theirs)
+        with stage("read mine"):
+            mine_pack = SnippetPack.read(mine)
+        _write_records(theirs_pack, mine_pack, verbose=verbose)
+        return
+    result = compare_pack_files(theirs, mine, cache=cache)
 
     output: CompareOutputNormal | CompareOutputVerbose
     if verbose:
         output = _format_compare_verbose(result)
     else:
         output = _format_compare_normal(result)
-    typer.echo(
-        yaml.dump(output, allow_unicode=True, sort_keys=False), nl=False
+    typer.echo(_dump(output, format), nl=False)
+
+
+def _pack_names(paths: list[Path]) -> list[str]:
+    """Name packs by file stem, or by path if stems are not unique."""
+    stems = [path.stem for path in paths]
+    if len(set(stems)) == len(stems):
+        return stems
+    return [str(path) for path in paths]
+
+
+def _format_shared(
+    names: list[str], matrix: list[list[int]]
+) -> dict[str, dict[str, int]]:
+    """Convert presence matrix to name->name->count dict."""
+    return {
+        name: dict(zip(names, row, strict=True))
+        for name, row in zip(names, matrix, strict=True)
+    }
+
+
+def _format_presence_normal(
+    names: list[str], index: "PresenceIndex"
+) -> PresenceNormal:
+    """Count shared items and items missing from each pack."""
+    matrix = index.shared()
+    missing = {
+        absent_name: {
+            name: matrix[i][i] - matrix[i][absent]
+            for i, name in enumerate(names)
+            if i != absent
+        }
+        for absent, absent_name in enumerate(names)
+    }
+    return PresenceNormal(
+        shared=_format_shared(names, matrix), missing=missing
+    )
+
+
+def _format_presence_verbose(
+    names: list[str], index: "PresenceIndex"
+) -> PresenceVerbose:
+    """List items missing from each pack and items absent from some."""
+    missing = {
+        absent_name: {
+            name: index.missing(i, absent)
+            for i, name in enumerate(names)
+            if i != absent
+        }
+        for absent, absent_name in enumerate(names)
+    }
+    partial = {
+        item: [names[i] for i in positions]
+        for item, positions in index.partial().items()
+    }
+    return PresenceVerbose(
+        shared=_format_shared(names, index.shared()),
+        missing=missing,
+        partial=partial,
     )
+
+
+@app.command("compare-many")
+def compare_many(packs: list[Path], verbose: bool = False) -> None:
+    """Compare any number of emoji snippet packs at once.
+
+    Each pack is read once, and its emojis and keywords are added to an index
+    of the packs containing them. For emojis and keywords, the output has the
+    number of items shared by each pair of packs, and under missing, for each
+    pack, the items of the other packs that it lacks. With --verbose, items are
+    listed, and items absent from some packs are listed with the packs that
+    have them.
+    """
+    import yaml
+
+    from emojipack.comparison import index_packs
+    from emojipack.pack import SnippetPack
+
+    named_packs = {}
+    for name, path in zip(_pack_names(packs), packs, strict=True):
+        with stage("read"):
+            named_packs[name] = SnippetPack.read(path)
+    with stage("index"):
+        index = index_packs(named_packs)
+    names = index.names
+
+    output: CompareManyOutputNormal | CompareManyOutputVerbose
+    if verbose:
+        output = CompareManyOutputVerbose(
+            packs=names,
+            emojis=_format_presence_verbose(names, index.emojis),
+            keywords=_format_presence_verbose(names, index.keywords),
+        )
+    else:
+        output = CompareManyOutputNormal(
+            packs=names,
+            emojis=_format_presence_normal(names, index.emojis),
+            keywords=_format_presence_normal(names, index.keywords),
+        )
+    with stage("yaml dump"):
+        text = yaml.dump(output, allow_unicode=True, sort_keys=False)
+    typer.echo(text, nl=False)
@@ -1,23 +1,47 @@
 """Emoji snippet pack comparison."""
 
-from dataclasses import dataclass
-
-from emojipack.pack import SnippetPack
+import contextlib
+import functools
+import hashlib
+import itertools
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self, cast
+
+from emojipack.profiling import annotate, stage
 from emojipack.snippets import AlfredSnippet
+from emojipack.store import evict_snapshots, load_snapshot, save_snapshot
+
+if TYPE_CHECKING:
+    from emojipack.pack import SnippetPack
 
 EMOJI_VS = "\ufe0f"  # Emoji variation selector
 KEYCAP = "\u20e3"  # Combining enclosing keycap
+NORMALIZE_CACHE_SIZE = 1 << 16  # Distinct emojis kept by normalization caches
+COMPARISON_KEY = "comparison-1"  # Cache key prefix, changed with the results
+COMPARISON_CACHE_SIZE = 1 << 28  # Bytes of cached comparison results
+# Fields of EmojiComparison holding EmojiMatch values
+EMOJI_MATCH_STATUSES = ("found", "added_emoji_presentation", "removed_space")
+
+# Pack, or its snippets read once, like from SnippetPack.iter_snippets
+type SnippetSource = SnippetPack | Iterable[AlfredSnippet]
 
 
 class DuplicateKeywordError(ValueError):
     """Raised when a keyword appears multiple times in a snippet pack."""
 
-    def __init__(self, keyword: str, pack: SnippetPack) -> None:
+    def __init__(self, keyword: str, pack: SnippetSource) -> None:
         """Initialize with keyword and pack."""
         super().__init__(f"Duplicate keyword: {keyword}")
         self.keyword = keyword
         self.pack = pack
 
+    def __reduce__(self) -> tuple[type[Self], tuple[str, SnippetSource]]:
+        """Pickle with keyword and pack, to be raised from workers."""
+        return type(self), (self.keyword, self.pack)
+
 
 @dataclass
 class EmojiMatch:
@@ -64,13 +88,18 @@ class SnippetPackComparison:
     keywords: KeywordComparison
 
 
-def _non_comment_snippets(pack: SnippetPack) -> list[AlfredSnippet]:
+def _non_comment_snippets(pack: SnippetSource) -> Iterator[AlfredSnippet]:
     """Filter out snippets with names starting with '#'."""
-    return [s for s in pack.snippets if not s.name.startswith("#")]
+    snippets = pack if isinstance(pack, Iterable) else pack.snippets
+    return (s for s in snippets if not s.name.startswith("#"))
 
 
+@functools.lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_emoji(emoji: str) -> str:
-    """Normalize emoji by removing spaces and adding variation selector."""
+    """Normalize emoji by removing spaces and adding variation selector.
+
+    Results are cached, since packs repeat emojis for each of their keywords.
+    """
     emoji = emoji.replace(" ", "")
     if emoji.endswith(KEYCAP) and not emoji.endswith(EMOJI_VS + KEYCAP):
         emoji = emoji[: -len(KEYCAP)] + EMOJI_VS + KEYCAP
@@ -79,124 +108,582 @@ def normalize_emoji(emoji: str) -> str:
     return emoji
 
 
-def compare_emojis(theirs: SnippetPack, mine: SnippetPack) -> EmojiComparison:
-    """Compare two snippet packs, grouping snippets by emoji content."""
-    theirs_by_emoji: dict[str, list[AlfredSnippet]] = {}
-    for snippet in _non_comment_snippets(theirs):
-        theirs_by_emoji.setdefault(snippet.snippet, []).append(snippet)
-    mine_by_emoji: dict[str, list[AlfredSnippet]] = {}
-    for snippet in _non_comment_snippets(mine):
-        mine_by_emoji.setdefault(snippet.snippet, []).append(snippet)
+def _group_by_emoji(pack: SnippetSource) -> dict[str, list[AlfredSnippet]]:
+    """Group snippets of pack by emoji, ignoring comments."""
+    by_emoji: dict[str, list[AlfredSnippet]] = {}
+    for snippet in _non_comment_snippets(pack):
+        by_emoji.setdefault(snippet.snippet, []).append(snippet)
+    return by_emoji
 
-    found: dict[str, EmojiMatch] = {}
-    added_emoji_presentation: dict[str, EmojiMatch] = {}
-    removed_space: dict[str, EmojiMatch] = {}
-    removed: dict[str, list[AlfredSnippet]] = {}
-    mine_categorized: set[str] = set()
 
-    for theirs_emoji, theirs_snippets in theirs_by_emoji.items():
-        if theirs_emoji in mine_by_emoji:
-            found[theirs_emoji] = EmojiMatch(
-                theirs=theirs_snippets, mine=mine_by_emoji[theirs_emoji]
-            )
-            mine_categorized.add(theirs_emoji)
-            continue
+@dataclass(slots=True)
+class EmojiRecord:
+    """Emoji compared across packs, with its snippets in each."""
 
-        if theirs_emoji.endswith(KEYCAP):
-            base = theirs_emoji[: -len(KEYCAP)]
-            theirs_with_presentation = base + EMOJI_VS + KEYCAP
-        else:
-            theirs_with_presentation = theirs_emoji + EMOJI_VS
+    status: str  # Field of EmojiComparison holding the emoji
+    emoji: str  # Key of the emoji in that field
+    theirs: list[AlfredSnippet]  # Empty if added
+    mine: list[AlfredSnippet]  # Empty if removed
 
-        if theirs_with_presentation in mine_by_emoji:
-            added_emoji_presentation[theirs_with_presentation] = EmojiMatch(
-                theirs=theirs_snippets,
-                mine=mine_by_emoji[theirs_with_presentation],
-            )
-            mine_categorized.add(theirs_with_presentation)
-            continue
 
-        theirs_no_space = theirs_emoji.replace(" ", "")
-        if (
-            theirs_no_space != theirs_emoji
-            and theirs_no_space in mine_by_emoji
-        ):
-            removed_space[theirs_emoji] = EmojiMatch(
-                theirs=theirs_snippets,
-                mine=mine_by_emoji[theirs_no_space],
-            )
-            mine_categorized.add(theirs_no_space)
-            continue
+@dataclass(slots=True)
+class KeywordRecord:
+    """Keyword compared across packs, with its snippet in each."""
 
-        removed[theirs_emoji] = theirs_snippets
+    status: str  # Field of KeywordComparison holding the keyword
+    keyword: str
+    theirs: AlfredSnippet | None  # None if added
+    mine: AlfredSnippet | None  # None if removed
 
-    added = {
-        emoji: snippets
-        for emoji, snippets in mine_by_emoji.items()
-        if emoji not in mine_categorized
-    }
 
-    return EmojiComparison(
-        found=found,
-        added_emoji_presentation=added_emoji_presentation,
-        removed_space=removed_space,
-        added=added,
-        removed=removed,
+def _with_presentation(emoji: str) -> str:
+    """Add the emoji presentation selector, before a keycap if any."""
+    if emoji.endswith(KEYCAP):
+        return emoji[: -len(KEYCAP)] + EMOJI_VS + KEYCAP
+    return emoji + EMOJI_VS
+
+
+def _match_emoji(
+    emoji: str, mine_by_emoji: Mapping[str, list[AlfredSnippet]]
+) -> tuple[str, str, str] | None:
+    """Find an emoji of theirs in mine, with or without its differences.
+
+    Return the EmojiComparison field of the match, its key, and the emoji in
+    mine, or None if the emoji was removed.
+    """
+    if emoji in mine_by_emoji:
+        return "found", emoji, emoji
+    with_presentation = _with_presentation(emoji)
+    if with_presentation in mine_by_emoji:
+        return "added_emoji_presentation", with_presentation, with_presentation
+    no_space = emoji.replace(" ", "")
+    if no_space != emoji and no_space in mine_by_emoji:
+        return "removed_space", emoji, no_space
+    return None
+
+
+def iter_emoji_comparison(
+    theirs: SnippetSource, mine: SnippetSource
+) -> Iterator[EmojiRecord]:
+    """Compare snippets grouped by emoji, yielding each emoji as categorized.
+
+    Emojis of theirs come first, in pack order, then the emojis added in mine.
+    Records are the items of compare_emojis, produced one at a time.
+    """
+    theirs_by_emoji = _group_by_emoji(theirs)
+    yield from _emoji_records(theirs_by_emoji, _group_by_emoji(mine))
+
+
+def _emoji_records(
+    theirs_by_emoji: Mapping[str, list[AlfredSnippet]],
+    mine_by_emoji: Mapping[str, list[AlfredSnippet]],
+) -> Iterator[EmojiRecord]:
+    """Categorize snippets grouped by emoji, see iter_emoji_comparison."""
+    mine_categorized: set[str] = set()
+    for emoji, snippets in theirs_by_emoji.items():
+        match = _match_emoji(emoji, mine_by_emoji)
+        if match is None:
+            yield EmojiRecord("removed", emoji, snippets, [])
+            continue
+        status, key, mine_emoji = match
+        mine_categorized.add(mine_emoji)
+        yield EmojiRecord(status, key, snippets, mine_by_emoji[mine_emoji])
+    for emoji, snippets in mine_by_emoji.items():
+        if emoji not in mine_categorized:
+            yield EmojiRecord("added", emoji, [], snippets)
+
+
+def compare_emojis(
+    theirs: SnippetSource, mine: SnippetSource
+) -> EmojiComparison:
+    """Compare two snippet packs, grouping snippets by emoji content.
+
+    Packs can also be given as snippets, like from SnippetPack.iter_snippets,
+    each iterated once.
+    """
+    return _compare_emojis(_group_by_emoji(theirs), _group_by_emoji(mine))
+
+
+def _compare_emojis(
+    theirs_by_emoji: Mapping[str, list[AlfredSnippet]],
+    mine_by_emoji: Mapping[str, list[AlfredSnippet]],
+) -> EmojiComparison:
+    """Collect emoji records by status, see compare_emojis."""
+    comparison = EmojiComparison({}, {}, {}, {}, {})
+    for record in _emoji_records(theirs_by_emoji, mine_by_emoji):
+        emojis = getattr(comparison, record.status)
+        if record.status == "removed":
+            emojis[record.emoji] = record.theirs
+        elif record.status == "added":
+            emojis[record.emoji] = record.mine
+        else:
+            emojis[record.emoji] = EmojiMatch(record.theirs, record.mine)
+    return comparison
+
+
+def _by_keyword(
+    pack: SnippetSource, *, strip: bool = False
+) -> dict[str, AlfredSnippet]:
+    """Map keywords of pack to their snippet, ignoring comments.
+
+    Colons around keywords are stripped if strip is set. Raise
+    DuplicateKeywordError if a keyword is repeated.
+    """
+    by_keyword: dict[str, AlfredSnippet] = {}
+    for snippet in _non_comment_snippets(pack):
+        keyword = snippet.keyword.strip(":") if strip else snippet.keyword
+        if keyword in by_keyword:
+            raise DuplicateKeywordError(keyword, pack)
+        by_keyword[keyword] = snippet
+    return by_keyword
+
+
+def _same_emoji(theirs: AlfredSnippet, mine: AlfredSnippet) -> bool:
+    """Tell if snippets have the same emoji, once normalized."""
+    theirs_emoji = theirs.snippet
+    mine_emoji = mine.snippet
+    return theirs_emoji == mine_emoji or (
+        normalize_emoji(theirs_emoji) == normalize_emoji(mine_emoji)
     )
 
 
-def compare_keywords(
-    theirs: SnippetPack, mine: SnippetPack
-) -> KeywordComparison:
-    """Compare keywords between two snippet packs."""
-    theirs_by_keyword: dict[str, AlfredSnippet] = {}
-    for snippet in _non_comment_snippets(theirs):
-        keyword = snippet.keyword.strip(":")
-        if keyword in theirs_by_keyword:
-            raise DuplicateKeywordError(keyword, theirs)
-        theirs_by_keyword[keyword] = snippet
-
-    mine_by_keyword: dict[str, AlfredSnippet] = {}
-    for snippet in _non_comment_snippets(mine):
-        keyword = snippet.keyword
-        if keyword in mine_by_keyword:
-            raise DuplicateKeywordError(keyword, mine)
-        mine_by_keyword[keyword] = snippet
-
-    matching: dict[str, AlfredSnippet] = {}
-    removed: dict[str, AlfredSnippet] = {}
-    modified: dict[str, KeywordMatch] = {}
+def iter_keyword_comparison(
+    theirs: SnippetSource, mine: SnippetSource
+) -> Iterator[KeywordRecord]:
+    """Compare snippets by keyword, yielding each keyword as categorized.
 
+    Keywords of theirs come first, in pack order, then the keywords added in
+    mine. Records are the items of compare_keywords, produced one at a time.
+    Both packs are indexed first, so DuplicateKeywordError comes before any
+    record.
+    """
+    theirs_by_keyword = _by_keyword(theirs, strip=True)
+    yield from _keyword_records(theirs_by_keyword, _by_keyword(mine))
+
+
+def _keyword_records(
+    theirs_by_keyword: Mapping[str, AlfredSnippet],
+    mine_by_keyword: Mapping[str, AlfredSnippet],
+) -> Iterator[KeywordRecord]:
+    """Categorize snippets by keyword, see iter_keyword_comparison."""
     for keyword, theirs_snippet in theirs_by_keyword.items():
-        if keyword not in mine_by_keyword:
-            removed[keyword] = theirs_snippet
-            continue
-        mine_snippet = mine_by_keyword[keyword]
-        theirs_normalized = normalize_emoji(theirs_snippet.snippet)
-        mine_normalized = normalize_emoji(mine_snippet.snippet)
-        if theirs_normalized == mine_normalized:
-            matching[keyword] = mine_snippet
+        mine_snippet = mine_by_keyword.get(keyword)
+        if mine_snippet is None:
+            status = "removed"
+        elif _same_emoji(theirs_snippet, mine_snippet):
+            status = "matching"
         else:
-            modified[keyword] = KeywordMatch(theirs_snippet, mine_snippet)
+            status = "modified"
+        yield KeywordRecord(status, keyword, theirs_snippet, mine_snippet)
+    for keyword, snippet in mine_by_keyword.items():
+        if keyword not in theirs_by_keyword:
+            yield KeywordRecord("added", keyword, None, snippet)
 
-    added = {
-        keyword: snippet
-        for keyword, snippet in mine_by_keyword.items()
-        if keyword not in theirs_by_keyword
-    }
 
-    return KeywordComparison(
-        matching=matching,
-        removed=removed,
-        added=added,
-        modified=modified,
-    )
+def compare_keywords(
+    theirs: SnippetSource, mine: SnippetSource
+) -> KeywordComparison:
+    """Compare keywords between two snippet packs.
+
+    Packs can also be given as snippets, iterated once, see compare_emojis.
+    """
+    theirs_by_keyword = _by_keyword(theirs, strip=True)
+    return _compare_keywords(theirs_by_keyword, _by_keyword(mine))
+
+
+def _compare_keywords(
+    theirs_by_keyword: Mapping[str, AlfredSnippet],
+    mine_by_keyword: Mapping[str, AlfredSnippet],
+) -> KeywordComparison:
+    """Collect keyword records by status, see compare_keywords."""
+    comparison = KeywordComparison({}, {}, {}, {})
+    for record in _keyword_records(theirs_by_keyword, mine_by_keyword):
+        keywords = getattr(comparison, record.status)
+        if record.status == "removed":
+            keywords[record.keyword] = record.theirs
+        elif record.status == "modified":
+            keywords[record.keyword] = KeywordMatch(
+                cast("AlfredSnippet", record.theirs),
+                cast("AlfredSnippet", record.mine),
+            )
+        else:
+            keywords[record.keyword] = record.mine
+    return comparison
 
 
 def compare_packs(
-    theirs: SnippetPack, mine: SnippetPack
+    theirs: "SnippetPack", mine: "SnippetPack"
 ) -> SnippetPackComparison:
     """Compare two snippet packs by emojis and keywords."""
-    emojis = compare_emojis(theirs, mine)
-    keywords = compare_keywords(theirs, mine)
+    with stage("compare_emojis"):
+        emojis = compare_emojis(theirs, mine)
+    with stage("compare_keywords"):
+        keywords = compare_keywords(theirs, mine)
     return SnippetPackComparison(emojis, keywords)
+
+
+type SnippetData = tuple[str, str, str, str]
+
+
+def _snippet_data(snippet: AlfredSnippet) -> SnippetData:
+    return snippet.keyword, snippet.name, snippet.snippet, snippet.uid
+
+
+def _snippets_data(snippets: list[AlfredSnippet]) -> list[SnippetData]:
+    return [_snippet_data(snippet) for snippet in snippets]
+
+
+def _snippets(data: list[SnippetData]) -> list[AlfredSnippet]:
+    return [AlfredSnippet(*fields) for fields in data]
+
+
+def _comparison_data(comparison: SnippetPackComparison) -> dict[str, Any]:
+    """Convert a comparison to data for a snapshot."""
+    emojis = comparison.emojis
+    keywords = comparison.keywords
+    return {
+        "emoji_matches": {
+            status: {
+                emoji: (
+                    _snippets_data(match.theirs),
+                    _snippets_data(match.mine),
+                )
+                for emoji, match in getattr(emojis, status).items()
+            }
+            for status in EMOJI_MATCH_STATUSES
+        },
+        "emoji_added": {
+            emoji: _snippets_data(snippets)
+            for emoji, snippets in emojis.added.items()
+        },
+        "emoji_removed": {
+            emoji: _snippets_data(snippets)
+            for emoji, snippets in emojis.removed.items()
+        },
+        "keywords": {
+            status: {
+                keyword: _snippet_data(snippet)
+                for keyword, snippet in getattr(keywords, status).items()
+            }
+            for status in ("removed", "added", "matching")
+        },
+        "keyword_modified": {
+            keyword: (_snippet_data(match.theirs), _snippet_data(match.mine))
+            for keyword, match in keywords.modified.items()
+        },
+    }
+
+
+def _comparison_from_data(data: dict[str, Any]) -> SnippetPackComparison:
+    """Rebuild a comparison converted by _comparison_data."""
+    matches = {
+        status: {
+            emoji: EmojiMatch(_snippets(theirs), _snippets(mine))
+            for emoji, (theirs, mine) in data["emoji_matches"][status].items()
+        }
+        for status in EMOJI_MATCH_STATUSES
+    }
+    emojis = EmojiComparison(
+        **matches,
+        added={
+            emoji: _snippets(snippets)
+            for emoji, snippets in data["emoji_added"].items()
+        },
+        removed={
+            emoji: _snippets(snippets)
+            for emoji, snippets in data["emoji_removed"].items()
+        },
+    )
+    by_status = {
+        status: {
+            keyword: AlfredSnippet(*fields)
+            for keyword, fields in data["keywords"][status].items()
+        }
+        for status in ("removed", "added", "matching")
+    }
+    keywords = KeywordComparison(
+        **by_status,
+        modified={
+            keyword: KeywordMatch(AlfredSnippet(*theirs), AlfredSnippet(*mine))
+            for keyword, (theirs, mine) in data["keyword_modified"].items()
+        },
+    )
+    return SnippetPackComparison(emojis, keywords)
+
+
+def _file_digest(path: Path) -> str:
+    """Hash the content of the file at path."""
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def compare_pack_files(
+    theirs: Path, mine: Path, *, cache: bool = True
+) -> SnippetPackComparison:
+    """Read the packs at theirs and mine, and compare them as compare_packs.
+
+    Results are cached in CACHE_DIR, keyed by the content hashes of both files,
+    and loaded from there while they do not change. The least recently used
+    results are removed when the cache grows over COMPARISON_CACHE_SIZE. The
+    cache is best-effort: packs are compared uncached when it is unusable.
+    """
+    from emojipack import download  # noqa: PLC0415
+    from emojipack.pack import SnippetPack  # noqa: PLC0415
+
+    if cache:
+        with stage("hash"):
+            digests = f"{_file_digest(theirs)}:{_file_digest(mine)}"
+            key = f"{COMPARISON_KEY}:{digests}"
+            cache_dir = download.CACHE_DIR / "comparisons"
+            name = hashlib.sha256(key.encode()).hexdigest()
+            path = cache_dir / f"{name}.snapshot"
+            data: Any = None
+            try:
+                data = load_snapshot(path, key)
+            except OSError:  # Like a file in place of the cache directory
+                annotate("cache error")
+            annotate("cache hit" if isinstance(data, dict) else "cache miss")
+        if isinstance(data, dict):
+            with contextlib.suppress(OSError):
+                path.touch()  # Most recently used, kept by evict_snapshots
+            with stage("load"):
+                return _comparison_from_data(data)
+    with stage("read theirs"):
+        theirs_pack = SnippetPack.read(theirs)
+    with stage("read mine"):
+        mine_pack = SnippetPack.read(mine)
+    comparison = compare_packs(theirs_pack, mine_pack)
+    if cache:
+        with stage("save"):
+            try:
+                save_snapshot(path, key, _comparison_data(comparison))
+                evict_snapshots(cache_dir, COMPARISON_CACHE_SIZE)
+            except OSError:
+                annotate("cache error")
+    return comparison
+
+
+def _index_pack(
+    pack: SnippetSource, *, strip: bool = False
+) -> tuple[dict[str, list[AlfredSnippet]], dict[str, AlfredSnippet]]:
+    """Index pack by emoji and by keyword in a single pass.
+
+    See _group_by_emoji and _by_keyword, which build each index.
+    """
+    by_emoji: dict[str, list[AlfredSnippet]] = {}
+    by_keyword: dict[str, AlfredSnippet] = {}
+    for snippet in _non_comment_snippets(pack):
+        by_emoji.setdefault(snippet.snippet, []).append(snippet)
+        keyword = snippet.keyword.strip(":") if strip else snippet.keyword
+        if keyword in by_keyword:
+            raise DuplicateKeywordError(keyword, pack)
+        by_keyword[keyword] = snippet
+    return by_emoji, by_keyword
+
+
+@dataclass
+class ReferenceIndex:
+    """Snippets of a pack by emoji and keyword, to compare other packs with.
+
+    Indexing the reference once saves rebuilding it for each compared pack.
+    """
+
+    by_emoji: dict[str, list[AlfredSnippet]]
+    by_keyword: dict[str, AlfredSnippet]
+
+    @classmethod
+    def from_pack(cls, pack: SnippetSource) -> Self:
+        """Index pack, raise DuplicateKeywordError if a keyword repeats.
+
+        The pack can also be given as snippets, iterated once.
+        """
+        return cls(*_index_pack(pack))
+
+    def compare(self, theirs: SnippetSource) -> SnippetPackComparison:
+        """Compare theirs with the reference pack, as compare_packs would.
+
+        Theirs can also be given as snippets, iterated once.
+        """
+        theirs_by_emoji, theirs_by_keyword = _index_pack(theirs, strip=True)
+        return SnippetPackComparison(
+            _compare_emojis(theirs_by_emoji, self.by_emoji),
+            _compare_keywords(theirs_by_keyword, self.by_keyword),
+        )
+
+
+_reference: ReferenceIndex | None = None  # Set in comparison workers
+
+
+def _set_reference(reference: ReferenceIndex) -> None:
+    """Initialize a comparison worker with the reference index."""
+    global _reference  # noqa: PLW0603
+    _reference = reference
+
+
+def _compare_file[T](
+    path: Path, summarize: Callable[[SnippetPackComparison], T]
+) -> T:
+    """Read the pack at path and summarize its comparison, in a worker."""
+    from emojipack.pack import SnippetPack  # noqa: PLC0415
+
+    if _reference is None:
+        msg = "Comparison worker without a reference index"
+        raise RuntimeError(msg)
+    return summarize(_reference.compare(SnippetPack.read(path)))
+
+
+def compare_files[T](
+    paths: Sequence[Path],
+    reference: ReferenceIndex,
+    summarize: Callable[[SnippetPackComparison], T],
+    workers: int = 1,
+) -> Iterator[T]:
+    """Compare the packs at paths with a reference, in worker processes.
+
+    Each worker receives the reference index once, then reads and compares
+    packs on its own, returning only their summaries, since comparisons hold
+    every snippet of both packs. Summaries are yielded in the order of paths.
+    With a single worker, packs are compared in this process.
+    """
+    from emojipack.pack import SnippetPack  # noqa: PLC0415
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield summarize(reference.compare(SnippetPack.read(path)))
+        return
+    import multiprocessing  # noqa: PLC0415
+    from concurrent.futures import ProcessPoolExecutor  # noqa: PLC0415
+
+    # Spawned like the encoding workers, the parent may be multi-threaded.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        min(workers, len(paths)),
+        mp_context=context,
+        initializer=_set_reference,
+        initargs=(reference,),
+    ) as executor:
+        yield from executor.map(
+            _compare_file, paths, itertools.repeat(summarize)
+        )
+
+
+@dataclass
+class PackDelta:
+    """Snippets updating a previous release of a pack to the current one."""
+
+    added: list[AlfredSnippet]  # Current snippets of new keywords
+    changed: list[AlfredSnippet]  # Current snippets of changed keywords
+    removed: list[AlfredSnippet]  # Previous snippets, uids to delete
+
+    @property
+    def snippets(self) -> list[AlfredSnippet]:
+        """Return added and changed snippets, the delta pack, in uid order."""
+        return sorted(
+            self.added + self.changed, key=lambda snippet: snippet.uid
+        )
+
+
+def delta_packs(previous: "SnippetPack", current: "SnippetPack") -> PackDelta:
+    """Find the snippets to ship to update previous to current.
+
+    Snippets are matched by keyword as in compare_keywords. A matching or
+    modified keyword is changed when any field of its snippet differs. When its
+    uid differs, since its emoji did, the previous uid is also removed.
+    """
+    keywords = compare_keywords(previous, current)
+    previous_by_keyword = {
+        snippet.keyword.strip(":"): snippet
+        for snippet in _non_comment_snippets(previous)
+    }
+    pairs = [
+        (previous_by_keyword[keyword], snippet)
+        for keyword, snippet in keywords.matching.items()
+    ]
+    pairs += [
+        (match.theirs, match.mine) for match in keywords.modified.values()
+    ]
+    changed = []
+    removed = list(keywords.removed.values())
+    for theirs, mine in pairs:
+        if theirs == mine:
+            continue
+        changed.append(mine)
+        if theirs.uid != mine.uid:
+            removed.append(theirs)
+    return PackDelta(list(keywords.added.values()), changed, removed)
+
+
+@dataclass
+class PresenceIndex:
+    """Inverted index from items, emojis or keywords, to packs.
+
+    The packs containing an item are stored as a bit mask of their positions,
+    so that items shared by the same packs can be counted together.
+    """
+
+    size: int  # Number of packs
+    masks: dict[str, int] = field(default_factory=dict)
+
+    def add(self, item: str, position: int) -> None:
+        """Record that the pack at position contains item."""
+        self.masks[item] = self.masks.get(item, 0) | 1 << position
+
+    def packs_of(self, item: str) -> list[int]:
+        """Return the positions of packs containing item."""
+        mask = self.masks.get(item, 0)
+        return [i for i in range(self.size) if mask >> i & 1]
+
+    def shared(self) -> list[list[int]]:
+        """Count items shared by each pair of packs, as a presence matrix.
+
+        The diagonal holds the number of items in each pack.
+        """
+        matrix = [[0] * self.size for _ in range(self.size)]
+        for mask, count in Counter(self.masks.values()).items():
+            positions = [i for i in range(self.size) if mask >> i & 1]
+            for i in positions:
+                row = matrix[i]
+                for j in positions:
+                    row[j] += count
+        return matrix
+
+    def missing(self, present: int, absent: int) -> list[str]:
+        """List items of the pack at present missing from the one at absent."""
+        return [
+            item
+            for item, mask in self.masks.items()
+            if mask >> present & 1 and not mask >> absent & 1
+        ]
+
+    def partial(self) -> dict[str, list[int]]:
+        """Map items missing from some packs to positions of their packs."""
+        complete = (1 << self.size) - 1
+        return {
+            item: self.packs_of(item)
+            for item, mask in self.masks.items()
+            if mask != complete
+        }
+
+
+@dataclass
+class PackIndex:
+    """Emojis and keywords of several packs, indexed in a single pass."""
+
+    names: list[str]
+    emojis: PresenceIndex
+    keywords: PresenceIndex
+
+
+def index_packs(packs: Mapping[str, "SnippetPack"]) -> PackIndex:
+    """Index emojis and keywords of named packs.
+
+    Emojis are normalized and colons are stripped from keywords, so that packs
+    using different conventions can be compared. Comment snippets are ignored.
+    """
+    emojis = PresenceIndex(len(packs))
+    keywords = PresenceIndex(len(packs))
+    for position, pack in enumerate(packs.values()):
+        for snippet in _non_comment_snippets(pack):
+            emojis.add(normalize_emoji(snippet.snippet), position)
+            keywords.add(snippet.keyword.strip(":"), position)
+    return PackIndex(list(packs), emojis, keywords)
@@ -1,16 +1,34 @@
 """Download emoji data from GitHub."""
 
+import functools
+import hashlib
 import json
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TypedDict
+from typing import TYPE_CHECKING, Any, TypedDict, cast
 
 import platformdirs
-import requests_cache
+
+from emojipack.profiling import annotate, stage
+from emojipack.store import load_snapshot, save_snapshot
+
+if TYPE_CHECKING:
+    import requests
+    import requests_cache
 
 GEMOJI_JSON_URL = (
     "https://raw.githubusercontent.com/github/gemoji/master/db/emoji.json"
 )
+EMOJI_TEST_URL = "https://unicode.org/Public/emoji/latest/emoji-test.txt"
+JOEL_PACK_URL = (
+    "https://joelcalifa.com/blog/alfred-emoji-snippet-pack/"
+    "Emoji%20Pack.alfredsnippets"
+)
+READ_CHUNK_SIZE = 1 << 16  # Characters read at once from gemoji files
 CACHE_DIR = Path(platformdirs.user_cache_dir("emojipack", "ddaanet"))
+NEVER_EXPIRE = -1  # Same as requests_cache.NEVER_EXPIRE, imported on use
 
 
 class GemojiEntry(TypedDict):
@@ -22,26 +40,268 @@ class GemojiEntry(TypedDict):
     tags: list[str]  # Additional search tags
 
 
-def fetch_with_cache(url: str) -> str:
-    """Fetch URL with HTTP caching."""
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    session = requests_cache.CachedSession(str(CACHE_DIR / "http_cache"))
-    response = session.get(url, timeout=30)
+@dataclass(frozen=True)
+class SessionSettings:
+    """Connection pool, retry and cache expiry settings for HTTP requests."""
+
+    pool_size: int = 10  # Connections kept alive per host
+    retries: int = 3  # Retries on connection errors and 429 or 5xx status
+    backoff_factor: float = 0.5  # Seconds, doubled after each retry
+    expire_after: "requests_cache.ExpirationTime" = NEVER_EXPIRE
+
+
+_session_settings = SessionSettings()
+_session: "requests_cache.CachedSession | None" = None
+_session_lock = threading.Lock()
+
+
+def configure_session(settings: SessionSettings) -> None:
+    """Set settings of the shared session, replacing the current one."""
+    global _session_settings  # noqa: PLW0603
+    with _session_lock:
+        _session_settings = settings
+    close_session()
+
+
+def get_session() -> "requests_cache.CachedSession":
+    """Return the shared cached session, creating it on first use.
+
+    The HTTP libraries are imported here, so that commands not downloading
+    anything start without them.
+    """
+    global _session  # noqa: PLW0603
+    import requests_cache  # noqa: PLC0415
+    from requests.adapters import HTTPAdapter  # noqa: PLC0415
+    from urllib3.util.retry import Retry  # noqa: PLC0415
+
+    with _session_lock:
+        if _session is None:
+            settings = _session_settings
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _session = requests_cache.CachedSession(
+                str(CACHE_DIR / "http_cache"),
+                expire_after=settings.expire_after,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=settings.pool_size,
+                pool_maxsize=settings.pool_size,
+                max_retries=Retry(
+                    total=settings.retries,
+                    backoff_factor=settings.backoff_factor,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                ),
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def close_session() -> None:
+    """Close the shared session, the next request opens a new one."""
+    global _session  # noqa: PLW0603
+    with _session_lock:
+        if _session is not None:
+            # Typed as the base class: CachedSession.close is not annotated.
+            session: requests.Session = _session
+            session.close()
+            _session = None
+
+
+def fetch_with_cache(url: str, *, refresh: bool = False) -> str:
+    """Fetch URL with HTTP caching, using the shared session.
+
+    With refresh, a cached response is revalidated with a conditional request,
+    using its ETag or Last-Modified date, and only downloaded again if it was
+    modified.
+    """
+    with stage("fetch"):
+        response = get_session().get(url, timeout=30, refresh=refresh)
+        annotate("cache hit" if response.from_cache else "cache miss")
+        response.raise_for_status()
+        return response.text
+
+
+def fetch_bytes_with_cache(url: str, timeout: float = 30) -> bytes:
+    """Fetch URL content as bytes with HTTP caching."""
+    response = get_session().get(url, timeout=timeout)
     response.raise_for_status()
-    return response.text
+    return response.content
 
 
-def fetch_gemoji_data() -> list[GemojiEntry]:
-    """Fetch emoji data from github/gemoji repository."""
+@dataclass(frozen=True)
+class Source:
+    """Data source to download, and the file name to save it as."""
+
+    url: str
+    filename: str
+    timeout: float = 30  # Seconds allowed for the whole download
+
+
+SOURCES = {
+    "gemoji": Source(GEMOJI_JSON_URL, "emoji.json"),
+    "emoji-test": Source(EMOJI_TEST_URL, "emoji-test.txt"),
+    "joel": Source(JOEL_PACK_URL, "joel.alfredsnippets"),
+}
+
+
+async def fetch_sources(
+    sources: Mapping[str, Source], concurrency: int = 4
+) -> dict[str, bytes]:
+    """Download sources concurrently, return their content by name.
+
+    At most concurrency downloads run at the same time, each in a worker thread
+    using the shared cached session. TimeoutError is raised if a source takes
+    longer than its timeout.
+    """
+    # Already imported by the running event loop
+    import asyncio  # noqa: PLC0415
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(source: Source) -> bytes:
+        async with semaphore, asyncio.timeout(source.timeout):
+            return await asyncio.to_thread(
+                fetch_bytes_with_cache, source.url, source.timeout
+            )
+
+    contents = await asyncio.gather(*map(fetch, sources.values()))
+    return dict(zip(sources, contents, strict=True))
+
+
+def _gemoji_entry(entry: dict[str, Any]) -> GemojiEntry:
+    """Keep only GemojiEntry keys of a gemoji database entry."""
+    return {
+        "emoji": entry["emoji"],
+        "description": entry["description"],
+        "aliases": entry["aliases"],
+        "tags": entry["tags"],
+    }
+
+
+def _parse_gemoji(text: str) -> list[GemojiEntry]:
+    """Parse gemoji JSON text, keeping only GemojiEntry keys."""
+    return [_gemoji_entry(entry) for entry in json.loads(text)]
+
+
+# Characters that may continue a JSON number, "" is the end of the text.
+NUMBER_CONTINUATIONS = frozenset(["", *"0123456789+-.eE"])
+
+
+class _ChunkBuffer:
+    """Text buffer refilled from an iterable of chunks."""
+
+    def __init__(self, chunks: Iterable[str]) -> None:
+        self._chunks = iter(chunks)
+        self.text = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Append the next chunk, dropping consumed text; False at end."""
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self.text = self.text[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace, return the next character or "" at end."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """Parse a top-level JSON array from chunks of text, yield its items.
+
+    Only the text of the item being decoded is kept in memory, so arrays much
+    larger than memory can be processed item by item.
+    """
+    buffer = _ChunkBuffer(chunks)
+    decoder = json.JSONDecoder()
+    if buffer.peek() != "[":
+        msg = "Expected a JSON array"
+        raise ValueError(msg)
+    buffer.pos += 1
+    if buffer.peek() == "]":
+        return
+    while True:
+        buffer.peek()
+        try:
+            item, end = decoder.raw_decode(buffer.text, buffer.pos)
+        except json.JSONDecodeError:
+            if buffer.fill():
+                continue
+            raise
+        # A number at the end of the text may continue in the next chunk.
+        if (
+            isinstance(item, int | float)
+            and buffer.text[end : end + 1] in NUMBER_CONTINUATIONS
+            and buffer.fill()
+        ):
+            continue
+        buffer.pos = end
+        yield item
+        separator = buffer.peek()
+        buffer.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            msg = f"Expected ',' or ']' after array item, got {separator!r}"
+            raise ValueError(msg)
+
+
+def read_gemoji_file(path: Path) -> Iterator[GemojiEntry]:
+    """Read entries from a gemoji-format JSON file, one at a time."""
+    with path.open(encoding="utf-8") as f:
+        chunks = iter(functools.partial(f.read, READ_CHUNK_SIZE), "")
+        for entry in iter_json_array(chunks):
+            yield _gemoji_entry(entry)
+
+
+def _content_key(text: str) -> str:
+    """Hash text content, to tell when downloaded data changed."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def fetch_gemoji_key() -> str:
+    """Return the content key of the latest gemoji data.
+
+    The cached data is revalidated upstream, and only downloaded again if it
+    was modified. The key is the one of fetch_gemoji_snapshot, it changes with
+    the content, not with the ETag or modification date.
+    """
+    return _content_key(fetch_with_cache(GEMOJI_JSON_URL, refresh=True))
+
+
+def fetch_gemoji_snapshot() -> tuple[str, list[GemojiEntry]]:
+    """Fetch emoji data from github/gemoji repository, with its key.
+
+    Parsed entries are saved to a snapshot in CACHE_DIR, keyed by the content
+    hash of the JSON text, and loaded from there while it does not change. The
+    key is returned with the entries, to key data derived from them.
+    """
     text = fetch_with_cache(GEMOJI_JSON_URL)
-    raw_data = json.loads(text)
-
-    return [
-        {
-            "emoji": entry["emoji"],
-            "description": entry["description"],
-            "aliases": entry["aliases"],
-            "tags": entry["tags"],
-        }
-        for entry in raw_data
-    ]
+    with stage("parse"):
+        key = _content_key(text)
+        snapshot_path = CACHE_DIR / "gemoji.snapshot"
+        entries = load_snapshot(snapshot_path, key)
+        if entries is None:
+            annotate("snapshot miss")
+            entries = _parse_gemoji(text)
+            save_snapshot(snapshot_path, key, entries)
+        else:
+            annotate("snapshot hit")
+    return key, cast("list[GemojiEntry]", entries)
+
+
+def fetch_gemoji_data() -> list[GemojiEntry]:
+    """Fetch emoji data from github/gemoji repository.
+
+    See fetch_gemoji_snapshot, which also returns the snapshot key.
+    """
+    return fetch_gemoji_snapshot()[1]
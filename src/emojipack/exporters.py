@@ -0,0 +1,234 @@
+"""Streaming snippet exporters for text expansion tools."""
+
+import json
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+from emojipack.snippets import AlfredSnippet
+
+PLIST_HEADER = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    b'<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" '
+    b'"http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n'
+    b'<plist version="1.0">\n'
+)
+# Characters plistlib refuses in XML strings
+PLIST_CONTROL_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+CSV_SPECIAL_CHARS = re.compile('[",\r\n]')  # Fields quoted when they have any
+
+
+def macos_keyword(keyword: str) -> str:
+    """Return keyword as used in macOS shortcuts, with dashes for spaces."""
+    return keyword.replace(" ", "-")
+
+
+class StreamingExporter(ABC):
+    """Write snippets to a file as they are added, for a text expansion tool.
+
+    Subclasses must format each snippet, and can format a header and a footer,
+    empty by default. Shortcuts are keywords with dashes for spaces, between
+    prefix and suffix, since most tools expand as soon as the shortcut is
+    typed. The file is written to a temporary name and renamed on close.
+    """
+
+    def __init__(
+        self, path: Path, prefix: str = ":", suffix: str = ":"
+    ) -> None:
+        """Start writing the file at path, with keyword prefix and suffix."""
+        self.count = 0  # Snippets added
+        self.prefix = prefix
+        self.suffix = suffix
+        self._path = path
+        self._temp_path = path.with_name(f".{path.name}.tmp")
+        self._file = self._temp_path.open("wb")
+        self._file.write(self.header())
+
+    def __enter__(self) -> Self:
+        """Return self, the file is completed on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Complete the file, or discard it if an exception occurred."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def shortcut(self, snippet: AlfredSnippet) -> str:
+        """Return the text typed to expand snippet."""
+        return f"{self.prefix}{macos_keyword(snippet.keyword)}{self.suffix}"
+
+    def header(self) -> bytes:
+        """Return the start of the file."""
+        return b""
+
+    @abstractmethod
+    def entry(self, snippet: AlfredSnippet) -> bytes:
+        """Return snippet formatted for the file, after count others."""
+
+    def footer(self) -> bytes:
+        """Return the end of the file, after count snippets."""
+        return b""
+
+    def add(self, snippet: AlfredSnippet) -> None:
+        """Add a snippet to the file."""
+        self._file.write(self.entry(snippet))
+        self.count += 1
+
+    def extend(self, snippets: Iterable[AlfredSnippet]) -> None:
+        """Add snippets to the file, consuming them lazily."""
+        for snippet in snippets:
+            self.add(snippet)
+
+    def close(self) -> None:
+        """Write the end of the file and rename it."""
+        self._file.write(self.footer())
+        self._file.close()
+        self._temp_path.replace(self._path)
+
+    def abort(self) -> None:
+        """Remove the temporary file."""
+        self._file.close()
+        self._temp_path.unlink(missing_ok=True)
+
+
+def _escape_plist(text: str) -> str:
+    """Escape text for an XML plist string, as plistlib does."""
+    if PLIST_CONTROL_CHARS.search(text):
+        msg = "strings can't contain control characters; use bytes instead"
+        raise ValueError(msg)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class MacosPlistWriter(StreamingExporter):
+    """Write a macOS text expansions XML plist.
+
+    The bytes are the same as plistlib.dump of the list of expansions.
+    """
+
+    def header(self) -> bytes:
+        """Return the XML declaration and the plist start."""
+        return PLIST_HEADER
+
+    def entry(self, snippet: AlfredSnippet) -> bytes:
+        """Return the expansion dict of snippet, opening the array first."""
+        phrase = _escape_plist(snippet.snippet)
+        shortcut = _escape_plist(self.shortcut(snippet))
+        start = "" if self.count else "<array>\n"
+        return (
+            f"{start}"
+            "\t<dict>\n"
+            "\t\t<key>phrase</key>\n"
+            f"\t\t<string>{phrase}</string>\n"
+            "\t\t<key>shortcut</key>\n"
+            f"\t\t<string>{shortcut}</string>\n"
+            "\t</dict>\n"
+        ).encode()
+
+    def footer(self) -> bytes:
+        """Close the array, written as empty if there was no snippet."""
+        array_end = b"</array>\n" if self.count else b"<array/>\n"
+        return array_end + b"</plist>\n"
+
+
+class EspansoWriter(StreamingExporter):
+    """Write an espanso match file, in YAML.
+
+    Strings are double-quoted JSON strings, which YAML reads as is.
+    """
+
+    def entry(self, snippet: AlfredSnippet) -> bytes:
+        """Return the match of snippet, labeled with its name."""
+        start = "" if self.count else "matches:\n"
+        trigger = json.dumps(self.shortcut(snippet), ensure_ascii=False)
+        replace = json.dumps(snippet.snippet, ensure_ascii=False)
+        label = json.dumps(snippet.name, ensure_ascii=False)
+        return (
+            f"{start}"
+            f"  - trigger: {trigger}\n"
+            f"    replace: {replace}\n"
+            f"    label: {label}\n"
+        ).encode()
+
+    def footer(self) -> bytes:
+        """Write an empty match list if there was no snippet."""
+        return b"" if self.count else b"matches: []\n"
+
+
+class RaycastWriter(StreamingExporter):
+    """Write Raycast snippets to import, as a JSON array, one per line."""
+
+    def header(self) -> bytes:
+        """Open the array."""
+        return b"["
+
+    def entry(self, snippet: AlfredSnippet) -> bytes:
+        """Return the snippet object, after a separator unless first."""
+        data = {
+            "name": snippet.name,
+            "text": snippet.snippet,
+            "keyword": self.shortcut(snippet),
+        }
+        separator = ",\n" if self.count else "\n"
+        return f"{separator}{json.dumps(data, ensure_ascii=False)}".encode()
+
+    def footer(self) -> bytes:
+        """Close the array."""
+        return b"\n]\n" if self.count else b"]\n"
+
+
+def _csv_field(value: str) -> str:
+    """Quote a CSV field if needed, doubling its quotes."""
+    if CSV_SPECIAL_CHARS.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+class TextExpanderWriter(StreamingExporter):
+    """Write TextExpander snippets to import, as CSV without a header.
+
+    Rows are abbreviation, content and label, as in TextExpander exports.
+    """
+
+    def entry(self, snippet: AlfredSnippet) -> bytes:
+        """Return the CSV row of snippet."""
+        fields = (self.shortcut(snippet), snippet.snippet, snippet.name)
+        return (",".join(map(_csv_field, fields)) + "\r\n").encode()
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """Output format written by a streaming exporter."""
+
+    extension: str  # Default file extension, with the dot
+    exporter: type[StreamingExporter]
+
+
+EXPORT_FORMATS: dict[str, ExportFormat] = {}
+
+
+def register_format(
+    kind: str, extension: str, exporter: type[StreamingExporter]
+) -> None:
+    """Register an exporter for generate --output KIND."""
+    if kind in EXPORT_FORMATS:
+        msg = f"Export format already registered: {kind}"
+        raise ValueError(msg)
+    EXPORT_FORMATS[kind] = ExportFormat(extension, exporter)
+
+
+register_format("macos", ".plist", MacosPlistWriter)
+register_format("espanso", ".yml", EspansoWriter)
+register_format("raycast", ".json", RaycastWriter)
+register_format("textexpander", ".csv", TextExpanderWriter)
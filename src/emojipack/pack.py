@@ -1,12 +1,266 @@
 """Snippet pack generation for Alfred."""
 
+import bisect
+import itertools
 import json
+import mmap
+import os
 import plistlib
 import zipfile
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from contextlib import ExitStack
 from dataclasses import dataclass, field
 from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, BinaryIO, Self, cast, overload
 
-from emojipack.snippets import AlfredSnippet
+from emojipack.archive import (
+    ArchiveReader,
+    ArchiveWriter,
+    CompressedMember,
+    compress,
+    is_encoded,
+    iter_members,
+    read_directory,
+    read_member,
+)
+from emojipack.exporters import MacosPlistWriter, macos_keyword
+from emojipack.snippets import AlfredSnippet, generate_uid
+from emojipack.table import SnippetTable
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+METADATA_MEMBERS = ("info.plist", "icon.png")
+ENCODE_CHUNK_SIZE = 1024  # Snippets per task sent to encoding workers
+
+
+def _member_name(snippet: AlfredSnippet) -> str:
+    """Return the archive member name of a snippet."""
+    return f"{snippet.uid}.json"
+
+
+def _encode_snippet(
+    snippet: AlfredSnippet,
+    compresslevel: int | None,
+    previous: CompressedMember | None = None,
+) -> CompressedMember | None:
+    """Serialize and compress a snippet as an archive member.
+
+    Return None if the previous member already holds the same content.
+    """
+    content = json.dumps(snippet.to_json(), ensure_ascii=False).encode()
+    if previous is not None and is_encoded(previous, content, compresslevel):
+        return None
+    return compress(_member_name(snippet), content, compresslevel)
+
+
+def _encode_chunk(
+    snippets: tuple[AlfredSnippet, ...],
+    compresslevel: int | None,
+    previous: tuple[CompressedMember | None, ...],
+) -> list[CompressedMember | None]:
+    """Encode a chunk of snippets, run in worker processes."""
+    return [
+        _encode_snippet(snippet, compresslevel, member)
+        for snippet, member in zip(snippets, previous, strict=True)
+    ]
+
+
+def _process_pool(workers: int) -> "ProcessPoolExecutor":
+    """Start encoding worker processes.
+
+    Process pools are imported here, since most packs are written without.
+    """
+    import multiprocessing  # noqa: PLC0415
+    from concurrent.futures import ProcessPoolExecutor  # noqa: PLC0415
+
+    # Spawn rather than fork: the parent may be multi-threaded.
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+
+@dataclass
+class _PendingChunk:
+    """Chunk of snippets sent to encoding workers."""
+
+    future: "Future[list[CompressedMember | None]]"
+    previous: tuple[CompressedMember | None, ...]  # Members to reuse
+
+
+@dataclass
+class _OutputFile:
+    """Archive being written to a temporary file, renamed when complete."""
+
+    path: Path
+    temp_path: Path
+    file: BinaryIO
+    archive: ArchiveWriter
+
+
+class SnippetPackWriter:
+    """Write .alfredsnippets files from snippets added one at a time.
+
+    Each snippet is serialized and compressed once, and added to every output
+    file, which only differ by their metadata members. Snippets are encoded in
+    a pool of worker processes when workers is greater than one, in chunks. At
+    most two chunks per worker are in flight, so memory stays bounded whatever
+    the number of snippets. Files are written to temporary names and renamed on
+    close.
+
+    When a previous archive is given, snippets whose member in it has the same
+    name and content, compressed at the same level, are copied from it as
+    compressed, instead of being compressed again.
+    """
+
+    def __init__(
+        self,
+        outputs: Mapping[Path, Iterable[CompressedMember]],
+        compresslevel: int | None = None,
+        workers: int = 1,
+        previous: Path | None = None,
+    ) -> None:
+        """Start writing output paths, each with its metadata members."""
+        self.count = 0  # Snippets added
+        self.reused = 0  # Snippets copied from the previous archive
+        self._compresslevel = compresslevel
+        self._workers = workers
+        self._chunk: list[AlfredSnippet] = []
+        self._chunk_previous: list[CompressedMember | None] = []
+        self._pending: deque[_PendingChunk] = deque()
+        self._outputs: list[_OutputFile] = []
+        with ExitStack() as stack:
+            self._previous: ArchiveReader | None = None
+            if previous is not None:
+                self._previous = stack.enter_context(ArchiveReader(previous))
+            for output_path, members in outputs.items():
+                temp_path = output_path.with_name(f".{output_path.name}.tmp")
+                stack.callback(temp_path.unlink, missing_ok=True)
+                file = stack.enter_context(temp_path.open("wb"))
+                archive = ArchiveWriter(file)
+                for member in members:
+                    archive.add(member)
+                self._outputs.append(
+                    _OutputFile(output_path, temp_path, file, archive)
+                )
+            self._executor: ProcessPoolExecutor | None = None
+            if workers > 1:
+                self._executor = stack.enter_context(_process_pool(workers))
+            self._cleanup = stack.pop_all()
+
+    def __enter__(self) -> Self:
+        """Return self, the archives are completed on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Complete the archives, or discard them if an exception occurred."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, snippet: AlfredSnippet) -> None:
+        """Add a snippet to the archives."""
+        self.count += 1
+        previous = None
+        if self._previous is not None:
+            previous = self._previous.get(_member_name(snippet))
+        if self._executor is None:
+            member = _encode_snippet(snippet, self._compresslevel, previous)
+            self._add_member(member, previous)
+            return
+        self._chunk.append(snippet)
+        self._chunk_previous.append(previous)
+        if len(self._chunk) >= ENCODE_CHUNK_SIZE:
+            self._submit(self._executor)
+
+    def extend(self, snippets: Iterable[AlfredSnippet]) -> None:
+        """Add snippets to the archives, consuming them lazily."""
+        for snippet in snippets:
+            self.add(snippet)
+
+    def _submit(self, executor: "ProcessPoolExecutor") -> None:
+        """Send the current chunk to the workers, wait if too many pending."""
+        chunk = tuple(self._chunk)
+        previous = tuple(self._chunk_previous)
+        self._chunk.clear()
+        self._chunk_previous.clear()
+        future = executor.submit(
+            _encode_chunk, chunk, self._compresslevel, previous
+        )
+        self._pending.append(_PendingChunk(future, previous))
+        if len(self._pending) >= 2 * self._workers:
+            self._write_pending()
+
+    def _add_member(
+        self,
+        member: CompressedMember | None,
+        previous: CompressedMember | None,
+    ) -> None:
+        """Add member to all archives, or previous if member is None."""
+        if member is None:
+            if previous is None:
+                msg = "No previous member to reuse"
+                raise ValueError(msg)
+            member = previous
+            self.reused += 1
+        for output in self._outputs:
+            output.archive.add(member)
+
+    def _write_pending(self) -> None:
+        """Write the members of the oldest pending chunk."""
+        pending = self._pending.popleft()
+        members = pending.future.result()
+        for member, previous in zip(members, pending.previous, strict=True):
+            self._add_member(member, previous)
+
+    def close(self) -> None:
+        """Write remaining snippets and central directories, rename files.
+
+        The files are discarded if this fails, like when a worker could not
+        encode a snippet.
+        """
+        try:
+            if self._executor is not None and self._chunk:
+                self._submit(self._executor)
+            while self._pending:
+                self._write_pending()
+            if self._previous is not None:
+                # The previous archive may be replaced by an output.
+                self._previous.close()
+            for output in self._outputs:
+                output.archive.close()
+                output.file.close()
+                output.temp_path.replace(output.path)
+        except BaseException:
+            self.abort()
+            raise
+        self._cleanup.close()
+
+    def abort(self) -> None:
+        """Stop the workers and remove the temporary files."""
+        for pending in self._pending:
+            pending.future.cancel()
+        self._pending.clear()
+        self._cleanup.close()
+
+
+def macos_snippet(snippet: AlfredSnippet) -> AlfredSnippet:
+    """Return snippet as read back from a macOS plist.
+
+    Only the keyword, in its macOS form, and the emoji are kept. The name is
+    empty and the uid is generated from them.
+    """
+    keyword = macos_keyword(snippet.keyword)
+    uid = generate_uid(keyword, snippet.snippet)
+    return AlfredSnippet(keyword, "", snippet.snippet, uid)
 
 
 @dataclass
@@ -15,7 +269,7 @@ class SnippetPack:
 
     prefix: str = ""
     suffix: str = ""
-    snippets: list[AlfredSnippet] = field(default_factory=list)
+    snippets: Sequence[AlfredSnippet] = field(default_factory=list)
     _icon: Path | None = None
 
     def create_info_plist(self) -> str:
@@ -30,54 +284,360 @@ class SnippetPack:
         """Set the icon to include in the snippet pack."""
         self._icon = path
 
-    def write(self, output_path: Path) -> None:
-        """Write .alfredsnippets zip file with info.plist and snippets."""
-        with zipfile.ZipFile(output_path, "w") as zf:
-            zf.writestr("info.plist", self.create_info_plist())
-            if self._icon:
-                zf.write(self._icon, "icon.png")
-            for snippet in self.snippets:
-                filename = f"{snippet.uid}.json"
-                content = json.dumps(snippet.to_json(), ensure_ascii=False)
-                zf.writestr(filename, content)
-
-    def write_macos_plist(self, output_path: Path) -> None:
-        """Write macOS text expansions plist file."""
+    def metadata_members(
+        self, compresslevel: int | None = None
+    ) -> list[CompressedMember]:
+        """Compress info.plist and the icon, if any, as archive members."""
+        info = self.create_info_plist().encode()
+        members = [compress("info.plist", info, compresslevel)]
+        if self._icon:
+            icon = self._icon.read_bytes()
+            members.append(compress("icon.png", icon, compresslevel))
+        return members
+
+    def writer(
+        self,
+        output_path: Path,
+        compresslevel: int | None = None,
+        workers: int | None = 1,
+        previous: Path | None = None,
+    ) -> SnippetPackWriter:
+        """Open a writer for an .alfredsnippets file with this pack settings.
+
+        The writer has info.plist and the icon already written, snippets are
+        added to it, not taken from this pack. Members are stored uncompressed
+        unless compresslevel is given, then they are deflated at that zlib
+        level. Snippets are serialized and compressed by a pool of worker
+        processes when workers is greater than one, or None to use all CPUs.
+        Unchanged members of the previous archive, if given, are copied as is.
+        """
+        return open_writer(
+            {output_path: self}, compresslevel, workers, previous
+        )
+
+    def write(
+        self,
+        output_path: Path,
+        compresslevel: int | None = None,
+        workers: int | None = 1,
+        previous: Path | None = None,
+    ) -> None:
+        """Write .alfredsnippets zip file with info.plist and snippets.
+
+        Snippets are written in uid order, so that the same pack always gives
+        the same file. See writer for the other arguments.
+        """
+        snippets = self.snippets
+        if isinstance(snippets, SnippetTable):
+            uids = snippets.uids
+        else:
+            uids = [snippet.uid for snippet in snippets]
+        order = sorted(range(len(uids)), key=uids.__getitem__)
+        with self.writer(
+            output_path, compresslevel, workers, previous
+        ) as writer:
+            writer.extend(snippets[i] for i in order)
+
+    def write_macos_plist(
+        self, output_path: Path, *, binary: bool = False
+    ) -> None:
+        """Write macOS text expansions plist file.
+
+        XML plists are streamed snippet by snippet. Binary plists, which are
+        smaller but need all the objects at once, are written by plistlib.
+        """
+        if not binary:
+            with MacosPlistWriter(
+                output_path, self.prefix, self.suffix
+            ) as writer:
+                writer.extend(self.snippets)
+            return
         expansions = [
             {
                 "phrase": snippet.snippet,
                 "shortcut": (
-                    f"{self.prefix}{snippet.keyword.replace(' ', '-')}"
+                    f"{self.prefix}{macos_keyword(snippet.keyword)}"
                     f"{self.suffix}"
                 ),
             }
             for snippet in self.snippets
         ]
         with output_path.open("wb") as f:
-            plistlib.dump(expansions, f)
+            plistlib.dump(expansions, f, fmt=plistlib.FMT_BINARY)
+
+    @classmethod
+    def read_macos_plist(
+        cls, input_path: Path, prefix: str = ":", suffix: str = ":"
+    ) -> "SnippetPack":
+        """Read macOS text expansions plist file and return SnippetPack.
+
+        Shortcuts lose prefix and suffix, when they have them, to give the
+        keywords. The plist has neither names nor uids, so snippets are those
+        of macos_snippet.
+        """
+        with input_path.open("rb") as f:
+            expansions = plistlib.load(f)
+        snippets = SnippetTable()
+        for expansion in expansions:
+            keyword = expansion["shortcut"]
+            if prefix and keyword.startswith(prefix):
+                keyword = keyword[len(prefix) :]
+            if suffix and keyword.endswith(suffix):
+                keyword = keyword[: -len(suffix)]
+            emoji = expansion["phrase"]
+            uid = generate_uid(keyword, emoji)
+            snippets.append(AlfredSnippet(keyword, "", emoji, uid))
+        return cls(prefix=prefix, suffix=suffix, snippets=snippets)
 
     @classmethod
     def read(cls, input_path: Path) -> "SnippetPack":
         """Read .alfredsnippets zip file and return SnippetPack."""
         with zipfile.ZipFile(input_path) as zf:
-            if "info.plist" in zf.namelist():
-                plist_data = plistlib.loads(zf.read("info.plist"))
-                prefix = plist_data.get("snippetkeywordprefix", "")
-                suffix = plist_data.get("snippetkeywordsuffix", "")
-            else:
-                prefix = ""
-                suffix = ""
-            snippets = []
-            for name in zf.namelist():
-                if name in ("info.plist", "icon.png"):
-                    continue
-                snippet_data = json.loads(zf.read(name))
-                alfred_snippet = snippet_data["alfredsnippet"]
-                snippet = AlfredSnippet(
-                    keyword=alfred_snippet["keyword"],
-                    name=alfred_snippet["name"],
-                    snippet=alfred_snippet["snippet"],
-                    uid=alfred_snippet["uid"],
-                )
-                snippets.append(snippet)
+            prefix, suffix = _read_info_plist(zf)
+            snippets = SnippetTable(
+                AlfredSnippet.from_json(json.loads(zf.read(name)))
+                for name in zf.namelist()
+                if name not in METADATA_MEMBERS
+            )
         return cls(prefix=prefix, suffix=suffix, snippets=snippets)
+
+    @overload
+    @staticmethod
+    def iter_snippets(
+        input_path: Path, batch_size: None = None
+    ) -> Iterator[AlfredSnippet]: ...
+
+    @overload
+    @staticmethod
+    def iter_snippets(
+        input_path: Path, batch_size: int
+    ) -> Iterator[list[AlfredSnippet]]: ...
+
+    @staticmethod
+    def iter_snippets(
+        input_path: Path, batch_size: int | None = None
+    ) -> Iterator[AlfredSnippet] | Iterator[list[AlfredSnippet]]:
+        """Read snippets of an .alfredsnippets zip file as they are decoded.
+
+        Members are read one at a time, in archive order, from their local
+        headers, so that only the current batch is kept in memory, see
+        iter_members. With batch_size, yield lists of up to batch_size
+        snippets.
+        """
+        snippets = _iter_members(input_path)
+        if batch_size is None:
+            return snippets
+        return map(list, itertools.batched(snippets, batch_size))
+
+
+def _iter_members(input_path: Path) -> Iterator[AlfredSnippet]:
+    """Decode snippet members of a zip file, one at a time."""
+    with input_path.open("rb") as f:
+        for name, content in iter_members(f):
+            if name not in METADATA_MEMBERS:
+                yield AlfredSnippet.from_json(json.loads(content))
+
+
+def open_writer(
+    packs: Mapping[Path, SnippetPack],
+    compresslevel: int | None = None,
+    workers: int | None = 1,
+    previous: Path | None = None,
+) -> SnippetPackWriter:
+    """Open a writer for .alfredsnippets files sharing the same snippets.
+
+    Each file gets the settings and icon of its pack, the snippets of packs are
+    not used. See SnippetPack.writer for the other arguments.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    outputs = {
+        path: pack.metadata_members(compresslevel)
+        for path, pack in packs.items()
+    }
+    return SnippetPackWriter(outputs, compresslevel, workers, previous)
+
+
+def _read_info_plist(zf: zipfile.ZipFile) -> tuple[str, str]:
+    """Read prefix and suffix from info.plist, empty if missing."""
+    try:
+        return _info_plist_affixes(zf.read("info.plist"))
+    except KeyError:
+        return "", ""
+
+
+def _info_plist_affixes(data: bytes) -> tuple[str, str]:
+    """Return prefix and suffix from info.plist content."""
+    plist_data = plistlib.loads(data)
+    prefix = plist_data.get("snippetkeywordprefix", "")
+    suffix = plist_data.get("snippetkeywordsuffix", "")
+    return prefix, suffix
+
+
+class _MappedFile:
+    """Seekable read-only file interface over a memory map."""
+
+    def __init__(self, mapping: mmap.mmap) -> None:
+        """Initialize with a memory map of the whole file."""
+        self._mapping = mapping
+
+    def read(self, n: int = -1) -> bytes:
+        """Read up to n bytes, or until the end if n is negative."""
+        return self._mapping.read(n)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move to offset relative to whence and return the new position."""
+        if whence == os.SEEK_CUR:
+            offset += self._mapping.tell()
+        elif whence == os.SEEK_END:
+            offset += len(self._mapping)
+        self._mapping.seek(offset)
+        return offset
+
+    def tell(self) -> int:
+        """Return the current position."""
+        return self._mapping.tell()
+
+    def seekable(self) -> bool:
+        """Return True, memory maps support random access."""
+        return True
+
+
+class LazySnippetPack(Sequence[AlfredSnippet]):
+    """Read-only view of an .alfredsnippets file, decoding on demand.
+
+    Opening the view reads only the zip central directory, keeping the names
+    and offsets of members, and info.plist. Snippets are decoded when accessed
+    by position, uid or keyword. Keyword and uid lookups first try the members
+    named after them, as written by SnippetPack.write, then scan the remaining
+    members, remembering the keywords and uids seen so that each member is
+    scanned at most once.
+    """
+
+    def __init__(self, input_path: Path, *, use_mmap: bool = False) -> None:
+        """Open the pack, with a memory-mapped backing if use_mmap is set."""
+        with ExitStack() as stack:
+            file = stack.enter_context(input_path.open("rb"))
+            self._file: BinaryIO = file
+            if use_mmap:
+                mapping = stack.enter_context(
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+                self._file = cast("BinaryIO", _MappedFile(mapping))
+            self._described_sizes: dict[int, int] = {}  # See read_member
+            self.prefix, self.suffix = "", ""
+            self._names: list[str] = []
+            self._offsets = array("Q")  # Local header offset of each name
+            names, offsets = read_directory(self._file)
+            for name, offset in zip(names, offsets, strict=True):
+                if name == "info.plist":
+                    self.prefix, self.suffix = _info_plist_affixes(
+                        self._read(offset)
+                    )
+                elif name not in METADATA_MEMBERS:
+                    self._names.append(name)
+                    self._offsets.append(offset)
+            self._closer = stack.pop_all()
+        self._sorted_names: list[tuple[str, int]] | None = None
+        self._decoded: dict[int, AlfredSnippet] = {}
+        self._by_keyword: dict[str, int] = {}
+        self._by_uid: dict[str, int] = {}
+        self._scanned = 0
+
+    def __enter__(self) -> Self:
+        """Return self, the underlying file is closed on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the underlying file."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the memory map and underlying file."""
+        self._closer.close()
+
+    def _read(self, offset: int) -> bytes:
+        """Return the content of the member at offset."""
+        return read_member(self._file, offset, self._described_sizes)[1]
+
+    def __len__(self) -> int:
+        """Return the number of snippets, without decoding them."""
+        return len(self._names)
+
+    @overload
+    def __getitem__(self, index: int) -> AlfredSnippet: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[AlfredSnippet]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> AlfredSnippet | list[AlfredSnippet]:
+        """Return the snippet at position index, decoding it if needed."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._decode(index)
+
+    def _decode(self, index: int) -> AlfredSnippet:
+        """Return the snippet at index, decoding it once.
+
+        Decoded snippets are kept, with their keyword and uid remembered.
+        """
+        snippet = self._decoded.get(index)
+        if snippet is not None:
+            return snippet
+        data = json.loads(self._read(self._offsets[index]))
+        snippet = AlfredSnippet.from_json(data)
+        self._decoded[index] = snippet
+        self._by_keyword.setdefault(snippet.keyword, index)
+        self._by_uid.setdefault(snippet.uid, index)
+        return snippet
+
+    def _find(
+        self, index: dict[str, int], key: str, candidates: list[int]
+    ) -> AlfredSnippet | None:
+        """Look up key in index, decoding candidates then unscanned members."""
+        for position in candidates:
+            if key in index:
+                break
+            self._decode(position)
+        while key not in index and self._scanned < len(self):
+            self._decode(self._scanned)
+            self._scanned += 1
+        if key not in index:
+            return None
+        return self._decode(index[key])
+
+    def _named(self, prefix: str) -> list[int]:
+        """Return positions of members whose name starts with prefix."""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(
+                (name, i) for i, name in enumerate(self._names)
+            )
+        names = self._sorted_names
+        positions = []
+        for i in range(bisect.bisect_left(names, (prefix, -1)), len(names)):
+            name, position = names[i]
+            if not name.startswith(prefix):
+                break
+            positions.append(position)
+        return positions
+
+    def find_uid(self, uid: str) -> AlfredSnippet | None:
+        """Return the snippet with the given uid, or None if not found."""
+        candidates = self._named(f"{uid}.json")
+        return self._find(self._by_uid, uid, candidates)
+
+    def find_keyword(self, keyword: str) -> AlfredSnippet | None:
+        """Return the snippet with the given keyword, or None if not found."""
+        candidates = self._named(keyword.replace(" ", "_") + "-")
+        return self._find(self._by_keyword, keyword, candidates)
@@ -0,0 +1,189 @@
+"""Per-stage timing and peak memory reporting."""
+
+import contextlib
+import resource
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+
+@dataclass
+class StageStats:
+    """Time and memory spent in a stage, over all its runs."""
+
+    name: str
+    seconds: float = 0.0  # Wall time, excluding nested stages
+    peak_bytes: int = 0  # Peak memory while the stage was running
+    calls: int = 0
+    details: list[str] = field(default_factory=list)  # Like "cache hit"
+
+
+@dataclass
+class _Frame:
+    """Running stage, on the stack of nested stages."""
+
+    stats: StageStats
+    start: float
+    children: float = 0.0  # Wall time spent in nested stages
+    peak_bytes: int = 0  # Peak traced memory before the last nested stage
+
+
+class Profiler:
+    """Record wall time and peak memory of named stages.
+
+    Stages can be nested, or interleaved when stages pull items from each
+    other's iterators. The time of a stage excludes the time of the stages
+    nested in it, so that interleaved stages of a streaming pipeline can be
+    told apart. The peak memory of a stage includes its nested stages.
+
+    By default, the peak memory of a stage is the peak resident set size of the
+    process when the stage ends, which costs nothing to measure but never
+    decreases. With trace_memory, memory is measured with tracemalloc, started
+    by start, which gives the peak of each stage but makes Python code several
+    times slower. Stages must be entered from a single thread.
+    """
+
+    def __init__(self, *, trace_memory: bool = False) -> None:
+        """Initialize without any stage."""
+        self.trace_memory = trace_memory
+        self.stages: dict[str, StageStats] = {}
+        self._stack: list[_Frame] = []
+        self._start = 0.0
+        self.seconds = 0.0  # Total wall time between start and stop
+
+    def start(self) -> None:
+        """Start measuring time, and tracing memory allocations if asked."""
+        if self.trace_memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+
+    def stop(self) -> None:
+        """Stop measuring time and tracing memory allocations."""
+        self.seconds = time.perf_counter() - self._start
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def enter(self, name: str) -> None:
+        """Start a run of the named stage, nested in the current stage."""
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        if self.trace_memory:
+            if self._stack:
+                parent = self._stack[-1]
+                peak = tracemalloc.get_traced_memory()[1]
+                parent.peak_bytes = max(parent.peak_bytes, peak)
+            tracemalloc.reset_peak()
+        self._stack.append(_Frame(stats, time.perf_counter()))
+
+    def exit(self) -> None:
+        """End the run of the current stage."""
+        frame = self._stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+        else:
+            peak = _max_rss()
+        peak = max(frame.peak_bytes, peak)
+        stats = frame.stats
+        stats.seconds += elapsed - frame.children
+        stats.peak_bytes = max(stats.peak_bytes, peak)
+        stats.calls += 1
+        if self._stack:
+            parent = self._stack[-1]
+            parent.children += elapsed
+            parent.peak_bytes = max(parent.peak_bytes, peak)
+
+    def annotate(self, detail: str) -> None:
+        """Add a detail to the current stage, if not already there."""
+        if self._stack:
+            details = self._stack[-1].stats.details
+            if detail not in details:
+                details.append(detail)
+
+    def report(self) -> list[str]:
+        """Format a table of stages, in the order they were first entered."""
+        memory = "peak MiB" if self.trace_memory else "max RSS MiB"
+        lines = [f"{'stage':<20} {'seconds':>10} {memory:>12}"]
+        for stats in self.stages.values():
+            line = (
+                f"{stats.name:<20} {stats.seconds:10.3f} "
+                f"{stats.peak_bytes / 2**20:12.1f}"
+            )
+            if stats.details:
+                line += "  " + ", ".join(stats.details)
+            lines.append(line)
+        lines.append(f"{'total':<20} {self.seconds:10.3f}")
+        return lines
+
+
+def _max_rss() -> int:
+    """Return the peak resident set size of the process, in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # KiB on Linux
+
+
+_profiler: Profiler | None = None
+
+
+def enable(*, trace_memory: bool = False) -> Profiler:
+    """Start recording stages with a new profiler, and return it."""
+    global _profiler  # noqa: PLW0603
+    _profiler = Profiler(trace_memory=trace_memory)
+    _profiler.start()
+    return _profiler
+
+
+def disable() -> None:
+    """Stop recording stages."""
+    global _profiler  # noqa: PLW0603
+    if _profiler is not None:
+        _profiler.stop()
+        _profiler = None
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record the block as a run of the named stage, if profiling."""
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    profiler.enter(name)
+    try:
+        yield
+    finally:
+        profiler.exit()
+
+
+def annotate(detail: str) -> None:
+    """Add a detail like "cache hit" to the current stage, if profiling."""
+    if _profiler is not None:
+        _profiler.annotate(detail)
+
+
+def timed[T](name: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Record time spent getting each item as runs of the named stage.
+
+    The iterator is returned as is when not profiling.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return iter(iterable)
+    return _timed(profiler, name, iter(iterable))
+
+
+def _timed[T](
+    profiler: Profiler, name: str, iterator: Iterator[T]
+) -> Iterator[T]:
+    while True:
+        profiler.enter(name)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            profiler.exit()
+        yield item
@@ -0,0 +1,406 @@
+"""Keyword prefix search and fuzzy search over emojis."""
+
+import heapq
+import json
+import re
+import struct
+import sys
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Self
+
+from emojipack import download
+from emojipack.download import GemojiEntry, fetch_gemoji_snapshot
+from emojipack.profiling import annotate, stage
+from emojipack.snippets import AlfredSnippet
+from emojipack.store import load_snapshot, save_snapshot
+
+TRIE_MAGIC = b"emojitrie"  # Start of keyword trie files
+TRIE_VERSION = 1  # Changed with the trie file layout
+# Magic, version, then sizes in bytes of the JSON text and of both arrays
+TRIE_HEADER = struct.Struct("<9sB3Q")
+FUZZY_KEY = "fuzzy-index-1"  # Snapshot key prefix, changed with the layout
+MIN_SIMILARITY = 0.5  # Minimum bigram similarity of matching words
+PREFIX_SIMILARITY = 0.8  # Similarity of words starting with a query word
+MIN_PREFIX_LENGTH = 3  # Shorter query words do not get PREFIX_SIMILARITY
+WORD_PATTERN = re.compile(r"[^\W_]+")  # Words of aliases, split on "_"
+
+
+class KeywordTrie:
+    """Prefix tree over snippet keywords, completing prefixes to snippets.
+
+    Keywords are sorted, so the keywords starting with the prefix of a node
+    form a range of the sorted list. Nodes are numbered in breadth-first order,
+    the children of a node are consecutive, and each node stores the characters
+    of its children edges as a string, in order. All of it is kept in flat
+    arrays, which are compact in memory and on disk.
+    """
+
+    def __init__(
+        self,
+        keywords: list[str],
+        emojis: list[str],
+        labels: list[str],
+        first_child: array[int],
+        ranges: array[int],
+    ) -> None:
+        """Initialize from trie arrays, see from_snippets to build them."""
+        self._keywords = keywords  # Sorted keywords
+        self._emojis = emojis  # Emoji of each keyword
+        self._labels = labels  # Children edge characters of each node
+        self._first_child = first_child  # Number of the first child
+        self._ranges = ranges  # Start and end of keyword range, interleaved
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[AlfredSnippet]) -> Self:
+        """Build a trie over the keywords of snippets."""
+        pairs = sorted((s.keyword, s.snippet) for s in snippets)
+        keywords = [keyword for keyword, _ in pairs]
+        emojis = [emoji for _, emoji in pairs]
+        labels: list[str] = []
+        first_child = array("I")
+        ranges = array("I")
+        queue = deque([(0, len(keywords), 0)])
+        next_node = 1
+        while queue:
+            start, end, depth = queue.popleft()
+            ranges.extend((start, end))
+            first_child.append(next_node)
+            # Keywords equal to the node prefix sort before the longer ones.
+            i = start
+            while i < end and len(keywords[i]) == depth:
+                i += 1
+            chars = []
+            while i < end:
+                char = keywords[i][depth]
+                j = i + 1
+                while j < end and keywords[j][depth] == char:
+                    j += 1
+                chars.append(char)
+                queue.append((i, j, depth + 1))
+                next_node += 1
+                i = j
+            labels.append("".join(chars))
+        return cls(keywords, emojis, labels, first_child, ranges)
+
+    def __len__(self) -> int:
+        """Return the number of keywords."""
+        return len(self._keywords)
+
+    def _find(self, prefix: str) -> int | None:
+        """Return the node of prefix, or None if no keyword starts with it."""
+        node = 0
+        for char in prefix:
+            position = self._labels[node].find(char)
+            if position < 0:
+                return None
+            node = self._first_child[node] + position
+        return node
+
+    def complete(
+        self, prefix: str, limit: int | None = None
+    ) -> list[tuple[str, str]]:
+        """Return (keyword, emoji) pairs of keywords starting with prefix.
+
+        Keywords are sorted, an exact match comes first. At most limit pairs
+        are returned if limit is given. Raise ValueError if limit is negative.
+        """
+        if limit is not None and limit < 0:
+            msg = f"Negative limit: {limit}"
+            raise ValueError(msg)
+        node = self._find(prefix)
+        if node is None:
+            return []
+        start, end = self._ranges[2 * node], self._ranges[2 * node + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return list(
+            zip(
+                self._keywords[start:end], self._emojis[start:end], strict=True
+            )
+        )
+
+    def save(self, path: Path) -> None:
+        """Save the trie to a file, to be loaded with load.
+
+        The file starts with TRIE_HEADER: TRIE_MAGIC, TRIE_VERSION, and the
+        sizes of the sections that follow. Keywords, emojis and labels come
+        first, as a JSON object of string lists encoded in UTF-8, then the
+        first_child and ranges arrays, as little-endian 32-bit unsigned ints.
+        It does not depend on the Python version or platform. The file is
+        written to a temporary name and renamed, and gets the permissions of
+        other outputs.
+        """
+        strings = {
+            "keywords": self._keywords,
+            "emojis": self._emojis,
+            "labels": self._labels,
+        }
+        text = json.dumps(strings, ensure_ascii=False).encode()
+        first_child = _little_endian(self._first_child)
+        ranges = _little_endian(self._ranges)
+        header = TRIE_HEADER.pack(
+            TRIE_MAGIC, TRIE_VERSION, len(text), len(first_child), len(ranges)
+        )
+        temp_path = path.with_name(f".{path.name}.tmp")
+        try:
+            with temp_path.open("wb") as f:
+                f.writelines((header, text, first_child, ranges))
+            temp_path.replace(path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> Self:
+        """Load a trie saved with save.
+
+        Raise FileNotFoundError if path is missing, ValueError if it is not a
+        trie file of this version.
+        """
+        if not path.exists():
+            raise FileNotFoundError(path)
+        content = path.read_bytes()
+        msg = f"Not a keyword trie file: {path}"
+        if not content.startswith(TRIE_MAGIC):
+            raise ValueError(msg)
+        try:
+            _, version, *sizes = TRIE_HEADER.unpack_from(content)
+        except struct.error:
+            raise ValueError(msg) from None
+        if version != TRIE_VERSION:
+            msg = f"Unsupported keyword trie version {version}: {path}"
+            raise ValueError(msg)
+        if TRIE_HEADER.size + sum(sizes) != len(content):
+            raise ValueError(msg)
+        text_end = TRIE_HEADER.size + sizes[0]
+        ranges_start = text_end + sizes[1]
+        try:
+            strings = json.loads(content[TRIE_HEADER.size : text_end])
+            return cls(
+                strings["keywords"],
+                strings["emojis"],
+                strings["labels"],
+                _from_little_endian(content[text_end:ranges_start]),
+                _from_little_endian(content[ranges_start:]),
+            )
+        except (ValueError, TypeError, KeyError):
+            raise ValueError(msg) from None
+
+
+def _little_endian(values: array[int]) -> bytes:
+    """Return an array of unsigned ints as little-endian bytes."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(data: bytes) -> array[int]:
+    """Read 32-bit unsigned ints from little-endian bytes."""
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+@dataclass(frozen=True)
+class FuzzyMatch:
+    """Emoji found by fuzzy search, with its relevance score."""
+
+    emoji: str
+    description: str
+    aliases: list[str]
+    score: float  # Sum of the best word similarity for each query word
+
+
+def _words(text: str) -> list[str]:
+    """Split text into lowercase words."""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def _ngrams(word: str, size: int) -> set[str]:
+    """Return the n-grams of word, padded to mark its start and end."""
+    padded = f"${word}$"
+    return {padded[i : i + size] for i in range(len(padded) - size + 1)}
+
+
+def _similarity(first: set[str], second: set[str]) -> float:
+    """Return the Dice coefficient of two n-gram sets."""
+    return 2 * len(first & second) / (len(first) + len(second))
+
+
+def _postings(data: bytes) -> memoryview:
+    """View packed unsigned ints as a sequence, without copying them."""
+    return memoryview(data).cast("I")
+
+
+class FuzzyIndex:
+    """Trigram index over emoji descriptions, tags and aliases.
+
+    Each distinct word is a term, mapped to the emojis using it. Terms are
+    indexed by their trigrams, so that a query word only scores the few terms
+    sharing a trigram with it. Scores are the Dice coefficient of bigrams,
+    which typos change less: "hart" is closer to "heart" than to "art".
+    Emojis are ranked by the sum, over query words, of their best matching
+    term similarity.
+
+    Posting lists are packed arrays of unsigned ints, stored as bytes, which
+    is compact and loads fast from a marshal snapshot.
+    """
+
+    def __init__(
+        self,
+        entries: tuple[list[str], list[str], list[list[str]]],
+        terms: list[str],
+        term_emojis: list[bytes],
+        trigram_terms: dict[str, bytes],
+    ) -> None:
+        """Initialize from index data, see from_entries to build it."""
+        self._emojis, self._descriptions, self._aliases = entries
+        self._terms = terms
+        self._term_emojis = term_emojis  # Postings of entries using terms
+        self._trigram_terms = trigram_terms  # Postings of terms
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[GemojiEntry]) -> Self:
+        """Build an index of gemoji entries."""
+        emojis: list[str] = []
+        descriptions: list[str] = []
+        aliases: list[list[str]] = []
+        term_ids: dict[str, int] = {}
+        term_emojis: list[array[int]] = []
+        for number, entry in enumerate(entries):
+            emojis.append(entry["emoji"])
+            descriptions.append(entry["description"])
+            aliases.append(entry["aliases"])
+            texts = [entry["description"], *entry["tags"], *entry["aliases"]]
+            words = {word for text in texts for word in _words(text)}
+            words.update(alias.lower() for alias in entry["aliases"])
+            for word in sorted(words):
+                term = term_ids.setdefault(word, len(term_ids))
+                if term == len(term_emojis):
+                    term_emojis.append(array("I"))
+                term_emojis[term].append(number)
+        trigram_terms: dict[str, array[int]] = {}
+        for term, word in enumerate(term_ids):
+            for trigram in _ngrams(word, 3):
+                trigram_terms.setdefault(trigram, array("I")).append(term)
+        return cls(
+            (emojis, descriptions, aliases),
+            list(term_ids),
+            [postings.tobytes() for postings in term_emojis],
+            {
+                trigram: postings.tobytes()
+                for trigram, postings in trigram_terms.items()
+            },
+        )
+
+    def __len__(self) -> int:
+        """Return the number of indexed emojis."""
+        return len(self._emojis)
+
+    def _similar_terms(
+        self, word: str, min_similarity: float
+    ) -> Iterator[tuple[int, float]]:
+        """Yield terms similar to word, with their similarity."""
+        candidates: set[int] = set()
+        for trigram in _ngrams(word, 3):
+            postings = self._trigram_terms.get(trigram)
+            if postings is not None:
+                candidates.update(_postings(postings))
+        bigrams = _ngrams(word, 2)
+        for term in candidates:
+            text = self._terms[term]
+            similarity = _similarity(bigrams, _ngrams(text, 2))
+            if (
+                similarity < PREFIX_SIMILARITY
+                and len(word) >= MIN_PREFIX_LENGTH
+                and text.startswith(word)
+            ):
+                similarity = PREFIX_SIMILARITY
+            if similarity >= min_similarity:
+                yield term, similarity
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        min_similarity: float = MIN_SIMILARITY,
+    ) -> list[FuzzyMatch]:
+        """Return the emojis best matching query, best first.
+
+        Words of the query match words of the emoji descriptions, tags and
+        aliases that share enough bigrams with them, or start with them. Ties
+        are broken by gemoji order.
+        """
+        scores: dict[int, float] = {}
+        for word in set(_words(query)):
+            best: dict[int, float] = {}
+            for term, similarity in self._similar_terms(word, min_similarity):
+                for number in _postings(self._term_emojis[term]):
+                    if similarity > best.get(number, 0.0):
+                        best[number] = similarity
+            for number, similarity in best.items():
+                scores[number] = scores.get(number, 0.0) + similarity
+        ranked = heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+        return [
+            FuzzyMatch(
+                self._emojis[number],
+                self._descriptions[number],
+                self._aliases[number],
+                score,
+            )
+            for number, score in ranked
+        ]
+
+    def save(self, path: Path, key: str) -> None:
+        """Save the index to a snapshot tagged with key."""
+        data = {
+            "emojis": self._emojis,
+            "descriptions": self._descriptions,
+            "aliases": self._aliases,
+            "terms": self._terms,
+            "term_emojis": self._term_emojis,
+            "trigram_terms": self._trigram_terms,
+        }
+        save_snapshot(path, key, data)
+
+    @classmethod
+    def load(cls, path: Path, key: str) -> Self | None:
+        """Load an index saved with key, or None if missing or stale."""
+        data: Any = load_snapshot(path, key)
+        if not isinstance(data, dict):
+            return None
+        return cls(
+            (data["emojis"], data["descriptions"], data["aliases"]),
+            data["terms"],
+            data["term_emojis"],
+            data["trigram_terms"],
+        )
+
+
+def load_fuzzy_index() -> FuzzyIndex:
+    """Return the fuzzy index of gemoji data.
+
+    The index is cached in CACHE_DIR, and built again only when the gemoji
+    snapshot changes.
+    """
+    gemoji_key, entries = fetch_gemoji_snapshot()
+    with stage("index"):
+        path = download.CACHE_DIR / "fuzzy.snapshot"
+        key = f"{FUZZY_KEY}:{gemoji_key}"
+        index = FuzzyIndex.load(path, key)
+        if index is None:
+            annotate("snapshot miss")
+            index = FuzzyIndex.from_entries(entries)
+            index.save(path, key)
+        else:
+            annotate("snapshot hit")
+    return index
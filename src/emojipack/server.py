@@ -0,0 +1,227 @@
+"""Local HTTP server answering snippet lookups from in-memory indexes."""
+
+import asyncio
+import json
+from collections.abc import Iterable
+from http import HTTPStatus
+from pathlib import Path
+from typing import Self
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from emojipack.search import KeywordTrie
+from emojipack.snippets import AlfredSnippet
+
+DEFAULT_LIMIT = 20  # Completions returned when the request sets no limit
+MAX_HEADER_SIZE = 1 << 16  # Longest request head accepted, in bytes
+JSON_TYPE = b"application/json"
+
+type Body = dict[str, object] | list[dict[str, object]]
+
+
+def _snippet_data(snippet: AlfredSnippet) -> dict[str, object]:
+    """Return snippet fields as a JSON object."""
+    return {
+        "keyword": snippet.keyword,
+        "emoji": snippet.snippet,
+        "name": snippet.name,
+        "uid": snippet.uid,
+    }
+
+
+class SnippetIndex:
+    """Snippets indexed by keyword, uid and emoji, with prefix completion."""
+
+    def __init__(
+        self,
+        keywords: dict[str, AlfredSnippet],
+        uids: dict[str, AlfredSnippet],
+        emojis: dict[str, list[str]],
+        trie: KeywordTrie,
+    ) -> None:
+        """Initialize from indexes, see from_snippets to build them."""
+        self._keywords = keywords
+        self._uids = uids
+        self._emojis = emojis  # Keywords of each emoji, in pack order
+        self._trie = trie
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[AlfredSnippet]) -> Self:
+        """Index snippets, the last one wins when keywords or uids repeat."""
+        keywords: dict[str, AlfredSnippet] = {}
+        uids: dict[str, AlfredSnippet] = {}
+        emojis: dict[str, list[str]] = {}
+        for snippet in snippets:
+            keywords[snippet.keyword] = snippet
+            uids[snippet.uid] = snippet
+            emojis.setdefault(snippet.snippet, []).append(snippet.keyword)
+        trie = KeywordTrie.from_snippets(keywords.values())
+        return cls(keywords, uids, emojis, trie)
+
+    def __len__(self) -> int:
+        """Return the number of distinct keywords."""
+        return len(self._keywords)
+
+    def keyword(self, keyword: str) -> AlfredSnippet | None:
+        """Return the snippet of keyword, or None if missing."""
+        return self._keywords.get(keyword)
+
+    def uid(self, uid: str) -> AlfredSnippet | None:
+        """Return the snippet with uid, or None if missing."""
+        return self._uids.get(uid)
+
+    def aliases(self, emoji: str) -> list[str]:
+        """Return the keywords of emoji, empty if missing."""
+        return self._emojis.get(emoji, [])
+
+    def complete(self, prefix: str, limit: int) -> list[tuple[str, str]]:
+        """Return (keyword, emoji) pairs of keywords starting with prefix."""
+        return self._trie.complete(prefix, limit)
+
+
+def _not_found(what: str) -> tuple[HTTPStatus, Body]:
+    return HTTPStatus.NOT_FOUND, {"error": f"Unknown {what}"}
+
+
+def _snippet_response(
+    snippet: AlfredSnippet | None, what: str
+) -> tuple[HTTPStatus, Body]:
+    if snippet is None:
+        return _not_found(what)
+    return HTTPStatus.OK, _snippet_data(snippet)
+
+
+def _aliases_response(
+    index: SnippetIndex, emoji: str
+) -> tuple[HTTPStatus, Body]:
+    aliases = index.aliases(emoji)
+    if not aliases:
+        return _not_found("emoji")
+    return HTTPStatus.OK, {"emoji": emoji, "keywords": aliases}
+
+
+def _complete_response(
+    index: SnippetIndex, prefix: str, query: str
+) -> tuple[HTTPStatus, Body]:
+    limits = parse_qs(query).get("limit", [str(DEFAULT_LIMIT)])
+    try:
+        limit = int(limits[-1])
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        return HTTPStatus.BAD_REQUEST, {"error": "Invalid limit"}
+    return HTTPStatus.OK, [
+        {"keyword": keyword, "emoji": emoji}
+        for keyword, emoji in index.complete(prefix, limit)
+    ]
+
+
+def respond(index: SnippetIndex, target: str) -> tuple[HTTPStatus, Body]:
+    """Answer a GET request for target, a path with an optional query.
+
+    Paths are /keyword/KEYWORD and /uid/UID for a snippet, /emoji/EMOJI for the
+    keywords of an emoji, and /complete/PREFIX?limit=N for completions, with
+    path segments percent-encoded.
+    """
+    parts = urlsplit(target)
+    kind, _, value = parts.path.lstrip("/").partition("/")
+    value = unquote(value)
+    if kind == "keyword":
+        return _snippet_response(index.keyword(value), kind)
+    if kind == "uid":
+        return _snippet_response(index.uid(value), kind)
+    if kind == "emoji":
+        return _aliases_response(index, value)
+    if kind == "complete":
+        return _complete_response(index, value, parts.query)
+    return _not_found("path")
+
+
+def _response(
+    status: HTTPStatus, body: Body, *, keep_alive: bool = True
+) -> bytes:
+    """Format an HTTP/1.1 response with a JSON body."""
+    content = json.dumps(body, ensure_ascii=False).encode()
+    connection = b"keep-alive" if keep_alive else b"close"
+    return b"".join(
+        (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n".encode(),
+            b"Content-Type: " + JSON_TYPE + b"\r\n",
+            f"Content-Length: {len(content)}\r\n".encode(),
+            b"Connection: " + connection + b"\r\n\r\n",
+            content,
+        )
+    )
+
+
+def _parse_head(head: bytes) -> tuple[str, str, bool]:
+    """Return the method, target and keep-alive flag of a request head.
+
+    The head is decoded as UTF-8, so that targets with emojis not percent-
+    encoded are understood too.
+    """
+    request_line, *header_lines = head.decode(errors="replace").split("\r\n")
+    method, _, rest = request_line.partition(" ")
+    target = rest.partition(" ")[0]
+    keep_alive = True
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "connection":
+            keep_alive = value.strip().lower() != "close"
+    return method, target, keep_alive
+
+
+async def _handle(
+    index: SnippetIndex,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    """Answer the requests of a connection until the client closes it.
+
+    Requests are answered in order, the connection is kept alive unless the
+    client asks to close it. Request bodies are not supported.
+    """
+    try:
+        keep_alive = True
+        while keep_alive:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            method, target, keep_alive = _parse_head(head)
+            if method == "GET":
+                status, body = respond(index, target)
+            else:
+                status = HTTPStatus.METHOD_NOT_ALLOWED
+                body = {"error": "Only GET is supported"}
+                keep_alive = False
+            writer.write(_response(status, body, keep_alive=keep_alive))
+            await writer.drain()
+    except ConnectionError:
+        return
+    finally:
+        writer.close()
+
+
+async def start_server(
+    index: SnippetIndex,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    path: Path | None = None,
+) -> asyncio.Server:
+    """Start serving index over TCP on host and port, or a Unix socket path.
+
+    Port 0 picks a free port, see the sockets of the returned server.
+    """
+
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        await _handle(index, reader, writer)
+
+    if path is not None:
+        return await asyncio.start_unix_server(
+            handle, path, limit=MAX_HEADER_SIZE
+        )
+    return await asyncio.start_server(
+        handle, host, port, limit=MAX_HEADER_SIZE
+    )
@@ -1,8 +1,10 @@
 """Snippet generation for Alfred."""
 
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
-from emojipack.download import GemojiEntry
+if TYPE_CHECKING:
+    from emojipack.download import GemojiEntry
 
 
 def generate_uid(keyword: str, emoji: str) -> str:
@@ -11,7 +13,7 @@ def generate_uid(keyword: str, emoji: str) -> str:
     return f"{keyword}-{hex_codes}"
 
 
-@dataclass
+@dataclass(slots=True)
 class AlfredSnippet:
     """Alfred snippet with keyword, emoji, and metadata."""
 
@@ -21,7 +23,7 @@ class AlfredSnippet:
     uid: str
 
     @classmethod
-    def from_gemoji(cls, entry: GemojiEntry, alias: str) -> "AlfredSnippet":
+    def from_gemoji(cls, entry: "GemojiEntry", alias: str) -> "AlfredSnippet":
         """Create AlfredSnippet from GemojiEntry and alias keyword."""
         if alias not in entry["aliases"]:
             msg = f"Alias '{alias}' not in {entry['aliases']}"
@@ -43,6 +45,19 @@ class AlfredSnippet:
             uid=generate_uid(alias, entry["emoji"]),
         )
 
+    @classmethod
+    def from_json(
+        cls, data: dict[str, dict[str, str | bool]]
+    ) -> "AlfredSnippet":
+        """Create AlfredSnippet from Alfred snippet JSON format."""
+        alfred_snippet = data["alfredsnippet"]
+        return cls(
+            keyword=str(alfred_snippet["keyword"]),
+            name=str(alfred_snippet["name"]),
+            snippet=str(alfred_snippet["snippet"]),
+            uid=str(alfred_snippet["uid"]),
+        )
+
     def to_json(self) -> dict[str, dict[str, str | bool]]:
         """Convert to Alfred snippet JSON format."""
         return {
@@ -0,0 +1,70 @@
+"""Binary snapshots of parsed data, stored in the cache directory."""
+
+import marshal
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+SNAPSHOT_FORMAT = 1
+
+
+def save_snapshot(
+    path: Path, key: str, data: list[Any] | dict[str, Any]
+) -> None:
+    """Write data tagged with key, atomically replacing path.
+
+    Data must only contain types supported by marshal: containers, strings,
+    numbers, booleans and None.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    content = marshal.dumps((SNAPSHOT_FORMAT, key, data))
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        Path(temp_name).replace(path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_snapshot(path: Path, key: str) -> object | None:
+    """Return data saved at path with key, or None if missing or stale."""
+    try:
+        content = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    data: object
+    try:
+        # Snapshots are only written by save_snapshot, in the user cache.
+        format_, stored_key, data = marshal.loads(content)  # noqa: S302
+    except (EOFError, ValueError, TypeError):
+        return None
+    if (format_, stored_key) != (SNAPSHOT_FORMAT, key):
+        return None
+    return data
+
+
+def evict_snapshots(directory: Path, max_bytes: int) -> int:
+    """Remove least recently used snapshots until directory fits max_bytes.
+
+    Snapshots are ordered by modification time, so readers touch the ones they
+    load to keep them. Return the number of removed snapshots.
+    """
+    entries = []
+    for path in directory.glob("*.snapshot"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # Removed by another process
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,122 @@
+"""Columnar snippet storage."""
+
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Self, overload
+
+from emojipack.snippets import AlfredSnippet
+
+
+# Defining __eq__ makes instances unhashable, as they are mutable.
+class SnippetTable(Sequence[AlfredSnippet]):  # noqa: PLW1641
+    """Sequence of snippets stored column by column.
+
+    Keywords and uids are kept in contiguous lists. Names and emojis, which are
+    shared by all the aliases of an emoji, are interned in a string pool and
+    stored as indexes into it. AlfredSnippet objects are only created when rows
+    are accessed.
+    """
+
+    __slots__ = (
+        "_keywords",
+        "_name_ids",
+        "_pool",
+        "_pool_ids",
+        "_snippet_ids",
+        "_uids",
+    )
+
+    def __init__(self, snippets: Iterable[AlfredSnippet] = ()) -> None:
+        """Initialize with snippets, stored in order."""
+        self._keywords: list[str] = []
+        self._uids: list[str] = []
+        self._name_ids = array("I")
+        self._snippet_ids = array("I")
+        self._pool: list[str] = []
+        self._pool_ids: dict[str, int] = {}
+        self.extend(snippets)
+
+    def _intern(self, value: str) -> int:
+        """Return the index of value in the string pool, adding it."""
+        index = self._pool_ids.get(value)
+        if index is None:
+            index = len(self._pool)
+            self._pool.append(value)
+            self._pool_ids[value] = index
+        return index
+
+    def append(self, snippet: AlfredSnippet) -> None:
+        """Add a snippet at the end of the table."""
+        self._keywords.append(snippet.keyword)
+        self._uids.append(snippet.uid)
+        self._name_ids.append(self._intern(snippet.name))
+        self._snippet_ids.append(self._intern(snippet.snippet))
+
+    def extend(self, snippets: Iterable[AlfredSnippet]) -> None:
+        """Add snippets at the end of the table."""
+        for snippet in snippets:
+            self.append(snippet)
+
+    @property
+    def keywords(self) -> Sequence[str]:
+        """Keyword column."""
+        return self._keywords
+
+    @property
+    def uids(self) -> Sequence[str]:
+        """Uid column."""
+        return self._uids
+
+    @property
+    def emojis(self) -> Sequence[str]:
+        """Snippet text column, the emojis."""
+        return [self._pool[i] for i in self._snippet_ids]
+
+    def __len__(self) -> int:
+        """Return the number of snippets."""
+        return len(self._keywords)
+
+    def _row(self, index: int) -> AlfredSnippet:
+        return AlfredSnippet(
+            keyword=self._keywords[index],
+            name=self._pool[self._name_ids[index]],
+            snippet=self._pool[self._snippet_ids[index]],
+            uid=self._uids[index],
+        )
+
+    @overload
+    def __getitem__(self, index: int) -> AlfredSnippet: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Self: ...
+
+    def __getitem__(self, index: int | slice) -> AlfredSnippet | Self:
+        """Return the snippet at index, or a new table for a slice."""
+        if isinstance(index, slice):
+            rows = range(*index.indices(len(self)))
+            return type(self)(self._row(i) for i in rows)
+        return self._row(range(len(self))[index])
+
+    def __iter__(self) -> Iterator[AlfredSnippet]:
+        """Iterate over snippets, created row by row."""
+        pool = self._pool
+        for keyword, name_id, snippet_id, uid in zip(
+            self._keywords,
+            self._name_ids,
+            self._snippet_ids,
+            self._uids,
+            strict=True,
+        ):
+            yield AlfredSnippet(keyword, pool[name_id], pool[snippet_id], uid)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare snippets in order with any sequence of snippets."""
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other, strict=True)
+        )
+
+    def __repr__(self) -> str:
+        """Return representation listing the snippets."""
+        return f"{type(self).__name__}({list(self)!r})"
@@ -1,6 +1,17 @@
 """Global test fixtures for emojipack tests."""
 
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
 import pytest
+import requests
+
+from emojipack.download import SessionSettings, close_session
+
+from .http_server import LocalServer, start_server
+
+REAL_REQUEST = requests.sessions.Session.request
 
 
 @pytest.fixture(autouse=True)
@@ -10,3 +21,39 @@ def no_requests(monkeypatch: pytest.MonkeyPatch):
     This prevents any real HTTP requests during tests.
     """
     monkeypatch.delattr("requests.sessions.Session.request")
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> Iterator[Path]:
+    """Use a temporary cache directory and a new session for all tests."""
+    path = tmp_path / "cache"
+    monkeypatch.setattr("emojipack.download.CACHE_DIR", path)
+    monkeypatch.setattr(
+        "emojipack.download._session_settings", SessionSettings()
+    )
+    yield path
+    close_session()
+
+
+@pytest.fixture
+def http_server(monkeypatch: pytest.MonkeyPatch) -> Iterator[LocalServer]:
+    """Run a local stand-in HTTP server, the only host requests may reach."""
+    server, state = start_server()
+
+    def local_request(
+        self: requests.Session,
+        method: str,
+        url: str,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> requests.Response:
+        assert url.startswith(state.url), f"Unexpected request to {url}"
+        return REAL_REQUEST(self, method, url, **kwargs)
+
+    monkeypatch.setattr(
+        "requests.sessions.Session.request", local_request, raising=False
+    )
+    yield state
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,93 @@
+"""Local stand-in HTTP server for download tests."""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class Route:
+    """Response served for a path."""
+
+    body: bytes
+    delay: float = 0  # Seconds to wait before responding
+    etag: str | None = None  # Sent, and matched against If-None-Match
+
+
+@dataclass
+class LocalServer:
+    """Routes and request statistics of a running local server."""
+
+    url: str
+    routes: dict[str, Route] = field(default_factory=dict)
+    requests: list[str] = field(default_factory=list)
+    not_modified: int = 0  # Conditional requests answered with 304
+    in_flight: int = 0
+    max_in_flight: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def make_handler(state: LocalServer) -> type[BaseHTTPRequestHandler]:
+    """Create a request handler class serving state.routes."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            with state.lock:
+                state.requests.append(self.path)
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                self._respond()
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def _respond(self) -> None:
+            route = state.routes.get(self.path)
+            if route is None:
+                self.send_error(404)
+                return
+            if route.delay:
+                time.sleep(route.delay)
+            if (
+                route.etag is not None
+                and self.headers.get("If-None-Match") == route.etag
+            ):
+                with state.lock:
+                    state.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", route.etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            if route.etag is not None:
+                self.send_header("ETag", route.etag)
+            self.send_header("Content-Length", str(len(route.body)))
+            self.end_headers()
+            self.wfile.write(route.body)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            """Do not log requests to stderr."""
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    """Server ignoring clients that disconnect, after a timeout."""
+
+    def handle_error(
+        self, request: object, client_address: tuple[str, int]
+    ) -> None:
+        """Ignore errors, tests check responses from the client side."""
+
+
+def start_server() -> tuple[ThreadingHTTPServer, LocalServer]:
+    """Start a server on a free local port, in a daemon thread."""
+    state = LocalServer(url="")
+    server = QuietServer(("127.0.0.1", 0), make_handler(state))
+    state.url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(
+        target=server.serve_forever, args=(0.05,), daemon=True
+    ).start()
+    return server, state
@@ -0,0 +1,210 @@
+"""Zip archive assembly tests for emojipack."""
+
+import io
+import zipfile
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from emojipack.archive import (
+    ArchiveReader,
+    ArchiveWriter,
+    compress,
+    is_encoded,
+    iter_members,
+    read_directory,
+    read_member,
+)
+
+
+def test_archive_writer_stored_and_deflated():
+    """ArchiveWriter writes stored and deflated members readable by zipfile."""
+    buffer = io.BytesIO()
+    with ArchiveWriter(buffer, date_time=(2020, 1, 2, 3, 4, 6)) as archive:
+        archive.add(compress("stored.txt", b"plain", None))
+        archive.add(compress("deflated.txt", b"squeeze " * 100, 9))
+        archive.add(compress("émoji-😀.json", "😀".encode(), 1))
+
+    with zipfile.ZipFile(buffer) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["stored.txt", "deflated.txt", "émoji-😀.json"]
+        assert zf.read("stored.txt") == b"plain"
+        assert zf.read("deflated.txt") == b"squeeze " * 100
+        assert zf.read("émoji-😀.json") == "😀".encode()
+        info = zf.getinfo("deflated.txt")
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+        assert info.compress_size < info.file_size
+        assert info.date_time == (2020, 1, 2, 3, 4, 6)
+
+
+def test_archive_writer_zip64_member_count():
+    """ArchiveWriter switches to zip64 records above 65535 members."""
+    buffer = io.BytesIO()
+    count = 0x10000 + 10
+    with ArchiveWriter(buffer) as archive:
+        for i in range(count):
+            archive.add(compress(f"{i}.txt", b"", None))
+
+    with zipfile.ZipFile(buffer) as zf:
+        assert len(zf.infolist()) == count
+        assert zf.read(f"{count - 1}.txt") == b""
+        infos = zf.infolist()
+    names, offsets = read_directory(buffer)
+    assert names == [info.filename for info in infos]
+    assert list(offsets) == [info.header_offset for info in infos]
+
+
+def test_archive_writer_fixed_date_time():
+    """ArchiveWriter gives identical archives for identical members."""
+    archives = []
+    for _ in range(2):
+        buffer = io.BytesIO()
+        with ArchiveWriter(buffer) as archive:
+            archive.add(compress("a.txt", b"same", 6))
+        archives.append(buffer.getvalue())
+
+    assert archives[0] == archives[1]
+    with zipfile.ZipFile(io.BytesIO(archives[0])) as zf:
+        assert zf.getinfo("a.txt").date_time == (1980, 1, 1, 0, 0, 0)
+
+
+def test_is_encoded():
+    """is_encoded compares content, compression type and level."""
+    content = b"squeeze " * 100
+    deflated = compress("a.txt", content, 1)
+    stored = compress("a.txt", content, None)
+    assert is_encoded(deflated, content, 1)
+    assert not is_encoded(deflated, content, 9)
+    assert not is_encoded(replace(deflated, level=None), content, 1)
+    assert not is_encoded(deflated, content, None)
+    assert not is_encoded(deflated, content + b"!", 1)
+    assert is_encoded(stored, content, None)
+    assert not is_encoded(stored, content, 1)
+    assert not is_encoded(stored, b"other", None)
+
+
+def test_archive_reader_get(tmp_path: Path):
+    """ArchiveReader returns members with their compressed bytes as is."""
+    members = [
+        compress("stored.txt", b"plain", None),
+        compress("émoji-😀.json", "😀".encode() * 50, 9),
+    ]
+    path = tmp_path / "test.zip"
+    with path.open("wb") as f, ArchiveWriter(f) as archive:
+        for member in members:
+            archive.add(member)
+
+    with ArchiveReader(path) as reader:
+        assert reader.compresslevel == 9
+        assert [reader.get(member.name) for member in members] == members
+        assert reader.get("missing.txt") is None
+
+
+@pytest.mark.parametrize(
+    ("levels", "expected"), [((1, 1), 1), ((1, 9), None), ((None,), None)]
+)
+def test_archive_writer_records_level(
+    tmp_path: Path, levels: tuple[int | None, ...], expected: int | None
+):
+    """ArchiveWriter records the level only if all deflated members agree."""
+    path = tmp_path / "test.zip"
+    with path.open("wb") as f, ArchiveWriter(f) as archive:
+        archive.add(compress("stored.txt", b"plain", None))
+        for i, level in enumerate(levels):
+            archive.add(compress(f"{i}.txt", b"squeeze " * 100, level))
+
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+    with ArchiveReader(path) as reader:
+        assert reader.compresslevel == expected
+        deflated = reader.get("0.txt")
+        stored = reader.get("stored.txt")
+    assert deflated is not None
+    assert deflated.level == expected
+    assert stored is not None
+    assert stored.level is None
+
+
+class UnseekableStream(io.RawIOBase):
+    """Write-only stream, so that zipfile writes data descriptors."""
+
+    def __init__(self) -> None:
+        """Initialize with an empty buffer of the written bytes."""
+        self.buffer = io.BytesIO()
+
+    def writable(self) -> bool:
+        """Return True, the stream is written to."""
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        """Append data to the buffer."""
+        return self.buffer.write(data)
+
+
+def test_iter_members_in_file_order():
+    """iter_members reads members from local headers, decompressed."""
+    buffer = io.BytesIO()
+    with ArchiveWriter(buffer) as archive:
+        archive.add(compress("stored.txt", b"plain", None))
+        archive.add(compress("émoji-😀.json", "😀".encode() * 50, 9))
+    buffer.seek(0)
+    assert list(iter_members(buffer)) == [
+        ("stored.txt", b"plain"),
+        ("émoji-😀.json", "😀".encode() * 50),
+    ]
+
+
+def test_iter_members_data_descriptors():
+    """iter_members reads members with sizes after their data."""
+    stream = UnseekableStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.txt", b"squeeze " * 100)
+        zf.writestr("b.txt", b"")
+    stream.buffer.seek(0)
+    assert list(iter_members(stream.buffer)) == [
+        ("a.txt", b"squeeze " * 100),
+        ("b.txt", b""),
+    ]
+    stream = UnseekableStream()
+    with zipfile.ZipFile(stream, "w") as zf:
+        zf.writestr("stored.txt", b"plain")
+        zf.writestr("PK\x07\x08.txt", b"PK\x07\x08")
+    stream.buffer.seek(0)
+    assert list(iter_members(stream.buffer)) == [
+        ("stored.txt", b"plain"),
+        ("PK\x07\x08.txt", b"PK\x07\x08"),
+    ]
+
+
+@pytest.mark.parametrize("comment", [b"", b"a comment"])
+def test_read_directory_and_member(comment: bytes):
+    """read_directory lists names and offsets, read_member reads them."""
+    stream = UnseekableStream()
+    with zipfile.ZipFile(stream, "w") as zf:
+        zf.writestr("stored.txt", b"plain")
+        zf.writestr("émoji-😀.json", "😀".encode() * 50, zipfile.ZIP_DEFLATED)
+        zf.comment = comment
+    buffer = stream.buffer
+    with zipfile.ZipFile(buffer) as zf:
+        infos = zf.infolist()
+    names, offsets = read_directory(buffer)
+    assert names == ["stored.txt", "émoji-😀.json"]
+    assert list(offsets) == [info.header_offset for info in infos]
+    described_sizes: dict[int, int] = {}
+    assert [
+        read_member(buffer, offset, described_sizes)
+        for offset in offsets[::-1]
+    ] == [("émoji-😀.json", "😀".encode() * 50), ("stored.txt", b"plain")]
+    with pytest.raises(zipfile.BadZipFile, match="End of central directory"):
+        read_directory(io.BytesIO(buffer.getvalue()[:-1]))
+
+
+def test_iter_members_checks_crc():
+    """iter_members rejects members whose content does not match its CRC."""
+    buffer = io.BytesIO()
+    with ArchiveWriter(buffer) as archive:
+        archive.add(compress("a.txt", b"plain", None))
+    corrupt = io.BytesIO(buffer.getvalue().replace(b"plain", b"plane"))
+    with pytest.raises(zipfile.BadZipFile, match="CRC"):
+        list(iter_members(corrupt))
@@ -0,0 +1,92 @@
+"""Benchmark suite tests, on packs small enough to run quickly."""
+
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from benchmarks.suite import (
+    BenchmarkResult,
+    app,
+    find_regressions,
+    load_results,
+    run_suite,
+    save_results,
+    synthetic_snippets,
+)
+
+runner = CliRunner()
+
+
+def test_synthetic_snippets_are_unique():
+    """synthetic_snippets generates distinct keywords and emojis."""
+    snippets = list(synthetic_snippets(2001))
+    assert len(snippets) == 2001
+    assert len({s.keyword for s in snippets}) == 2001
+    assert len({s.snippet for s in snippets}) == 1001
+
+
+def test_run_suite(tmp_path: Path):
+    """run_suite measures every benchmark for every size."""
+    results = list(run_suite([10, 20], tmp_path))
+    names = [
+        "write",
+        "read",
+        "iter_snippets",
+        "write_macos_plist",
+        "write_macos_plist_binary",
+        "dump_macos_plist",
+        "compare_emojis",
+        "compare_keywords",
+        "generate",
+        "serve_lookups",
+    ]
+    assert [(r.name, r.size) for r in results] == [
+        (name, size) for size in (10, 20) for name in names
+    ]
+    assert all(r.seconds > 0 and r.peak_bytes > 0 for r in results)
+    assert (tmp_path / "20" / "Emoji Pack.alfredsnippets").exists()
+
+
+def test_run_suite_selected_names(tmp_path: Path):
+    """run_suite only runs selected benchmarks, and write that read needs."""
+    results = run_suite([10], tmp_path, names=["read"])
+    assert [r.name for r in results] == ["write", "read"]
+
+
+def test_save_load_results(tmp_path: Path):
+    """load_results reads the results written by save_results."""
+    results = [BenchmarkResult("read", 10, 0.5, 1024)]
+    path = tmp_path / "results" / "bench.json"
+    save_results(path, results)
+    assert load_results(path) == results
+
+
+def test_find_regressions():
+    """find_regressions reports metrics grown by more than the tolerance."""
+    baseline = [
+        BenchmarkResult("read", 10, 1.0, 1000),
+        BenchmarkResult("write", 10, 1.0, 1000),
+    ]
+    current = [
+        BenchmarkResult("read", 10, 1.2, 1500),
+        BenchmarkResult("write", 10, 0.5, 1000),
+        BenchmarkResult("write", 100, 9.0, 9000),
+    ]
+    regressions = find_regressions(baseline, current, tolerance=0.25)
+    assert [(r.name, r.size, r.metric) for r in regressions] == [
+        ("read", 10, "peak_bytes")
+    ]
+    assert str(regressions[0]) == "read[10] peak_bytes: 1000 -> 1500 (1.50x)"
+
+
+def test_cli_baseline_regression(tmp_path: Path):
+    """The benchmark command exits with an error on regressions."""
+    baseline = tmp_path / "baseline.json"
+    save_results(baseline, [BenchmarkResult("read", 10, 0.0, 0)])
+    output = tmp_path / "bench.json"
+    args = ["--size", "10", "--only", "read", "--repeat", "1"]
+    args += ["--workdir", str(tmp_path / "work"), "--output", str(output)]
+    result = runner.invoke(app, [*args, "--baseline", str(baseline)])
+    assert result.exit_code == 1
+    assert "Regression: read[10] seconds" in result.stderr
+    assert [r.name for r in load_results(output)] == ["write", "read"]
@@ -3,21 +3,41 @@
 import json
 import os
 import plistlib
+import pstats
+import shutil
 import subprocess
+import sys
+import tracemalloc
 import zipfile
 from pathlib import Path
 from unittest.mock import patch
 
+import pytest
 import yaml
 from typer.testing import CliRunner
 
 from emojipack.cli import app
+from emojipack.download import Source
 from emojipack.pack import SnippetPack
+from emojipack.server import SnippetIndex
 from emojipack.snippets import AlfredSnippet
 
+from .http_server import LocalServer, Route
 from .test_download import SAMPLE_GEMOJI_JSON
 
 runner = CliRunner()
+# Import time of the CLI, typer included, over that of typer in the same run
+IMPORT_TIME_FACTOR = 4
+HEAVY_MODULES = {
+    "asyncio",
+    "concurrent.futures",
+    "multiprocessing",
+    "requests",
+    "requests_cache",
+    "yaml",
+    "emojipack.comparison",
+    "emojipack.pack",
+}  # Modules imported only by the commands using them
 
 
 def test_help_command_exits_successfully():
@@ -164,6 +184,126 @@ def test_compare_verbose_shows_keywords(tmp_path: Path):
     assert output == expected
 
 
+def _write_compared_packs(tmp_path: Path) -> list[str]:
+    """Write packs to compare, return their paths as arguments."""
+    theirs_pack = SnippetPack(
+        snippets=[
+            AlfredSnippet("thumbsup", "👍 Thumbs up", "👍", uid="t1"),
+            AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="t2"),
+        ],
+    )
+    mine_pack = SnippetPack(
+        snippets=[
+            AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="m1"),
+            AlfredSnippet("thumbsup", "👎 Thumbs down", "👎", uid="m2"),
+        ],
+    )
+    theirs_path = tmp_path / "theirs.alfredsnippets"
+    mine_path = tmp_path / "mine.alfredsnippets"
+    theirs_pack.write(theirs_path)
+    mine_pack.write(mine_path)
+    return [str(theirs_path), str(mine_path)]
+
+
+def test_compare_outputs_json(tmp_path: Path):
+    """CLI compare --format json has the same content as YAML."""
+    paths = _write_compared_packs(tmp_path)
+    for verbose in ([], ["--verbose"]):
+        result = runner.invoke(app, ["compare", *verbose, *paths])
+        json_result = runner.invoke(
+            app, ["compare", "--format", "json", *verbose, *paths]
+        )
+        assert json_result.exit_code == 0
+        assert json.loads(json_result.stdout) == yaml.safe_load(result.stdout)
+
+
+def test_compare_outputs_json_lines(tmp_path: Path):
+    """CLI compare --format jsonl writes one record per line."""
+    paths = _write_compared_packs(tmp_path)
+    result = runner.invoke(app, ["compare", "--format", "jsonl", *paths])
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert records == [
+        {
+            "type": "emoji",
+            "status": "removed",
+            "emoji": "👍",
+            "name": "👍 Thumbs up",
+            "theirs": ["thumbsup"],
+            "mine": [],
+        },
+        {
+            "type": "emoji",
+            "status": "added",
+            "emoji": "👎",
+            "name": "👎 Thumbs down",
+            "theirs": [],
+            "mine": ["thumbsup"],
+        },
+        {
+            "type": "keyword",
+            "status": "modified",
+            "keyword": "thumbsup",
+            "theirs": "👍 Thumbs up",
+            "mine": "👎 Thumbs down",
+        },
+    ]
+    args = ["compare", "--format", "jsonl", "--verbose", *paths]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    statuses = [
+        json.loads(line)["status"] for line in result.stdout.splitlines()
+    ]
+    assert statuses == ["removed", "found", "added", "modified", "matching"]
+
+
+def test_compare_rejects_unknown_format(tmp_path: Path):
+    """CLI compare only writes YAML, JSON or JSON Lines."""
+    paths = _write_compared_packs(tmp_path)
+    result = runner.invoke(app, ["compare", "--format", "toml", *paths])
+    assert result.exit_code == 2
+    assert "Unknown format: toml" in result.stderr
+
+
+def test_compare_batch_of_packs(tmp_path: Path):
+    """CLI compare reports each pack of a directory or glob against mine."""
+    theirs, mine = _write_compared_packs(tmp_path)
+    releases = tmp_path / "releases"
+    releases.mkdir()
+    for release in ("v1", "v2"):
+        shutil.copy(theirs, releases / f"{release}.alfredsnippets")
+    single = runner.invoke(app, ["compare", "--format", "json", theirs, mine])
+    expected = json.loads(single.stdout)
+    for pattern in (releases, releases / "v*.alfredsnippets"):
+        args = ["compare", "--workers", "1", str(pattern), mine]
+        result = runner.invoke(app, args)
+        assert result.exit_code == 0
+        assert yaml.safe_load(result.stdout) == {
+            "v1": expected,
+            "v2": expected,
+        }
+    args = ["compare", "--format", "jsonl", "--workers", "1", str(releases)]
+    result = runner.invoke(app, [*args, mine])
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert lines == [{"pack": "v1", **expected}, {"pack": "v2", **expected}]
+    result = runner.invoke(app, ["compare", str(tmp_path / "*.zip"), mine])
+    assert result.exit_code == 2
+    assert "No packs match" in result.stderr
+
+
+def test_compare_pack_with_glob_characters(tmp_path: Path):
+    """CLI compare reads a pack whose name looks like a glob as one pack."""
+    theirs, mine = _write_compared_packs(tmp_path)
+    bracketed = tmp_path / "Emoji Pack [v1].alfredsnippets"
+    shutil.copy(theirs, bracketed)
+    single = runner.invoke(app, ["compare", "--format", "json", theirs, mine])
+    args = ["compare", "--format", "json", str(bracketed), mine]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert json.loads(result.stdout) == json.loads(single.stdout)
+
+
 def test_generates_macos_plist_with_prefix_dot_suffix_dot(tmp_path: Path):
     """CLI generates plist with prefix '.' suffix '.' shortcuts."""
     with (
@@ -206,3 +346,483 @@ def test_generates_macos_plist_with_prefix_dot_empty_suffix(tmp_path: Path):
             {"phrase": "👍", "shortcut": ".+1"},
             {"phrase": "👍", "shortcut": ".thumbsup"},
         ]
+
+
+def test_generates_deflated_pack_with_compress_level(tmp_path: Path):
+    """CLI generate --compress-level deflates archive members."""
+    with (
+        patch("emojipack.download.fetch_with_cache") as mock_fetch,
+        runner.isolated_filesystem(temp_dir=tmp_path),
+    ):
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON)
+        result = runner.invoke(
+            app, ["generate", "--compress-level", "9", "--workers", "2"]
+        )
+        assert result.exit_code == 0
+        with zipfile.ZipFile("Emoji Pack.alfredsnippets") as zf:
+            assert zf.testzip() is None
+            info = zf.getinfo("smiley-1F603.json")
+            assert info.compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_fetch_downloads_sources(tmp_path: Path, http_server: LocalServer):
+    """CLI fetch saves each source under its file name."""
+    http_server.routes["/joel"] = Route(b"pack")
+    joel = Source(f"{http_server.url}/joel", "joel.alfredsnippets")
+    with patch.dict("emojipack.download.SOURCES", {"joel": joel}):
+        result = runner.invoke(
+            app, ["fetch", "joel", "--output-dir", str(tmp_path / "data")]
+        )
+    assert result.exit_code == 0
+    assert (tmp_path / "data" / "joel.alfredsnippets").read_bytes() == b"pack"
+
+
+def test_fetch_rejects_unknown_sources():
+    """CLI fetch fails on unknown source names."""
+    result = runner.invoke(app, ["fetch", "gemoji", "nope"])
+    assert result.exit_code == 2
+    assert "Unknown sources: nope" in result.output
+
+
+def test_generates_from_source_file(tmp_path: Path):
+    """CLI generate --source reads a gemoji-format file without download."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    with (
+        patch("emojipack.download.fetch_with_cache") as mock_fetch,
+        runner.isolated_filesystem(temp_dir=tmp_path),
+    ):
+        result = runner.invoke(app, ["generate", "--source", str(source)])
+        assert result.exit_code == 0
+        mock_fetch.assert_not_called()
+        assert "with 3 snippets" in result.stdout
+        loaded_pack = SnippetPack.read(Path("Emoji Pack.alfredsnippets"))
+        keywords = [snippet.keyword for snippet in loaded_pack.snippets]
+        assert keywords == ["smiley", "+1", "thumbsup"]
+
+
+@pytest.mark.parametrize(
+    ("option", "memory"),
+    [("--timings", "max RSS MiB"), ("--trace-memory", "peak MiB")],
+)
+def test_generate_timings_report_stages(
+    tmp_path: Path, option: str, memory: str
+):
+    """CLI --timings and --trace-memory report generate stages on stderr."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        args = [option, "generate", "--source", str(source)]
+        result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "with 3 snippets" in result.stdout
+    assert result.stderr.splitlines()[0].endswith(memory)
+    assert not tracemalloc.is_tracing()
+    stages = [line.split()[0] for line in result.stderr.splitlines()]
+    assert stages == ["stage", "write", "snippets", "parse", "total"]
+
+
+def test_generate_timings_report_cache(
+    tmp_path: Path, http_server: LocalServer, monkeypatch: pytest.MonkeyPatch
+):
+    """CLI --timings tells if download and parsing were cached."""
+    http_server.routes["/gemoji.json"] = Route(
+        json.dumps(SAMPLE_GEMOJI_JSON).encode()
+    )
+    url = f"{http_server.url}/gemoji.json"
+    monkeypatch.setattr("emojipack.download.GEMOJI_JSON_URL", url)
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        first = runner.invoke(app, ["--timings", "generate"])
+        second = runner.invoke(app, ["--timings", "generate"])
+    assert "cache miss" in first.stderr
+    assert "snapshot miss" in first.stderr
+    assert "cache hit" in second.stderr
+    assert "snapshot hit" in second.stderr
+
+
+def test_compare_timings_report_stages(tmp_path: Path):
+    """CLI --timings reports compare stages on stderr, not in the YAML."""
+    pack = SnippetPack(snippets=[AlfredSnippet("a", "a", "🎉", "a")])
+    path = tmp_path / "pack.alfredsnippets"
+    pack.write(path)
+    args = ["--timings", "compare", str(path), str(path)]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert yaml.safe_load(result.stdout)["keywords"]["matching"] == 1
+    stages = [line.split()[0] for line in result.stderr.splitlines()]
+    assert stages[1:-1] == [
+        "hash",
+        "read",
+        "read",
+        "compare_emojis",
+        "compare_keywords",
+        "save",
+        "yaml",
+    ]
+    assert "cache miss" in result.stderr
+    cached = runner.invoke(app, args)
+    assert cached.stdout == result.stdout
+    assert "cache hit" in cached.stderr
+    stages = [line.split()[0] for line in cached.stderr.splitlines()]
+    assert stages[1:-1] == ["hash", "load", "yaml"]
+    uncached = runner.invoke(app, [*args, "--no-cache"])
+    stages = [line.split()[0] for line in uncached.stderr.splitlines()]
+    assert stages[1:4] == ["read", "read", "compare_emojis"]
+
+
+def test_profile_saves_cprofile_stats(tmp_path: Path):
+    """CLI --profile saves cProfile statistics of the command."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    profile = tmp_path / "generate.prof"
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        args = ["--profile", str(profile), "generate", "--source", str(source)]
+        result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    stats = pstats.Stats(str(profile))
+    assert any(name == "generate" for _, _, name in stats.stats)  # type: ignore[attr-defined]
+
+
+def test_generates_several_outputs(tmp_path: Path):
+    """CLI generate --output writes several variants in a single pass."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    outputs = [
+        "alfred",
+        "alfred,prefix=.,suffix=,path=dot.alfredsnippets",
+        "macos",
+        "macos,prefix=.,suffix=.,path=dots.plist,format=binary",
+    ]
+    args = ["generate", "--source", str(source)]
+    for output in outputs:
+        args += ["--output", output]
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        result = runner.invoke(app, args)
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == [
+            "Generated 'Emoji Pack.alfredsnippets' with 3 snippets",
+            "Generated dot.alfredsnippets with 3 snippets",
+            "Generated 'Emoji Pack.plist' with 3 snippets",
+            "Generated dots.plist with 3 snippets",
+        ]
+        dot_pack = SnippetPack.read(Path("dot.alfredsnippets"))
+        assert (dot_pack.prefix, dot_pack.suffix) == (".", "")
+        assert (
+            dot_pack.snippets
+            == SnippetPack.read(Path("Emoji Pack.alfredsnippets")).snippets
+        )
+        assert Path("dots.plist").read_bytes().startswith(b"bplist00")
+        with Path("dots.plist").open("rb") as f:
+            shortcuts = [item["shortcut"] for item in plistlib.load(f)]
+        assert shortcuts == [".smiley.", ".+1.", ".thumbsup."]
+        with Path("Emoji Pack.plist").open("rb") as f:
+            shortcuts = [item["shortcut"] for item in plistlib.load(f)]
+        assert shortcuts == [":smiley:", ":+1:", ":thumbsup:"]
+
+
+def test_generates_exporter_outputs(tmp_path: Path):
+    """CLI generate writes espanso, Raycast and TextExpander files."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    args = ["generate", "--source", str(source)]
+    for kind in ["espanso", "raycast", "textexpander,prefix=;,suffix="]:
+        args += ["--output", kind]
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        result = runner.invoke(app, args)
+        assert result.exit_code == 0
+        espanso = yaml.safe_load(Path("Emoji Pack.yml").read_text())
+        triggers = [match["trigger"] for match in espanso["matches"]]
+        assert triggers == [":smiley:", ":+1:", ":thumbsup:"]
+        raycast = json.loads(Path("Emoji Pack.json").read_text())
+        assert [item["text"] for item in raycast] == ["😃", "👍", "👍"]
+        rows = Path("Emoji Pack.csv").read_text().splitlines()
+        assert [row.split(",")[0] for row in rows] == [
+            ";smiley",
+            ";+1",
+            ";thumbsup",
+        ]
+
+
+def test_generate_incremental_reuses_pack(tmp_path: Path):
+    """CLI generate --incremental rebuilds the same pack from the old one."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    args = ["generate", "--source", str(source), "--compress-level", "9"]
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        assert runner.invoke(app, args).exit_code == 0
+        first = Path("Emoji Pack.alfredsnippets").read_bytes()
+        result = runner.invoke(app, [*args, "--incremental"])
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == [
+            "Reused 3 unchanged snippets from 'Emoji Pack.alfredsnippets'",
+            "Generated 'Emoji Pack.alfredsnippets' with 3 snippets",
+        ]
+        assert Path("Emoji Pack.alfredsnippets").read_bytes() == first
+
+
+def test_watch_regenerates_on_change(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    http_server: LocalServer,
+):
+    """CLI watch generates once, then only when gemoji data changes."""
+    body = json.dumps(SAMPLE_GEMOJI_JSON).encode()
+    changed = Route(body.replace(b"thumbs up", b"thumbs-up"), etag='"2"')
+    http_server.routes["/emoji.json"] = Route(body, etag='"1"')
+    monkeypatch.setattr(
+        "emojipack.download.GEMOJI_JSON_URL", f"{http_server.url}/emoji.json"
+    )
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            http_server.routes["/emoji.json"] = changed
+
+    monkeypatch.setattr("time.sleep", sleep)
+    args = ["watch", "--interval", "60", "--checks", "3"]
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        "Generated 'Emoji Pack.alfredsnippets' with 3 snippets",
+        "Gemoji data unchanged",
+        "Reused 1 unchanged snippets from 'Emoji Pack.alfredsnippets'",
+        "Generated 'Emoji Pack.alfredsnippets' with 3 snippets",
+    ]
+    assert sleeps == [60, 60]
+    assert http_server.not_modified == 1
+
+
+def test_generate_delta_from_previous_pack(tmp_path: Path):
+    """CLI generate --delta-from writes changed snippets and removed uids."""
+    previous_snippets = [
+        AlfredSnippet("smiley", "😃 Old name", "😃", uid="smiley-1F603"),
+        AlfredSnippet("+1", "👍 Thumbs up - approve, ok", "👍", "+1-1F44D"),
+        AlfredSnippet("gone", "👻 Ghost", "👻", uid="gone-1F47B"),
+    ]
+    previous = tmp_path / "previous.alfredsnippets"
+    SnippetPack(snippets=previous_snippets).write(previous)
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    args = ["generate", "--source", str(source), "--delta-from", str(previous)]
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        result = runner.invoke(app, args)
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == [
+            f"Delta from {previous}: 1 added, 1 changed, 1 removed, "
+            "listed in 'Emoji Pack.removed.json'",
+            "Generated 'Emoji Pack.alfredsnippets' with 2 snippets",
+        ]
+        delta_pack = SnippetPack.read(Path("Emoji Pack.alfredsnippets"))
+        uids = [snippet.uid for snippet in delta_pack.snippets]
+        assert uids == ["smiley-1F603", "thumbsup-1F44D"]
+        manifest = json.loads(Path("Emoji Pack.removed.json").read_text())
+        assert manifest == {
+            "previous": "previous.alfredsnippets",
+            "added": ["thumbsup-1F44D"],
+            "changed": ["smiley-1F603"],
+            "removed": ["gone-1F47B"],
+        }
+
+
+def test_generate_delta_from_previous_plist(tmp_path: Path):
+    """CLI generate --delta-from compares a plist by shortcut and emoji."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    previous = tmp_path / "previous.plist"
+    with previous.open("wb") as f:
+        plistlib.dump(
+            [
+                {"phrase": "😃", "shortcut": ":smiley:"},
+                {"phrase": "👎", "shortcut": ":+1:"},
+            ],
+            f,
+        )
+    args = ["generate", "--source", str(source), "--output", "macos"]
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        result = runner.invoke(app, [*args, "--delta-from", str(previous)])
+        assert result.exit_code == 0
+        with Path("Emoji Pack.plist").open("rb") as f:
+            shortcuts = [item["shortcut"] for item in plistlib.load(f)]
+        assert shortcuts == [":+1:", ":thumbsup:"]
+        manifest = json.loads(Path("Emoji Pack.removed.json").read_text())
+        assert manifest["removed"] == ["+1-1F44E"]
+
+
+def test_generate_rejects_invalid_outputs():
+    """CLI generate fails on invalid or conflicting output specs."""
+    invalid = [
+        ["--output", "windows"],
+        ["--output", "macos,color=red"],
+        ["--output", "macos,format=json"],
+        ["--output", "alfred,format=binary"],
+        ["--output", "alfred", "--output", "alfred,prefix=."],
+        ["--output", "alfred", "--macos"],
+    ]
+    for args in invalid:
+        result = runner.invoke(app, ["generate", *args])
+        assert result.exit_code == 2, args
+
+
+def test_compare_many_outputs_presence(tmp_path: Path):
+    """CLI compare-many reports shared and missing items for all packs."""
+    packs = {
+        "joel": [
+            AlfredSnippet(":heart:", "❤ Red heart", "❤", uid="h"),
+            AlfredSnippet(":tada:", "🎉 Party popper", "🎉", uid="t"),
+        ],
+        "mine": [AlfredSnippet("heart", "❤️ Red heart", "❤️", uid="h")],
+        "other": [AlfredSnippet("smile", "😄 Smile", "😄", uid="s")],
+    }
+    paths = []
+    for name, snippets in packs.items():
+        path = tmp_path / f"{name}.alfredsnippets"
+        SnippetPack(snippets=snippets).write(path)
+        paths.append(str(path))
+    result = runner.invoke(app, ["compare-many", *paths])
+    assert result.exit_code == 0
+    output = yaml.safe_load(result.stdout)
+    assert output["packs"] == ["joel", "mine", "other"]
+    assert output["keywords"]["shared"]["joel"] == {
+        "joel": 2,
+        "mine": 1,
+        "other": 0,
+    }
+    assert output["keywords"]["missing"]["mine"] == {"joel": 1, "other": 1}
+
+    result = runner.invoke(app, ["compare-many", "--verbose", *paths])
+    assert result.exit_code == 0
+    output = yaml.safe_load(result.stdout)
+    assert output["keywords"]["missing"]["mine"] == {
+        "joel": ["tada"],
+        "other": ["smile"],
+    }
+    assert output["emojis"]["partial"] == {
+        "❤️": ["joel", "mine"],
+        "🎉️": ["joel"],
+        "😄️": ["other"],
+    }
+
+
+def test_search_trie_generated_next_to_pack(tmp_path: Path):
+    """CLI search completes keywords from the trie written by generate."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        args = ["generate", "--source", str(source)]
+        result = runner.invoke(
+            app, [*args, "--output", "alfred", "--output", "trie"]
+        )
+        assert result.exit_code == 0
+        assert Path("Emoji Pack.trie").exists()
+        result = runner.invoke(app, ["search", "+"])
+        assert result.stdout == "👍 +1\n"
+        result = runner.invoke(
+            app, ["search", "s", "--index", "Emoji Pack.alfredsnippets"]
+        )
+        assert result.stdout == "😃 smiley\n"
+
+
+def test_search_rejects_invalid_index(tmp_path: Path):
+    """CLI search fails on a missing index file."""
+    result = runner.invoke(
+        app, ["search", "s", "--index", str(tmp_path / "missing.trie")]
+    )
+    assert result.exit_code == 2
+
+
+def test_search_rejects_negative_limit():
+    """CLI search fails on a negative limit."""
+    result = runner.invoke(app, ["search", "s", "--limit", "-1"])
+    assert result.exit_code == 2
+    assert "Negative limit: -1" in result.stderr
+
+
+def test_find_fuzzy(tmp_path: Path):
+    """CLI find lists emojis matching a query with typos."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    result = runner.invoke(
+        app, ["find", "thumbs upp", "--source", str(source)]
+    )
+    assert result.exit_code == 0
+    assert result.stdout == "👍 thumbs up (+1, thumbsup)\n"
+
+
+def test_serve_indexes_source(tmp_path: Path):
+    """CLI serve indexes snippets once, then serves them."""
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    socket = tmp_path / "emojipack.sock"
+    served = []
+
+    async def serve_forever(
+        index: SnippetIndex, host: str, port: int, path: Path | None
+    ) -> None:
+        served.append((index.aliases("👍"), host, port, path))
+
+    with patch("emojipack.cli._serve_forever", serve_forever):
+        args = ["serve", "--source", str(source), "--socket", str(socket)]
+        assert runner.invoke(app, args).exit_code == 0
+    assert served == [(["+1", "thumbsup"], "127.0.0.1", 8765, socket)]
+
+
+def test_serve_rejects_pack_with_source(tmp_path: Path):
+    """CLI serve loads either a pack or a source file, not both."""
+    args = ["serve", "--pack", "a.alfredsnippets", "--source", "b.json"]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 2
+    assert "--pack cannot be combined with --source" in result.stderr
+
+
+def _import_times(*args: str) -> dict[str, float]:
+    """Run python -X importtime, return cumulative seconds by module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_cli_imports_lazily():
+    """Importing the CLI skips heavy modules and stays within budget.
+
+    The budget is relative to typer, which is as slow to import as the rest of
+    the CLI, so that it holds on slow or busy machines.
+    """
+    times = _import_times("-c", "import emojipack.cli")
+    assert not HEAVY_MODULES & times.keys()
+    assert times["emojipack.cli"] < IMPORT_TIME_FACTOR * times["typer"]
+
+
+def test_commands_import_what_they_use(tmp_path: Path):
+    """Compare does not import HTTP modules, generate does not import yaml."""
+    pack = tmp_path / "pack.alfredsnippets"
+    SnippetPack(snippets=[AlfredSnippet("smile", "😄", "😄", "s")]).write(pack)
+    source = tmp_path / "custom.json"
+    source.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    run = "from emojipack.cli import app; app({!r}, standalone_mode=False)"
+    # The commands run in subprocesses, out of reach of the cache_dir fixture
+    compare_args = ["compare", "--no-cache", str(pack), str(pack)]
+    times = _import_times("-c", run.format(compare_args))
+    assert "yaml" in times
+    assert "requests" not in times
+    generate_args = [
+        "generate",
+        "--source",
+        str(source),
+        "--output",
+        f"alfred,path={tmp_path / 'out.alfredsnippets'}",
+    ]
+    times = _import_times("-c", run.format(generate_args))
+    assert "emojipack.pack" in times
+    assert "yaml" not in times
+    assert "requests" not in times
@@ -1,12 +1,32 @@
 """Tests for emoji pack comparison."""
 
+import pickle
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
 from emojipack.comparison import (
+    DuplicateKeywordError,
     EmojiComparison,
     EmojiMatch,
+    EmojiRecord,
     KeywordComparison,
     KeywordMatch,
+    KeywordRecord,
+    PackDelta,
+    PresenceIndex,
+    ReferenceIndex,
+    SnippetPackComparison,
     compare_emojis,
+    compare_files,
     compare_keywords,
+    compare_pack_files,
+    compare_packs,
+    delta_packs,
+    index_packs,
+    iter_emoji_comparison,
+    iter_keyword_comparison,
     normalize_emoji,
 )
 from emojipack.pack import SnippetPack
@@ -209,6 +229,238 @@ def test_compare_packs_all_categories():
     assert result == expected
 
 
+def test_compare_pack_files_caches_results(tmp_path: Path, cache_dir: Path):
+    """Comparisons of unchanged files are loaded from the cache."""
+    theirs = SnippetPack(
+        snippets=[
+            AlfredSnippet("star", "\u2b50 Star", "\u2b50", uid="1"),
+            AlfredSnippet("unicorn", "🦄 Unicorn", "🦄 ", uid="2"),
+            AlfredSnippet("old", "👴 Old", "👴", uid="3"),
+            AlfredSnippet("smile", "😄 Smile", "😄", uid="4"),
+        ]
+    )
+    mine = SnippetPack(
+        snippets=[
+            AlfredSnippet("star", "\u2b50\ufe0f Star", "\u2b50\ufe0f", "5"),
+            AlfredSnippet("unicorn", "🦄 Unicorn", "🦄", uid="6"),
+            AlfredSnippet("smile", "😀 Grin", "😀", uid="7"),
+            AlfredSnippet("new", "🎉 New", "🎉", uid="8"),
+        ]
+    )
+    theirs_path = tmp_path / "theirs.alfredsnippets"
+    mine_path = tmp_path / "mine.alfredsnippets"
+    theirs.write(theirs_path)
+    mine.write(mine_path)
+    expected = compare_packs(theirs, mine)
+    assert compare_pack_files(theirs_path, mine_path) == expected
+    assert len(list((cache_dir / "comparisons").iterdir())) == 1
+    with patch("emojipack.comparison.compare_packs") as mock_compare:
+        assert compare_pack_files(theirs_path, mine_path) == expected
+        mock_compare.assert_not_called()
+    SnippetPack(snippets=mine.snippets[:2]).write(mine_path)
+    changed = compare_pack_files(theirs_path, mine_path)
+    assert list(changed.keywords.removed) == ["old", "smile"]
+    assert len(list((cache_dir / "comparisons").iterdir())) == 2
+
+
+def test_compare_pack_files_without_usable_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    """Packs are compared uncached when the cache directory is unusable."""
+    not_a_directory = tmp_path / "file"
+    not_a_directory.touch()
+    monkeypatch.setattr("emojipack.download.CACHE_DIR", not_a_directory / "x")
+    theirs = SnippetPack(snippets=[AlfredSnippet("a", "🎉 A", "🎉", uid="1")])
+    mine = SnippetPack(snippets=[AlfredSnippet("b", "🎉 B", "🎉", uid="2")])
+    theirs_path = tmp_path / "theirs.alfredsnippets"
+    mine_path = tmp_path / "mine.alfredsnippets"
+    theirs.write(theirs_path)
+    mine.write(mine_path)
+    expected = compare_packs(theirs, mine)
+    for _ in range(2):
+        assert compare_pack_files(theirs_path, mine_path) == expected
+
+
+def test_iter_comparison_records():
+    """Comparison records are yielded for theirs first, then added ones."""
+    theirs_snippets = [
+        AlfredSnippet("star", "\u2b50 Star", "\u2b50", uid="1"),
+        AlfredSnippet("old", "👴 Old", "👴", uid="2"),
+        AlfredSnippet("smile", "😄 Smile", "😄", uid="3"),
+    ]
+    mine_snippets = [
+        AlfredSnippet("new", "🎉 New", "🎉", uid="4"),
+        AlfredSnippet("smile", "😄 Smile", "😄", uid="5"),
+        AlfredSnippet("star", "\u2b50\ufe0f Star", "\u2b50\ufe0f", uid="6"),
+    ]
+    theirs = SnippetPack(snippets=theirs_snippets)
+    mine = SnippetPack(snippets=mine_snippets)
+
+    assert list(iter_emoji_comparison(theirs, mine)) == [
+        EmojiRecord(
+            "added_emoji_presentation",
+            "\u2b50\ufe0f",
+            [theirs_snippets[0]],
+            [mine_snippets[2]],
+        ),
+        EmojiRecord("removed", "👴", [theirs_snippets[1]], []),
+        EmojiRecord("found", "😄", [theirs_snippets[2]], [mine_snippets[1]]),
+        EmojiRecord("added", "🎉", [], [mine_snippets[0]]),
+    ]
+    assert list(iter_keyword_comparison(theirs, mine)) == [
+        KeywordRecord(
+            "matching", "star", theirs_snippets[0], mine_snippets[2]
+        ),
+        KeywordRecord("removed", "old", theirs_snippets[1], None),
+        KeywordRecord(
+            "matching", "smile", theirs_snippets[2], mine_snippets[1]
+        ),
+        KeywordRecord("added", "new", None, mine_snippets[0]),
+    ]
+
+
+def test_records_agree_with_comparisons():
+    """Records and comparison dicts hold the same items for every status."""
+    theirs = SnippetPack(
+        snippets=[
+            AlfredSnippet(
+                ":heart:", "\u2764\ufe0f Heart", "\u2764\ufe0f", "1"
+            ),
+            AlfredSnippet(":star:", "\u2b50 Star", "\u2b50", uid="2"),
+            AlfredSnippet(":unicorn:", "🦄 Unicorn", "🦄 ", uid="3"),
+            AlfredSnippet(":old:", "👴 Old", "👴", uid="4"),
+            AlfredSnippet(":smile:", "😄 Smile", "😄", uid="5"),
+        ]
+    )
+    mine = SnippetPack(
+        snippets=[
+            AlfredSnippet("heart", "\u2764\ufe0f Heart", "\u2764\ufe0f", "6"),
+            AlfredSnippet("star", "\u2b50\ufe0f Star", "\u2b50\ufe0f", "7"),
+            AlfredSnippet("unicorn", "🦄 Unicorn", "🦄", uid="8"),
+            AlfredSnippet("smile", "😀 Grin", "😀", uid="9"),
+            AlfredSnippet("new", "🎉 New", "🎉", uid="10"),
+        ]
+    )
+    emojis = compare_emojis(theirs, mine)
+    emoji_records = list(iter_emoji_comparison(theirs, mine))
+    assert {record.status for record in emoji_records} == {
+        "found",
+        "added_emoji_presentation",
+        "removed_space",
+        "added",
+        "removed",
+    }
+    for record in emoji_records:
+        item = getattr(emojis, record.status)[record.emoji]
+        if record.status == "removed":
+            assert item == record.theirs
+        elif record.status == "added":
+            assert item == record.mine
+        else:
+            assert item == EmojiMatch(record.theirs, record.mine)
+    assert sum(len(getattr(emojis, status)) for status in vars(emojis)) == len(
+        emoji_records
+    )
+    keywords = compare_keywords(theirs, mine)
+    keyword_records = list(iter_keyword_comparison(theirs, mine))
+    assert {keyword_record.status for keyword_record in keyword_records} == {
+        "removed",
+        "added",
+        "matching",
+        "modified",
+    }
+    for keyword_record in keyword_records:
+        item = getattr(keywords, keyword_record.status)[keyword_record.keyword]
+        if keyword_record.status == "removed":
+            assert item == keyword_record.theirs
+        elif keyword_record.status == "modified":
+            assert (item.theirs, item.mine) == (
+                keyword_record.theirs,
+                keyword_record.mine,
+            )
+        else:
+            assert item == keyword_record.mine
+    assert sum(
+        len(getattr(keywords, status)) for status in vars(keywords)
+    ) == len(keyword_records)
+
+
+def test_compare_snippets_read_once(tmp_path: Path):
+    """Packs can be compared from snippets streamed out of their files."""
+    theirs = SnippetPack(
+        snippets=[
+            AlfredSnippet(":star:", "\u2b50 Star", "\u2b50", uid="1"),
+            AlfredSnippet(":old:", "👴 Old", "👴", uid="2"),
+        ]
+    )
+    mine = SnippetPack(
+        snippets=[
+            AlfredSnippet("star", "\u2b50\ufe0f Star", "\u2b50\ufe0f", "3"),
+            AlfredSnippet("new", "🎉 New", "🎉", uid="4"),
+        ]
+    )
+    theirs_path = tmp_path / "theirs.alfredsnippets"
+    mine_path = tmp_path / "mine.alfredsnippets"
+    theirs.write(theirs_path)
+    mine.write(mine_path)
+    theirs = SnippetPack.read(theirs_path)
+    mine = SnippetPack.read(mine_path)
+    emojis = compare_emojis(
+        SnippetPack.iter_snippets(theirs_path),
+        SnippetPack.iter_snippets(mine_path),
+    )
+    assert emojis == compare_emojis(theirs, mine)
+    keywords = compare_keywords(
+        SnippetPack.iter_snippets(theirs_path),
+        SnippetPack.iter_snippets(mine_path),
+    )
+    assert keywords == compare_keywords(theirs, mine)
+    assert list(keywords.removed) == ["old"]
+
+
+def _removed_keywords(comparison: SnippetPackComparison) -> list[str]:
+    return list(comparison.keywords.removed)
+
+
+def test_compare_files_with_reference(tmp_path: Path):
+    """Packs are compared with a reference indexed once, in pack order."""
+    mine = SnippetPack(
+        snippets=[
+            AlfredSnippet("smile", "😄 Smile", "😄", uid="1"),
+            AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="2"),
+        ]
+    )
+    reference = ReferenceIndex.from_pack(mine)
+    paths = []
+    for i, keyword in enumerate(("old", "older", "oldest")):
+        theirs = SnippetPack(
+            snippets=[
+                AlfredSnippet(":smile:", "😄 Smile", "😄", uid="1"),
+                AlfredSnippet(f":{keyword}:", "👴 Old", "👴", uid="3"),
+            ]
+        )
+        paths.append(tmp_path / f"{i}.alfredsnippets")
+        theirs.write(paths[-1])
+        assert reference.compare(theirs) == compare_packs(theirs, mine)
+    streamed = ReferenceIndex.from_pack(iter(mine.snippets))
+    assert streamed == reference
+    assert streamed.compare(iter(theirs.snippets)) == compare_packs(
+        theirs, mine
+    )
+    expected = [["old"], ["older"], ["oldest"]]
+    for workers in (1, 2):
+        summaries = compare_files(paths, reference, _removed_keywords, workers)
+        assert list(summaries) == expected
+
+
+def test_duplicate_keyword_error_pickles():
+    """DuplicateKeywordError can be raised from comparison workers."""
+    pack = SnippetPack(snippets=[])
+    pickled = pickle.dumps(DuplicateKeywordError("ok", pack))
+    error = pickle.loads(pickled)  # noqa: S301
+    assert (str(error), error.keyword) == ("Duplicate keyword: ok", "ok")
+
+
 def test_normalize_emoji_trailing_space():
     """Normalize emoji removes trailing space, noop when none."""
     assert normalize_emoji("❤️ ") == "❤️"
@@ -227,6 +479,29 @@ def test_normalize_emoji_keycap_special_case():
     assert normalize_emoji("1\ufe0f\u20e3") == "1\ufe0f\u20e3"
 
 
+def test_compare_keywords_normalizes_each_emoji_once():
+    """Compare keywords only normalizes differing emojis, and caches them."""
+    theirs = SnippetPack(
+        snippets=[
+            AlfredSnippet("heart", "❤ Red heart", "❤", uid="heart-2764"),
+            AlfredSnippet("love", "❤ Red heart", "❤", uid="love-2764"),
+            AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="tada-1F389"),
+        ]
+    )
+    mine = SnippetPack(
+        snippets=[
+            AlfredSnippet("heart", "❤️ Red heart", "❤️", "heart-2764-FE0F"),
+            AlfredSnippet("love", "❤️ Red heart", "❤️", uid="love-2764-FE0F"),
+            AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="tada-1F389"),
+        ]
+    )
+    normalize_emoji.cache_clear()
+    result = compare_keywords(theirs, mine)
+    assert list(result.matching) == ["heart", "love", "tada"]
+    cache = normalize_emoji.cache_info()
+    assert (cache.misses, cache.hits) == (2, 2)
+
+
 def test_compare_keywords_matching():
     """Keywords with same normalized emoji are classified as matching."""
     theirs_snippets = [
@@ -321,3 +596,75 @@ def test_compare_keywords_matching_after_normalization():
         modified={},
     )
     assert result == expected
+
+
+def test_index_packs_presence():
+    """index_packs indexes normalized emojis and keywords by pack."""
+    packs = {
+        "joel": SnippetPack(
+            snippets=[
+                AlfredSnippet(":heart:", "❤ Red heart", "❤", "h"),
+                AlfredSnippet(":tada:", "🎉 Party popper", "🎉", "t"),
+                AlfredSnippet("comment", "# Comment", "💬", "c"),
+            ]
+        ),
+        "mine": SnippetPack(
+            snippets=[
+                AlfredSnippet("heart", "❤️ Red heart", "❤️", "h"),
+                AlfredSnippet("smile", "😄 Smile", "😄", "s"),
+            ]
+        ),
+        "other": SnippetPack(
+            snippets=[AlfredSnippet("heart", "❤️ Red heart", "❤️", "h")]
+        ),
+    }
+    index = index_packs(packs)
+    assert index.names == ["joel", "mine", "other"]
+    assert index.emojis.packs_of("❤️") == [0, 1, 2]
+    assert index.emojis.packs_of("💬️") == []
+    assert index.keywords.packs_of("tada") == [0]
+    assert index.keywords.shared() == [[2, 1, 1], [1, 2, 1], [1, 1, 1]]
+    assert index.keywords.missing(0, 1) == ["tada"]
+    assert index.keywords.missing(2, 0) == []
+    assert index.emojis.partial() == {"🎉️": [0], "😄️": [1]}
+
+
+def test_presence_index_groups_items_by_packs():
+    """PresenceIndex.shared counts items present in the same packs once."""
+    index = PresenceIndex(2)
+    for i in range(100):
+        index.add(str(i), 0)
+        if i % 4 == 0:
+            index.add(str(i), 1)
+    assert index.shared() == [[100, 25], [25, 25]]
+
+
+def test_delta_packs():
+    """Delta lists new and changed snippets, and the uids to remove."""
+    previous_snippets = [
+        AlfredSnippet("heart", "❤ Red heart", "❤", uid="heart-2764"),
+        AlfredSnippet("smile", "😄 Smile", "😄", uid="smile-1F604"),
+        AlfredSnippet("tada", "🎉 Party", "🎉", uid="tada-1F389"),
+        AlfredSnippet("old", "👴 Old man", "👴", uid="old-1F474"),
+    ]
+    current_snippets = [
+        AlfredSnippet("heart", "❤️ Red heart", "❤️", uid="heart-2764-FE0F"),
+        AlfredSnippet("smile", "😄 Smile", "😄", uid="smile-1F604"),
+        AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="tada-1F389"),
+        AlfredSnippet("new", "🆕 New button", "🆕", uid="new-1F195"),
+    ]
+    previous = SnippetPack(snippets=previous_snippets)
+    current = SnippetPack(snippets=current_snippets)
+
+    delta = delta_packs(previous, current)
+
+    assert delta == PackDelta(
+        added=[current_snippets[3]],
+        changed=[current_snippets[0], current_snippets[2]],
+        removed=[previous_snippets[3], previous_snippets[0]],
+    )
+    assert [snippet.uid for snippet in delta.snippets] == [
+        "heart-2764-FE0F",
+        "new-1F195",
+        "tada-1F389",
+    ]
@@ -1,9 +1,31 @@
 """Download tests for emojipack."""
 
+import asyncio
 import json
+from collections.abc import Iterator
+from pathlib import Path
 from unittest.mock import patch
 
-from emojipack.download import GEMOJI_JSON_URL, GemojiEntry, fetch_gemoji_data
+import pytest
+from requests.adapters import HTTPAdapter
+
+from emojipack.download import (
+    GEMOJI_JSON_URL,
+    GemojiEntry,
+    SessionSettings,
+    Source,
+    close_session,
+    configure_session,
+    fetch_gemoji_data,
+    fetch_gemoji_key,
+    fetch_sources,
+    fetch_with_cache,
+    get_session,
+    iter_json_array,
+    read_gemoji_file,
+)
+
+from .http_server import LocalServer, Route
 
 SAMPLE_GEMOJI_JSON = [
     {
@@ -50,3 +72,155 @@ def test_fetch_gemoji_data():
         result = fetch_gemoji_data()
         mock_fetch.assert_called_once_with(GEMOJI_JSON_URL)
         assert result == EXPECTED_GEMOJI_ENTRIES
+
+
+def test_fetch_gemoji_data_loads_snapshot(cache_dir: Path):
+    """fetch_gemoji_data loads parsed entries from snapshot if unchanged."""
+    with patch("emojipack.download.fetch_with_cache") as mock_fetch:
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON)
+        fetch_gemoji_data()
+        assert (cache_dir / "gemoji.snapshot").exists()
+        with patch("emojipack.download.json.loads") as mock_loads:
+            result = fetch_gemoji_data()
+            mock_loads.assert_not_called()
+        assert result == EXPECTED_GEMOJI_ENTRIES
+
+
+def test_fetch_gemoji_data_parses_changed_content(cache_dir: Path):
+    """fetch_gemoji_data parses again when the JSON text changes."""
+    with patch("emojipack.download.fetch_with_cache") as mock_fetch:
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON)
+        fetch_gemoji_data()
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON[:1])
+        result = fetch_gemoji_data()
+        assert result == EXPECTED_GEMOJI_ENTRIES[:1]
+
+
+def test_fetch_gemoji_data_ignores_corrupt_snapshot(cache_dir: Path):
+    """fetch_gemoji_data parses the JSON text if the snapshot is corrupt."""
+    cache_dir.mkdir()
+    (cache_dir / "gemoji.snapshot").write_bytes(b"garbage")
+    with patch("emojipack.download.fetch_with_cache") as mock_fetch:
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON)
+        assert fetch_gemoji_data() == EXPECTED_GEMOJI_ENTRIES
+
+
+def test_get_session_is_shared(cache_dir: Path):
+    """get_session returns the same session until it is closed."""
+    session = get_session()
+    assert get_session() is session
+    assert (cache_dir / "http_cache.sqlite").exists()
+    close_session()
+    assert get_session() is not session
+
+
+def test_configure_session_applies_settings():
+    """configure_session sets pool size, retries and cache expiry."""
+    configure_session(SessionSettings(pool_size=4, retries=1, expire_after=60))
+    session = get_session()
+    adapter = session.get_adapter("https://example.com")
+    assert isinstance(adapter, HTTPAdapter)
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 4
+    assert adapter.max_retries.total == 1
+    assert session.settings.expire_after == 60
+
+
+def test_fetch_with_cache_uses_shared_session():
+    """fetch_with_cache sends requests through the shared session."""
+    with patch.object(get_session(), "get") as mock_get:
+        mock_get.return_value.text = "content"
+        assert fetch_with_cache("https://example.com/a") == "content"
+        assert fetch_with_cache("https://example.com/b") == "content"
+        assert mock_get.call_count == 2
+
+
+def test_fetch_gemoji_key_revalidates(
+    monkeypatch: pytest.MonkeyPatch, http_server: LocalServer
+):
+    """fetch_gemoji_key sends conditional requests, keyed on the content."""
+    route = Route(b"[]", etag='"1"')
+    http_server.routes["/emoji.json"] = route
+    monkeypatch.setattr(
+        "emojipack.download.GEMOJI_JSON_URL", f"{http_server.url}/emoji.json"
+    )
+    key = fetch_gemoji_key()
+    assert fetch_gemoji_key() == key
+    assert http_server.not_modified == 1
+    http_server.routes["/emoji.json"] = Route(b"[ ]", etag='"2"')
+    assert fetch_gemoji_key() != key
+    assert http_server.requests == ["/emoji.json"] * 3
+
+
+def _local_sources(server: LocalServer, **routes: Route) -> dict[str, Source]:
+    server.routes.update({f"/{name}": route for name, route in routes.items()})
+    return {name: Source(f"{server.url}/{name}", name) for name in routes}
+
+
+def test_fetch_sources_concurrently(http_server: LocalServer):
+    """fetch_sources downloads sources with bounded concurrency."""
+    sources = _local_sources(
+        http_server,
+        **{name: Route(name.encode(), delay=0.1) for name in "abcd"},
+    )
+    result = asyncio.run(fetch_sources(sources, concurrency=2))
+    assert result == {"a": b"a", "b": b"b", "c": b"c", "d": b"d"}
+    assert http_server.max_in_flight == 2
+
+
+def test_fetch_sources_uses_http_cache(http_server: LocalServer):
+    """fetch_sources serves repeated downloads from the HTTP cache."""
+    sources = _local_sources(http_server, data=Route(b"content"))
+    asyncio.run(fetch_sources(sources))
+    result = asyncio.run(fetch_sources(sources))
+    assert result == {"data": b"content"}
+    assert http_server.requests == ["/data"]
+
+
+def test_fetch_sources_timeout(http_server: LocalServer):
+    """fetch_sources raises TimeoutError when a source is too slow."""
+    configure_session(SessionSettings(retries=0))
+    sources = _local_sources(http_server, slow=Route(b"", delay=0.5))
+    sources["slow"] = Source(sources["slow"].url, "slow", timeout=0.1)
+    with pytest.raises(TimeoutError):
+        asyncio.run(fetch_sources(sources))
+
+
+def test_iter_json_array_small_chunks():
+    """iter_json_array parses items split across chunks like json.loads."""
+    items = [12345, -1.5e10, 'a, [b] "c"', {"k": [1, {"n": None}]}, True]
+    text = f" \n{json.dumps(items, indent=1)}\n"
+    chunks = list(text)
+    assert list(iter_json_array(chunks)) == items
+    assert list(iter_json_array(["[", " ]"])) == []
+
+
+def test_iter_json_array_is_lazy():
+    """iter_json_array yields items before all chunks are read."""
+    consumed = []
+
+    def chunks() -> Iterator[str]:
+        for chunk in ['[{"a": 1},', ' {"b"', ": 2}]"]:
+            consumed.append(chunk)
+            yield chunk
+
+    items = iter_json_array(chunks())
+    assert next(items) == {"a": 1}
+    assert len(consumed) == 1
+    assert list(items) == [{"b": 2}]
+
+
+def test_iter_json_array_invalid():
+    """iter_json_array raises ValueError on malformed input."""
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        list(iter_json_array(['{"a": 1}']))
+    with pytest.raises(ValueError, match="Expected ','"):
+        list(iter_json_array(["[1 2]"]))
+    with pytest.raises(ValueError, match="Expecting value"):
+        list(iter_json_array(["[1, "]))
+
+
+def test_read_gemoji_file(tmp_path: Path):
+    """read_gemoji_file streams entries from a gemoji-format file."""
+    path = tmp_path / "emoji.json"
+    path.write_text(json.dumps(SAMPLE_GEMOJI_JSON), encoding="utf-8")
+    assert list(read_gemoji_file(path)) == EXPECTED_GEMOJI_ENTRIES
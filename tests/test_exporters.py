@@ -0,0 +1,133 @@
+"""Streaming exporter tests for emojipack."""
+
+import csv
+import json
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+import yaml
+
+from emojipack.exporters import (
+    EXPORT_FORMATS,
+    EspansoWriter,
+    MacosPlistWriter,
+    RaycastWriter,
+    StreamingExporter,
+    TextExpanderWriter,
+    register_format,
+)
+from emojipack.snippets import AlfredSnippet
+
+SNIPPETS = [
+    AlfredSnippet("thumbs up", "👍 Thumbs up", "👍", uid="thumbs_up-1F44D"),
+    AlfredSnippet("quote", 'Say "hi", then\nleave', '"a, b"', uid="quote-22"),
+]
+
+
+def test_espanso_writer(tmp_path: Path):
+    """EspansoWriter writes YAML matches with escaped strings."""
+    path = tmp_path / "emoji.yml"
+    with EspansoWriter(path, ".", "") as writer:
+        writer.extend(SNIPPETS)
+
+    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    assert data == {
+        "matches": [
+            {
+                "trigger": ".thumbs-up",
+                "replace": "👍",
+                "label": "👍 Thumbs up",
+            },
+            {
+                "trigger": ".quote",
+                "replace": '"a, b"',
+                "label": 'Say "hi", then\nleave',
+            },
+        ]
+    }
+
+
+def test_raycast_writer(tmp_path: Path):
+    """RaycastWriter writes a JSON array of snippets."""
+    path = tmp_path / "emoji.json"
+    with RaycastWriter(path) as writer:
+        writer.extend(SNIPPETS)
+
+    assert json.loads(path.read_text(encoding="utf-8")) == [
+        {"name": "👍 Thumbs up", "text": "👍", "keyword": ":thumbs-up:"},
+        {
+            "name": 'Say "hi", then\nleave',
+            "text": '"a, b"',
+            "keyword": ":quote:",
+        },
+    ]
+
+
+def test_textexpander_writer(tmp_path: Path):
+    """TextExpanderWriter writes CSV rows that csv reads back."""
+    path = tmp_path / "emoji.csv"
+    with TextExpanderWriter(path) as writer:
+        writer.extend(SNIPPETS)
+
+    with path.open(encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [
+        [":thumbs-up:", "👍", "👍 Thumbs up"],
+        [":quote:", '"a, b"', 'Say "hi", then\nleave'],
+    ]
+
+
+@pytest.mark.parametrize(
+    ("exporter", "load", "expected"),
+    [
+        (EspansoWriter, yaml.safe_load, {"matches": []}),
+        (RaycastWriter, json.loads, []),
+        (TextExpanderWriter, str.splitlines, []),
+    ],
+)
+def test_exporters_without_snippets(
+    tmp_path: Path,
+    exporter: type[StreamingExporter],
+    load: Callable[[str], object],
+    expected: object,
+):
+    """Exporters write valid empty files when no snippet is added."""
+    path = tmp_path / "empty"
+    with exporter(path):
+        pass
+    assert load(path.read_text(encoding="utf-8")) == expected
+
+
+def test_macos_plist_writer_rejects_control_characters(tmp_path: Path):
+    """MacosPlistWriter refuses control characters and removes its file."""
+    output_file = tmp_path / "expansions.plist"
+    snippet = AlfredSnippet("bell", "Bell", "\x07", uid="bell-7")
+    with (
+        pytest.raises(ValueError, match="control characters"),
+        MacosPlistWriter(output_file) as writer,
+    ):
+        writer.add(snippet)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_exporter_without_entry(tmp_path: Path):
+    """Exporters must format entries, and fail to start without it."""
+
+    class HeaderOnlyWriter(StreamingExporter):
+        """Exporter missing entry."""
+
+        def header(self) -> bytes:
+            """Return a header."""
+            return b"header\n"
+
+    with pytest.raises(TypeError, match="abstract method 'entry'"):
+        HeaderOnlyWriter(tmp_path / "snippets.txt")  # type: ignore[abstract]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_register_format():
+    """register_format adds exporters, and refuses to replace one."""
+    assert EXPORT_FORMATS["macos"].exporter is MacosPlistWriter
+    with pytest.raises(ValueError, match="already registered: macos"):
+        register_format("macos", ".plist", RaycastWriter)
@@ -5,10 +5,22 @@ import plistlib
 import zipfile
 from pathlib import Path
 from typing import TYPE_CHECKING
-
-from emojipack.pack import SnippetPack
+from unittest.mock import patch
+
+import pytest
+
+from emojipack.archive import ArchiveReader, compress, read_member
+from emojipack.exporters import MacosPlistWriter
+from emojipack.pack import (
+    LazySnippetPack,
+    SnippetPack,
+    macos_snippet,
+    open_writer,
+)
 from emojipack.snippets import AlfredSnippet
+from emojipack.table import SnippetTable
 
+from .test_archive import UnseekableStream
 from .test_download import EXPECTED_GEMOJI_ENTRIES
 
 if TYPE_CHECKING:
@@ -96,6 +108,61 @@ def test_snippet_pack_write_macos_plist_replaces_spaces(tmp_path: Path):
     assert data == [{"phrase": "🎅", "shortcut": ":santa-claus:"}]
 
 
+@pytest.mark.parametrize(
+    "snippets",
+    [
+        [],
+        [
+            AlfredSnippet("a b", "Escaped", "<&>\r\n😀", uid="a_b-3C"),
+            AlfredSnippet("x", "Plain", "y", uid="x-79"),
+        ],
+    ],
+)
+def test_snippet_pack_write_macos_plist_matches_plistlib(
+    tmp_path: Path, snippets: list[AlfredSnippet]
+):
+    """SnippetPack.write_macos_plist streams the bytes of plistlib.dump."""
+    output_file = tmp_path / "expansions.plist"
+    SnippetPack(".", "&", snippets).write_macos_plist(output_file)
+    expansions = [
+        {"phrase": s.snippet, "shortcut": f".{s.keyword.replace(' ', '-')}&"}
+        for s in snippets
+    ]
+    assert output_file.read_bytes() == plistlib.dumps(expansions)
+
+
+def test_snippet_pack_write_macos_plist_binary(tmp_path: Path):
+    """SnippetPack.write_macos_plist writes binary plists when asked."""
+    snippets = [
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[0], "smiley"),
+    ]
+    output_file = tmp_path / "expansions.plist"
+    SnippetPack(":", ":", snippets).write_macos_plist(output_file, binary=True)
+    assert output_file.read_bytes().startswith(b"bplist00")
+    with output_file.open("rb") as f:
+        assert plistlib.load(f) == [{"phrase": "😃", "shortcut": ":smiley:"}]
+
+
+def test_snippet_pack_read_macos_plist(tmp_path: Path):
+    """SnippetPack.read_macos_plist reads back macOS snippets."""
+    snippets = [
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[0], "smiley"),
+        AlfredSnippet(
+            "thumbs up", "👍 Thumbs up", "👍", uid="thumbs_up-1F44D"
+        ),
+    ]
+    output_file = tmp_path / "test.plist"
+    SnippetPack(".", "", snippets).write_macos_plist(output_file)
+
+    loaded_pack = SnippetPack.read_macos_plist(output_file, ".", "")
+    assert loaded_pack == SnippetPack(
+        ".", "", [macos_snippet(snippet) for snippet in snippets]
+    )
+    assert loaded_pack.snippets[1] == AlfredSnippet(
+        "thumbs-up", "", "👍", uid="thumbs-up-1F44D"
+    )
+
+
 def test_snippet_pack_read(tmp_path: Path):
     """SnippetPack.read loads .alfredsnippets zip with snippets."""
     snippets = [
@@ -184,3 +251,298 @@ def test_snippet_pack_read_without_info_plist(tmp_path: Path):
     loaded_pack = SnippetPack.read(output_file)
     expected = SnippetPack(prefix="", suffix="", snippets=[snippet])
     assert loaded_pack == expected
+
+
+def test_snippet_pack_write_deflated(tmp_path: Path):
+    """SnippetPack.write deflates members when compresslevel is set."""
+    snippets = [
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[0], "smiley"),
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[1], "thumbsup"),
+    ]
+    pack = SnippetPack(prefix=":", suffix=":", snippets=snippets)
+    output_file = tmp_path / "test.alfredsnippets"
+    pack.write(output_file, compresslevel=9)
+
+    with zipfile.ZipFile(output_file) as zf:
+        assert zf.testzip() is None
+        compress_types = {info.compress_type for info in zf.infolist()}
+        assert compress_types == {zipfile.ZIP_DEFLATED}
+    assert SnippetPack.read(output_file) == pack
+
+
+def test_snippet_pack_write_parallel(tmp_path: Path):
+    """SnippetPack.write with workers matches the sequential output."""
+    snippets = [
+        AlfredSnippet(f"kw{i}", f"😀 Name {i}", "😀", uid=f"kw{i}-1F600")
+        for i in range(2500)
+    ]
+    pack = SnippetPack(prefix=":", suffix=":", snippets=snippets)
+    sequential_file = tmp_path / "sequential.alfredsnippets"
+    parallel_file = tmp_path / "parallel.alfredsnippets"
+    pack.write(sequential_file, compresslevel=6)
+    pack.write(parallel_file, compresslevel=6, workers=2)
+
+    with (
+        zipfile.ZipFile(sequential_file) as sequential,
+        zipfile.ZipFile(parallel_file) as parallel,
+    ):
+        assert parallel.namelist() == sequential.namelist()
+        for name in sequential.namelist():
+            assert parallel.read(name) == sequential.read(name)
+
+
+def test_snippet_pack_write_reproducible(tmp_path: Path):
+    """SnippetPack.write gives the same bytes whatever the snippet order."""
+    snippets = [
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[0], "smiley"),
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[1], "+1"),
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[1], "thumbsup"),
+    ]
+    first_file = tmp_path / "first.alfredsnippets"
+    second_file = tmp_path / "second.alfredsnippets"
+    SnippetPack(":", ":", snippets).write(first_file, compresslevel=6)
+    SnippetPack(":", ":", snippets[::-1]).write(second_file, compresslevel=6)
+
+    assert first_file.read_bytes() == second_file.read_bytes()
+    with zipfile.ZipFile(first_file) as zf:
+        uids = sorted(f"{snippet.uid}.json" for snippet in snippets)
+        assert zf.namelist() == ["info.plist", *uids]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_snippet_pack_write_reuses_previous(tmp_path: Path, workers: int):
+    """SnippetPack.write copies unchanged members of the previous archive.
+
+    Members compressed at another level are compressed again, so that the
+    output is identical to a clean build.
+    """
+    snippets = [
+        AlfredSnippet(f"kw{i}", f"😀 Name {i}", "😀", uid=f"kw{i}-1F600")
+        for i in range(1200)
+    ]
+    previous = tmp_path / "previous.alfredsnippets"
+    SnippetPack(":", ":", snippets).write(previous, compresslevel=1)
+    changed = AlfredSnippet("kw7", "😃 Changed", "😃", uid="kw7-1F600")
+    snippets[7] = changed
+    pack = SnippetPack(":", ":", snippets)
+    clean_file = tmp_path / "clean.alfredsnippets"
+    output_file = tmp_path / "output.alfredsnippets"
+    for level, reused in [(1, len(snippets) - 1), (9, 0)]:
+        with pack.writer(clean_file, level) as writer:
+            writer.extend(snippets)
+        with pack.writer(output_file, level, workers, previous) as writer:
+            writer.extend(snippets)
+        assert writer.reused == reused
+        assert output_file.read_bytes() == clean_file.read_bytes()
+
+    assert SnippetPack.read(output_file) == pack
+    with ArchiveReader(output_file) as new:
+        name = f"{snippets[0].uid}.json"
+        assert new.get(name) == compress(name, _content(snippets[0]), 9)
+
+
+def test_snippet_pack_write_replaces_previous(tmp_path: Path):
+    """SnippetPack.write can rewrite the previous archive in place."""
+    snippets = [
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[0], "smiley"),
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[1], "+1"),
+    ]
+    path = tmp_path / "test.alfredsnippets"
+    SnippetPack(":", ":", snippets[:1]).write(path, compresslevel=6)
+    first = path.read_bytes()
+    SnippetPack(":", ":", snippets[:1]).write(path, 6, previous=path)
+    assert path.read_bytes() == first
+
+    SnippetPack(":", ":", snippets).write(path, 6, previous=path)
+    assert SnippetPack.read(path) == SnippetPack(":", ":", snippets[::-1])
+
+
+def _content(snippet: AlfredSnippet) -> bytes:
+    return json.dumps(snippet.to_json(), ensure_ascii=False).encode()
+
+
+def _write_lazy_fixture(path: Path) -> list[AlfredSnippet]:
+    snippets = [
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[0], "smiley"),
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[1], "+1"),
+        AlfredSnippet.from_gemoji(EXPECTED_GEMOJI_ENTRIES[1], "thumbsup"),
+    ]
+    SnippetPack(prefix=":", suffix=":", snippets=snippets).write(path)
+    # Written in uid order
+    return sorted(snippets, key=lambda snippet: snippet.uid)
+
+
+def test_lazy_snippet_pack_positional_access(tmp_path: Path):
+    """LazySnippetPack decodes snippets by position, like a sequence."""
+    output_file = tmp_path / "test.alfredsnippets"
+    snippets = _write_lazy_fixture(output_file)
+
+    with LazySnippetPack(output_file) as lazy:
+        assert (lazy.prefix, lazy.suffix) == (":", ":")
+        assert len(lazy) == 3
+        assert lazy._decoded == {}
+        assert lazy[1] == snippets[1]
+        assert lazy[-1] == snippets[2]
+        assert lazy[0:2] == snippets[0:2]
+        assert list(lazy) == snippets
+
+
+def test_lazy_snippet_pack_find_by_keyword_and_uid(tmp_path: Path):
+    """LazySnippetPack finds snippets decoding only the named members."""
+    output_file = tmp_path / "test.alfredsnippets"
+    snippets = _write_lazy_fixture(output_file)
+
+    with LazySnippetPack(output_file, use_mmap=True) as lazy:
+        with patch(
+            "emojipack.pack.read_member", wraps=read_member
+        ) as mock_read:
+            assert lazy.find_keyword("thumbsup") == snippets[2]
+            assert lazy.find_uid("smiley-1F603") == snippets[1]
+            assert lazy._scanned == 0
+            assert lazy.find_keyword("missing") is None
+            assert lazy._scanned == 3
+            assert lazy.find_uid("+1-1F44D") == snippets[0]
+            assert lazy[2] == snippets[2]
+        # Each member is decoded once, then reused
+        assert mock_read.call_count == 3
+
+
+def test_lazy_snippet_pack_find_keyword_in_foreign_pack(tmp_path: Path):
+    """LazySnippetPack scans members not named after their uid."""
+    snippet = AlfredSnippet("ok hand", "👌 OK hand", "👌", uid="ABC-123")
+    output_file = tmp_path / "test.alfredsnippets"
+    with zipfile.ZipFile(output_file, "w") as zf:
+        content = json.dumps(snippet.to_json(), ensure_ascii=False)
+        zf.writestr("random.json", content)
+        zf.comment = b"Not written by emojipack"
+
+    with LazySnippetPack(output_file) as lazy:
+        assert (lazy.prefix, lazy.suffix) == ("", "")
+        assert lazy.find_keyword("ok hand") == snippet
+        assert lazy.find_uid("ABC-123") == snippet
+
+
+def test_lazy_snippet_pack_finds_among_many_names(tmp_path: Path):
+    """LazySnippetPack looks up named members without scanning the others."""
+    snippets = [
+        AlfredSnippet(f"kw{i}", f"😀 Name {i}", "😀", uid=f"kw{i}-1F600")
+        for i in range(2000)
+    ]
+    output_file = tmp_path / "test.alfredsnippets"
+    SnippetPack(":", ":", snippets).write(output_file)
+
+    with LazySnippetPack(output_file) as lazy:
+        assert len(lazy) == len(snippets)
+        for snippet in snippets[::-97]:
+            assert lazy.find_uid(snippet.uid) == snippet
+        assert lazy.find_keyword("kw1999") == snippets[1999]
+        assert lazy._scanned == 0
+
+
+def test_snippet_pack_read_returns_snippet_table(tmp_path: Path):
+    """SnippetPack.read stores snippets in a SnippetTable."""
+    output_file = tmp_path / "test.alfredsnippets"
+    snippets = _write_lazy_fixture(output_file)
+    loaded_pack = SnippetPack.read(output_file)
+    assert isinstance(loaded_pack.snippets, SnippetTable)
+    assert loaded_pack.snippets == snippets
+
+
+def test_snippet_pack_iter_snippets(tmp_path: Path):
+    """SnippetPack.iter_snippets yields snippets one by one or in batches."""
+    output_file = tmp_path / "test.alfredsnippets"
+    snippets = _write_lazy_fixture(output_file)
+    assert list(SnippetPack.iter_snippets(output_file)) == snippets
+    batches = SnippetPack.iter_snippets(output_file, batch_size=2)
+    assert list(batches) == [snippets[:2], snippets[2:]]
+    plist_file = tmp_path / "test.plist"
+    with MacosPlistWriter(plist_file) as exporter:
+        exporter.extend(SnippetPack.iter_snippets(output_file))
+    with plist_file.open("rb") as f:
+        assert len(plistlib.load(f)) == 3
+
+
+def test_snippet_pack_iter_snippets_foreign_archive(tmp_path: Path):
+    """SnippetPack.iter_snippets reads archives written without seeking."""
+    snippets = [
+        AlfredSnippet(f"kw{i}", f"😀 Name {i}", "😀", uid=f"kw{i}-1F600")
+        for i in range(3)
+    ]
+    output_file = tmp_path / "test.alfredsnippets"
+    stream = UnseekableStream()
+    with zipfile.ZipFile(stream, "w") as zf:
+        for snippet in snippets:
+            zf.writestr(f"{snippet.uid}.json", json.dumps(snippet.to_json()))
+    output_file.write_bytes(stream.buffer.getvalue())
+    assert SnippetPack.read(output_file).snippets == snippets
+    assert list(SnippetPack.iter_snippets(output_file)) == snippets
+
+
+def test_snippet_pack_writer_streams_snippets(tmp_path: Path):
+    """SnippetPack.writer adds snippets consumed lazily from an iterator."""
+    output_file = tmp_path / "test.alfredsnippets"
+    pack = SnippetPack(prefix=":", suffix=":")
+    snippets = (
+        AlfredSnippet(f"kw{i}", f"😀 Name {i}", "😀", uid=f"kw{i}-1F600")
+        for i in range(3000)
+    )
+    with pack.writer(output_file, compresslevel=1, workers=2) as writer:
+        writer.extend(snippets)
+        assert not output_file.exists()
+    assert writer.count == 3000
+    loaded_pack = SnippetPack.read(output_file)
+    assert loaded_pack.prefix == ":"
+    keywords = [snippet.keyword for snippet in loaded_pack.snippets]
+    assert keywords == [f"kw{i}" for i in range(3000)]
+    assert list(tmp_path.iterdir()) == [output_file]
+
+
+def test_open_writer_shares_snippets(tmp_path: Path):
+    """open_writer writes the same snippets to packs with their settings."""
+    packs = {
+        tmp_path / "colons.alfredsnippets": SnippetPack(":", ":"),
+        tmp_path / "dot.alfredsnippets": SnippetPack(".", ""),
+    }
+    snippets = [
+        AlfredSnippet("smile", "😄 Smile", "😄", uid="smile-1F604"),
+        AlfredSnippet("tada", "🎉 Party popper", "🎉", uid="tada-1F389"),
+    ]
+    with open_writer(packs, compresslevel=1) as writer:
+        writer.extend(snippets)
+    assert writer.count == 2
+    for path, pack in packs.items():
+        loaded_pack = SnippetPack.read(path)
+        assert (loaded_pack.prefix, loaded_pack.suffix) == (
+            pack.prefix,
+            pack.suffix,
+        )
+        assert loaded_pack.snippets == snippets
+
+
+def test_snippet_pack_writer_discards_on_error(tmp_path: Path):
+    """SnippetPack.writer leaves no file when an exception occurs."""
+    output_file = tmp_path / "test.alfredsnippets"
+    pack = SnippetPack(prefix=":", suffix=":")
+    snippet = AlfredSnippet("smile", "😄 Smile", "😄", uid="s")
+
+    def write_and_fail() -> None:
+        with pack.writer(output_file) as writer:
+            writer.add(snippet)
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        write_and_fail()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_snippet_pack_writer_discards_on_worker_error(tmp_path: Path):
+    """SnippetPack.writer leaves no file when a worker fails to encode."""
+    output_file = tmp_path / "test.alfredsnippets"
+    pack = SnippetPack(prefix=":", suffix=":")
+    snippet = AlfredSnippet("bad", "\ud800 Lone surrogate", "\ud800", "b")
+    with (
+        pytest.raises(UnicodeEncodeError),
+        pack.writer(output_file, workers=2) as writer,
+    ):
+        writer.add(snippet)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,117 @@
+"""Stage profiling tests for emojipack."""
+
+import tracemalloc
+from collections.abc import Iterable, Iterator
+
+import pytest
+
+from emojipack import profiling
+from emojipack.profiling import Profiler, annotate, stage, timed
+
+
+class FakeClock:
+    """Clock advanced by hand, standing in for the time module."""
+
+    def __init__(self) -> None:
+        """Start at time zero."""
+        self.now = 0.0
+
+    def perf_counter(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Replace the clock used by profiling."""
+    fake = FakeClock()
+    monkeypatch.setattr("emojipack.profiling.time", fake)
+    return fake
+
+
+@pytest.fixture
+def profiler():
+    """Enable profiling for the test."""
+    yield profiling.enable()
+    profiling.disable()
+
+
+def test_nested_stages_exclude_children(clock: FakeClock, profiler: Profiler):
+    """The time of a stage excludes the time of stages nested in it."""
+    with stage("outer"):
+        clock.now += 1
+        with stage("inner"):
+            clock.now += 2
+        clock.now += 3
+    assert profiler.stages["outer"].seconds == 4
+    assert profiler.stages["inner"].seconds == 2
+    assert profiler.stages["outer"].calls == 1
+
+
+def test_timed_records_interleaved_stages(
+    clock: FakeClock, profiler: Profiler
+):
+    """Timed iterators record time spent producing items in their stage."""
+
+    def produce() -> Iterator[int]:
+        for i in range(3):
+            clock.now += 1
+            yield i
+
+    def consume(items: Iterable[int]) -> Iterator[int]:
+        for item in items:
+            clock.now += 10
+            yield item
+
+    with stage("write"):
+        items = list(timed("consume", consume(timed("produce", produce()))))
+    assert items == [0, 1, 2]
+    assert profiler.stages["produce"].seconds == 3
+    assert profiler.stages["produce"].calls == 4
+    assert profiler.stages["consume"].seconds == 30
+    assert profiler.stages["write"].seconds == 0
+
+
+def test_stage_peak_memory():
+    """Stages record peak traced memory, including nested stages."""
+    profiler = profiling.enable(trace_memory=True)
+    try:
+        assert tracemalloc.is_tracing()
+        with stage("outer"):
+            with stage("inner"):
+                data = bytearray(1 << 20)
+            del data
+    finally:
+        profiling.disable()
+    assert not tracemalloc.is_tracing()
+    assert profiler.stages["inner"].peak_bytes >= 1 << 20
+    assert profiler.stages["outer"].peak_bytes >= 1 << 20
+    assert profiler.report()[0].split() == ["stage", "seconds", "peak", "MiB"]
+
+
+def test_stage_max_rss_without_tracing(profiler: Profiler):
+    """Without tracing allocations, stages record the peak resident size."""
+    assert not tracemalloc.is_tracing()
+    with stage("stage"):
+        pass
+    assert profiler.stages["stage"].peak_bytes >= 1 << 20
+
+
+def test_annotate_and_report(profiler: Profiler):
+    """Details are listed once in the report, after the stage figures."""
+    with stage("fetch"):
+        annotate("cache hit")
+        annotate("cache hit")
+    lines = profiler.report()
+    assert lines[0].split() == ["stage", "seconds", "max", "RSS", "MiB"]
+    assert lines[1].startswith("fetch")
+    assert lines[1].endswith("  cache hit")
+    assert lines[-1].startswith("total")
+
+
+def test_disabled_profiling_is_transparent():
+    """Without profiling, stages do nothing and timed returns the items."""
+    items = iter([1, 2])
+    assert timed("stage", items) is items
+    with stage("stage"):
+        annotate("ignored")
@@ -0,0 +1,165 @@
+"""Keyword search tests for emojipack."""
+
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from emojipack.download import GemojiEntry
+from emojipack.search import (
+    TRIE_MAGIC,
+    TRIE_VERSION,
+    FuzzyIndex,
+    KeywordTrie,
+    load_fuzzy_index,
+)
+from emojipack.snippets import AlfredSnippet
+from emojipack.store import save_snapshot
+
+from .test_download import EXPECTED_GEMOJI_ENTRIES, SAMPLE_GEMOJI_JSON
+
+SNIPPETS = [
+    AlfredSnippet("ok hand", "👌 OK hand", "👌", uid="ok_hand-1F44C"),
+    AlfredSnippet("ok", "🆗 OK button", "🆗", uid="ok-1F197"),
+    AlfredSnippet("smile", "😄 Smile", "😄", uid="smile-1F604"),
+    AlfredSnippet("smiley", "😃 Smiley", "😃", uid="smiley-1F603"),
+    AlfredSnippet("okay", "🆗 OK button", "🆗", uid="okay-1F197"),
+]
+
+
+def test_complete_prefix():
+    """KeywordTrie.complete returns keywords starting with prefix, sorted."""
+    trie = KeywordTrie.from_snippets(SNIPPETS)
+    assert len(trie) == 5
+    assert trie.complete("ok") == [
+        ("ok", "🆗"),
+        ("ok hand", "👌"),
+        ("okay", "🆗"),
+    ]
+    assert trie.complete("ok ") == [("ok hand", "👌")]
+    assert trie.complete("smiley") == [("smiley", "😃")]
+    assert trie.complete("smileys") == []
+    assert trie.complete("x") == []
+    assert len(trie.complete("")) == 5
+
+
+def test_complete_limit():
+    """KeywordTrie.complete returns at most limit completions."""
+    trie = KeywordTrie.from_snippets(SNIPPETS)
+    assert trie.complete("s", limit=1) == [("smile", "😄")]
+    assert trie.complete("s", limit=0) == []
+    with pytest.raises(ValueError, match="Negative limit"):
+        trie.complete("", limit=-1)
+
+
+def test_complete_gemoji_aliases():
+    """Keywords from gemoji aliases are searchable with their spaces."""
+    entry = EXPECTED_GEMOJI_ENTRIES[1]
+    snippets = [AlfredSnippet.from_gemoji(entry, a) for a in entry["aliases"]]
+    trie = KeywordTrie.from_snippets(snippets)
+    assert trie.complete("+") == [("+1", "👍")]
+
+
+def test_empty_trie():
+    """A trie without keywords completes nothing."""
+    trie = KeywordTrie.from_snippets([])
+    assert trie.complete("") == []
+    assert trie.complete("a") == []
+
+
+def test_save_load(tmp_path: Path):
+    """KeywordTrie.load reads a trie saved with save."""
+    path = tmp_path / "Emoji Pack.trie"
+    KeywordTrie.from_snippets(SNIPPETS).save(path)
+    assert path.read_bytes().startswith(TRIE_MAGIC + bytes([TRIE_VERSION]))
+    trie = KeywordTrie.load(path)
+    assert trie.complete("sm") == [("smile", "😄"), ("smiley", "😃")]
+    other_output = tmp_path / "Emoji Pack.alfredsnippets"
+    other_output.write_bytes(b"")
+    mode = path.stat().st_mode & 0o777
+    assert mode == other_output.stat().st_mode & 0o777
+    assert sorted(tmp_path.iterdir()) == [other_output, path]
+
+
+def test_load_invalid(tmp_path: Path):
+    """KeywordTrie.load fails on missing, other or truncated files."""
+    path = tmp_path / "other.snapshot"
+    with pytest.raises(FileNotFoundError):
+        KeywordTrie.load(path)
+    save_snapshot(path, "other", [])
+    with pytest.raises(ValueError, match="Not a keyword trie file"):
+        KeywordTrie.load(path)
+    KeywordTrie.from_snippets(SNIPPETS).save(path)
+    content = path.read_bytes()
+    path.write_bytes(content[:-1])
+    with pytest.raises(ValueError, match="Not a keyword trie file"):
+        KeywordTrie.load(path)
+    version = len(TRIE_MAGIC)
+    path.write_bytes(content[:version] + b"\x02" + content[version + 1 :])
+    with pytest.raises(ValueError, match="Unsupported keyword trie version"):
+        KeywordTrie.load(path)
+
+
+FUZZY_ENTRIES: list[GemojiEntry] = [
+    *EXPECTED_GEMOJI_ENTRIES,
+    {
+        "emoji": "🎨",
+        "description": "artist palette",
+        "aliases": ["art"],
+        "tags": ["design", "paint"],
+    },
+    {
+        "emoji": "❤️",
+        "description": "red heart",
+        "aliases": ["heart"],
+        "tags": ["love"],
+    },
+]
+
+
+def test_fuzzy_search_words():
+    """FuzzyIndex.search finds emojis by description, tag and alias words."""
+    index = FuzzyIndex.from_entries(FUZZY_ENTRIES)
+    assert len(index) == 4
+    assert [m.emoji for m in index.search("thumbs")] == ["👍"]
+    assert [m.emoji for m in index.search("approve")] == ["👍"]
+    assert [m.emoji for m in index.search("thumbsup")] == ["👍"]
+    assert [m.emoji for m in index.search("thum")] == ["👍"]
+    assert index.search("zzz") == []
+
+
+def test_fuzzy_search_typos():
+    """FuzzyIndex.search tolerates typos, ranking closer words first."""
+    index = FuzzyIndex.from_entries(FUZZY_ENTRIES)
+    matches = index.search("hart")
+    assert [m.emoji for m in matches] == ["❤️", "🎨"]
+    assert matches[0].description == "red heart"
+    assert matches[0].aliases == ["heart"]
+    assert matches[0].score > matches[1].score
+    assert [m.emoji for m in index.search("red hart", limit=1)] == ["❤️"]
+    assert [m.emoji for m in index.search("grining")] == ["😃"]
+
+
+def test_fuzzy_index_save_load(tmp_path: Path):
+    """FuzzyIndex.load reads an index saved with the same key."""
+    path = tmp_path / "fuzzy.snapshot"
+    FuzzyIndex.from_entries(FUZZY_ENTRIES).save(path, "key")
+    assert FuzzyIndex.load(path, "other") is None
+    index = FuzzyIndex.load(path, "key")
+    assert index is not None
+    assert [m.emoji for m in index.search("hart")] == ["❤️", "🎨"]
+
+
+def test_load_fuzzy_index_cached(cache_dir: Path):
+    """load_fuzzy_index builds the index once per gemoji snapshot."""
+    with patch("emojipack.download.fetch_with_cache") as mock_fetch:
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON)
+        index = load_fuzzy_index()
+        assert [m.emoji for m in index.search("smily")] == ["😃"]
+        assert (cache_dir / "fuzzy.snapshot").exists()
+        with patch.object(FuzzyIndex, "from_entries") as mock_build:
+            load_fuzzy_index()
+            mock_build.assert_not_called()
+        mock_fetch.return_value = json.dumps(SAMPLE_GEMOJI_JSON[:1])
+        assert len(load_fuzzy_index()) == 1
@@ -0,0 +1,117 @@
+"""Lookup server tests for emojipack."""
+
+import asyncio
+import json
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+
+from emojipack.server import SnippetIndex, respond, start_server
+
+from .test_search import SNIPPETS
+
+
+async def _get(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    target: str,
+    method: str = "GET",
+) -> tuple[int, Any]:
+    """Send a request on a kept-alive connection, return status and body."""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in header_lines if line)
+    body = await reader.readexactly(int(headers["Content-Length"]))
+    return int(status_line.split(" ")[1]), json.loads(body)
+
+
+def test_snippet_index_lookups():
+    """SnippetIndex finds snippets by keyword and uid, keywords by emoji."""
+    index = SnippetIndex.from_snippets(SNIPPETS)
+    assert len(index) == 5
+    assert index.keyword("smile") == SNIPPETS[2]
+    assert index.keyword("grin") is None
+    assert index.uid("ok-1F197") == SNIPPETS[1]
+    assert index.aliases("🆗") == ["ok", "okay"]
+    assert index.aliases("😀") == []
+    assert index.complete("ok", 2) == [("ok", "🆗"), ("ok hand", "👌")]
+
+
+def test_respond():
+    """Respond answers each lookup path in JSON-ready form."""
+    index = SnippetIndex.from_snippets(SNIPPETS)
+    assert respond(index, "/keyword/ok%20hand") == (
+        HTTPStatus.OK,
+        {
+            "keyword": "ok hand",
+            "emoji": "👌",
+            "name": "👌 OK hand",
+            "uid": "ok_hand-1F44C",
+        },
+    )
+    assert respond(index, "/uid/smiley-1F603") == (
+        HTTPStatus.OK,
+        {
+            "keyword": "smiley",
+            "emoji": "😃",
+            "name": "😃 Smiley",
+            "uid": "smiley-1F603",
+        },
+    )
+    assert respond(index, "/emoji/%F0%9F%86%97") == (
+        HTTPStatus.OK,
+        {"emoji": "🆗", "keywords": ["ok", "okay"]},
+    )
+    assert respond(index, "/complete/smi?limit=1") == (
+        HTTPStatus.OK,
+        [{"keyword": "smile", "emoji": "😄"}],
+    )
+    status, body = respond(index, "/complete/")
+    assert (status, len(body)) == (HTTPStatus.OK, 5)
+    assert respond(index, "/keyword/grin")[0] == HTTPStatus.NOT_FOUND
+    assert respond(index, "/emoji/x")[0] == HTTPStatus.NOT_FOUND
+    assert respond(index, "/other")[0] == HTTPStatus.NOT_FOUND
+    assert respond(index, "/complete/s?limit=x")[0] == HTTPStatus.BAD_REQUEST
+    assert respond(index, "/complete/?limit=-1") == (
+        HTTPStatus.BAD_REQUEST,
+        {"error": "Invalid limit"},
+    )
+
+
+def test_server_keeps_connections_alive():
+    """The server answers several requests on one TCP connection."""
+    index = SnippetIndex.from_snippets(SNIPPETS)
+
+    async def run() -> list[tuple[int, Any]]:
+        async with await start_server(index) as server:
+            host, port = server.sockets[0].getsockname()[:2]
+            reader, writer = await asyncio.open_connection(host, port)
+            results = [
+                await _get(reader, writer, target)
+                for target in ("/keyword/smile", "/emoji/😃", "/keyword/x")
+            ]
+            results.append(await _get(reader, writer, "/keyword/ok", "POST"))
+            assert await reader.read() == b""
+            writer.close()
+            return results
+
+    results = asyncio.run(run())
+    assert [status for status, _ in results] == [200, 200, 404, 405]
+    assert results[0][1]["emoji"] == "😄"
+    assert results[1][1] == {"emoji": "😃", "keywords": ["smiley"]}
+
+
+def test_server_on_unix_socket(tmp_path: Path):
+    """The server listens on a Unix socket when given a path."""
+    index = SnippetIndex.from_snippets(SNIPPETS)
+    path = tmp_path / "emojipack.sock"
+
+    async def run() -> tuple[int, Any]:
+        async with await start_server(index, path=path):
+            reader, writer = await asyncio.open_unix_connection(path)
+            result = await _get(reader, writer, "/complete/ok?limit=1")
+            writer.close()
+            return result
+
+    assert asyncio.run(run()) == (200, [{"keyword": "ok", "emoji": "🆗"}])
@@ -61,3 +61,10 @@ def test_alfred_snippet_to_json():
     assert json_data["alfredsnippet"]["snippet"] == "😃"
     assert json_data["alfredsnippet"]["uid"] == "smiley-1F603"
     assert json_data["alfredsnippet"]["dontautoexpand"] is False
+
+
+def test_alfred_snippet_from_json():
+    """AlfredSnippet.from_json reverses AlfredSnippet.to_json."""
+    entry = EXPECTED_GEMOJI_ENTRIES[0]
+    snippet = AlfredSnippet.from_gemoji(entry, "smiley")
+    assert AlfredSnippet.from_json(snippet.to_json()) == snippet
@@ -0,0 +1,37 @@
+"""Snapshot storage tests for emojipack."""
+
+import os
+from pathlib import Path
+
+from emojipack.store import evict_snapshots, load_snapshot, save_snapshot
+
+
+def test_snapshot_round_trip(tmp_path: Path):
+    """load_snapshot returns the data saved with the same key."""
+    path = tmp_path / "sub" / "data.snapshot"
+    data = [{"emoji": "😀", "aliases": ["grinning"]}]
+    save_snapshot(path, "key", data)
+    assert load_snapshot(path, "key") == data
+    assert list(path.parent.iterdir()) == [path]
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_snapshot_missing_or_stale(tmp_path: Path):
+    """load_snapshot returns None if the file is missing or key differs."""
+    path = tmp_path / "data.snapshot"
+    assert load_snapshot(path, "key") is None
+    save_snapshot(path, "old", [1, 2, 3])
+    assert load_snapshot(path, "new") is None
+
+
+def test_evict_snapshots_least_recently_used(tmp_path: Path):
+    """evict_snapshots removes the oldest snapshots beyond the size limit."""
+    paths = [tmp_path / f"{i}.snapshot" for i in range(3)]
+    for i, path in enumerate(paths):
+        save_snapshot(path, "key", ["x" * 100])
+        os.utime(path, ns=(i, i))
+    os.utime(paths[0], ns=(10, 10))  # Touched when loaded
+    size = paths[0].stat().st_size
+    assert evict_snapshots(tmp_path, 2 * size) == 1
+    assert sorted(tmp_path.iterdir()) == [paths[0], paths[2]]
+    assert evict_snapshots(tmp_path, 2 * size) == 0
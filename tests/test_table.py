@@ -0,0 +1,44 @@
+"""Columnar snippet storage tests for emojipack."""
+
+from emojipack.snippets import AlfredSnippet
+from emojipack.table import SnippetTable
+
+from .test_download import EXPECTED_GEMOJI_ENTRIES
+
+
+def _thumbs_up_snippets() -> list[AlfredSnippet]:
+    entry = EXPECTED_GEMOJI_ENTRIES[1]
+    return [AlfredSnippet.from_gemoji(entry, a) for a in entry["aliases"]]
+
+
+def test_snippet_table_rows_and_columns():
+    """SnippetTable returns its snippets by row and by column."""
+    snippets = _thumbs_up_snippets()
+    table = SnippetTable(snippets)
+    assert len(table) == 2
+    assert table[0] == snippets[0]
+    assert table[-1] == snippets[1]
+    assert list(table) == snippets
+    assert table.keywords == ["+1", "thumbsup"]
+    assert table.uids == ["+1-1F44D", "thumbsup-1F44D"]
+    assert table.emojis == ["👍", "👍"]
+
+
+def test_snippet_table_interns_names_and_emojis():
+    """SnippetTable stores shared names and emojis once."""
+    table = SnippetTable(_thumbs_up_snippets())
+    assert table._pool == ["👍 Thumbs up - approve, ok", "👍"]
+    assert list(table._name_ids) == [0, 0]
+    assert list(table._snippet_ids) == [1, 1]
+
+
+def test_snippet_table_equals_snippet_sequences():
+    """SnippetTable compares equal to lists and tables of same snippets."""
+    snippets = _thumbs_up_snippets()
+    table = SnippetTable(snippets)
+    assert table == snippets
+    assert snippets == table
+    assert table == SnippetTable(snippets)
+    assert table != snippets[:1]
+    assert table[1:] == snippets[1:]
+    assert isinstance(table[1:], SnippetTable)